@@ -1,25 +1,90 @@
 """BlackWell API."""
 
 import fastapi
+import contextlib
 import datetime
-import threading
-import dotenv
+import hmac
+import math
 
-from typing import Any, Dict, List, Literal
-from core.systems import Parser, UserManager, IPLimiter
+from typing import Any, AsyncIterator, Dict, List, Literal
+from core.systems import UserManager, MediaManager, IPLimiter, NODE_REGISTRY
 from core.models import *
 from core.db.primary import (
     get_token_with_email_and_password,
+    get_token_with_username,
     set_user_profile,
     get_user,
     check_if_user_in_contacts,
     get_user_profile,
 )
-from core.db.secundary import cleaner_temporal_accounts, cleaner_queue_history
-from core.gateway import GATEWAY_CONEXIONS, Gateway
+from core.db.secundary import (
+    ensure_indexes,
+    sweep_queue_history,
+    compact_queue_histories,
+    get_media,
+    add_conversation_messages,
+    delete_conversation_message,
+    get_conversation_history,
+    get_last_messages,
+)
+from core.schemas import generate_media_reference_schema
+from core.gateway import GATEWAY_INDEX, UNKNOWN_RECIPIENT, Gateway, GatewayTools
+from core.sessions import SESSIONS
+from core.scheduler import SCHEDULER, IntervalTrigger
+from core.outbox import OUTBOX
+from core.quotas import QUOTAS
+from core.serializer import FastJSONResponse
+from core.compression import COMPRESSOR
+from core.responses import DATE, Envelope, Responses, respond, to_response
+from core.media import Media, MediaUpload
+from core.images import IMAGES
+from core.config import (
+    AVATAR_SIZES,
+    MEDIA_CHUNK_SIZE,
+    MEDIA_MAX_SIZE,
+    THUMBNAIL_SIZE,
+    QUEUE_COMPACTION_INTERVAL,
+    QUEUE_HISTORY_SWEEP_INTERVAL,
+    QUEUE_HISTORY_SWEEP_JITTER,
+    METRICS_TOKEN,
+    NODE_LEASE,
+)
 from core.constants import Constants
 
-dotenv.load_dotenv()
+SCHEDULER.add_job(
+    "queue history sweeper",
+    sweep_queue_history,
+    IntervalTrigger(QUEUE_HISTORY_SWEEP_INTERVAL, jitter=QUEUE_HISTORY_SWEEP_JITTER),
+)
+SCHEDULER.add_job(
+    "queue history compactor",
+    compact_queue_histories,
+    IntervalTrigger(QUEUE_COMPACTION_INTERVAL, jitter=QUEUE_HISTORY_SWEEP_JITTER),
+)
+SCHEDULER.add_job(
+    "node lease renewal", NODE_REGISTRY.renew, IntervalTrigger(NODE_LEASE / 3)
+)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: fastapi.FastAPI) -> AsyncIterator[None]:
+
+    await NODE_REGISTRY.claim()
+    await Gateway.load()
+    await SESSIONS.load()
+    await ensure_indexes()
+
+    SCHEDULER.start()
+    OUTBOX.start()
+    IMAGES.start()
+
+    yield
+
+    await OUTBOX.shutdown()
+    await SCHEDULER.shutdown()
+    await IMAGES.shutdown()
+    await NODE_REGISTRY.release()
+
 
 API: fastapi.FastAPI = fastapi.FastAPI(
     title=Constants.TITLE.value,
@@ -27,25 +92,78 @@ API: fastapi.FastAPI = fastapi.FastAPI(
     docs_url="/tests/",
     redoc_url=None,
     summary=f'The main API for BlackWell. {datetime.datetime.strftime(datetime.datetime.now(), "%Y-%m-%d")} DevCheckOG | Kevin Benavides',
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 
-@API.on_event("startup")
-async def startup() -> None:
+@API.exception_handler(fastapi.exceptions.RequestValidationError)
+async def validation_error(
+    request: fastapi.Request, exc: fastapi.exceptions.RequestValidationError
+) -> FastJSONResponse:
 
-    await Gateway.load()
+    return respond(
+        Constants.INCORRECT_SYNTAX,
+        422,
+        title="BlackWell API - Incorrect Syntax",
+        message="The request is not valid. Please use the correct syntax.",
+        detail=fastapi.encoders.jsonable_encoder(exc.errors()),
+    )
+
+
+async def gateway_sender(email: str, password: str, session: str = "") -> str | None:
+    """The username behind a session, or behind an email and a password."""
+
+    if session:
+
+        claims: Dict[str, Any] | bool = await SESSIONS.verify(session)
+
+        return (
+            claims["username"]
+            if isinstance(claims, dict) and claims["username"] in GATEWAY_INDEX
+            else None
+        )
+
+    connection: Dict[str, Any] | None = GatewayTools.find(email, password)
+
+    return connection["username"] if connection is not None else None
+
+
+async def authorize(token: str) -> Dict[str, Any] | bool:
+    """The user token and username behind a session, or behind a raw user token."""
+
+    # Sessions are "<payload>.<signature>", the user tokens are plain hex.
+    if "." in token:
+
+        claims: Dict[str, Any] | bool = await SESSIONS.verify(token)
+
+        if not isinstance(claims, dict):
+            return False
+
+        # The token is not in the session, it is resolved here from the username.
+        connection: Dict[str, Any] | None = GATEWAY_INDEX.get(claims["username"])
+        resolved: List[str] | bool = (
+            [connection["token"]]
+            if connection is not None
+            else await get_token_with_username(claims["username"])
+        )
+
+        return {**claims, "token": resolved[0]} if isinstance(resolved, list) else False
 
-    threading.Thread(
-        target=cleaner_temporal_accounts, name="| Temporal Accounts |"
-    ).start()
-    threading.Thread(target=cleaner_queue_history, name="| Queue - History |").start()
+    user: Dict[str, Any] | bool = await get_user(token)
+
+    return (
+        {"token": user["_id"], "username": user["username"]}
+        if isinstance(user, dict)
+        else False
+    )
 
 
 @API.get("/", description=f"{Constants.TITLE.value}.")
 @IPLimiter.limiter(max_calls=10, time=60)
-async def root(request: fastapi.Request) -> fastapi.responses.JSONResponse:
+async def root(request: fastapi.Request) -> FastJSONResponse:
 
-    return fastapi.responses.JSONResponse(
+    return FastJSONResponse(
         content={
             "title": Constants.TITLE.value,
             "version": Constants.VERSION.value,
@@ -54,117 +172,148 @@ async def root(request: fastapi.Request) -> fastapi.responses.JSONResponse:
                 "twitter": "https://twitter.com/DevCheckOG",
                 "github": "https://github.com/DevCheckOG",
             },
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
+            "media": {
+                "max-size": MEDIA_MAX_SIZE,
+                "avatar-sizes": AVATAR_SIZES if IMAGES.available else [],
+                "thumbnail-size": THUMBNAIL_SIZE if IMAGES.available else None,
+                "format": IMAGES.mime,
+            },
+            "date": DATE.now(),
         }
     )
 
 
+@API.get("/metrics", include_in_schema=False)
+@IPLimiter.limiter(max_calls=10, time=60)
+async def metrics(
+    request: fastapi.Request, token: str = fastapi.Header("")
+) -> FastJSONResponse:
+
+    if not METRICS_TOKEN or not hmac.compare_digest(
+        token.encode(), METRICS_TOKEN.encode()
+    ):
+
+        raise fastapi.HTTPException(
+            status_code=fastapi.status.HTTP_404_NOT_FOUND, detail="Not Found"
+        )
+
+    return respond(
+        Constants.OK,
+        title="BlackWell API - Metrics",
+        message={
+            "jobs": SCHEDULER.metrics(),
+            "outbox": dict(OUTBOX.metrics),
+            "compression": COMPRESSOR.report(),
+        },
+    )
+
+
 @API.websocket("/gateway")
 async def gateway(
-    websocket: fastapi.WebSocket, email: str | None, password: str | None
+    websocket: fastapi.WebSocket,
+    email: str | None = None,
+    password: str | None = None,
+    session: str | None = None,
 ) -> None | Any:
 
-    if email is None or password is None:
+    connection: Dict[str, Any] | None = None
+
+    if session is not None:
+
+        claims: Dict[str, Any] | bool = await SESSIONS.verify(session)
+
+        if isinstance(claims, dict):
+            connection = await Gateway.connect_session(claims["username"], websocket)
+
+    elif email is None or password is None:
 
         await websocket.accept()
-        await websocket.send_json(
-            {
-                "title": "BlackWell API - Bad Connection to the Gateway",
-                "message": "Please provide an email and a password.",
-                "status": Constants.REQUIRED_EMAIL_AND_PASSWORD_IN_THE_GATEWAY.value,
-            }
-        )
+        await Responses.GATEWAY_REQUIRED_EMAIL_AND_PASSWORD.send(websocket)
 
         await websocket.close()
         return
 
-    elif not any(
-        email == conexion["email"] and password == conexion["password"]
-        for conexion in GATEWAY_CONEXIONS
-    ):
+    else:
+
+        connection = await Gateway.connect(email, password, websocket)
+
+    if connection is None:
 
         await websocket.accept()
-        await websocket.send_json(
-            {
-                "title": "BlackWell API - Bad Connection to the Gateway",
-                "message": "The credentials are not valid.",
-                "status": Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY.value,
-            }
-        )
+        await Responses.GATEWAY_BAD_CONNECTION.send(websocket)
 
         await websocket.close()
         return
 
-    Gateway.connect(email, password, websocket)
-
     try:
 
         while True:
 
             if websocket.client_state == fastapi.websockets.WebSocketState.DISCONNECTED:
-                Gateway.disconnect(websocket)
+                await Gateway.disconnect(connection, websocket)
                 break
 
             await websocket.receive()
 
     except:
 
-        Gateway.disconnect(websocket)
+        await Gateway.disconnect(connection, websocket)
 
 
 @API.post("/login")
 @IPLimiter.limiter(max_calls=2, time=30)
-async def login(
-    request: fastapi.Request, data: Login
-) -> fastapi.responses.JSONResponse:
+async def login(request: fastapi.Request, data: Login) -> fastapi.responses.Response:
+
+    return to_response(await UserManager().login(data.email, data.password))
+
+
+@API.post("/logout")
+@IPLimiter.limiter(max_calls=10, time=30)
+async def logout(request: fastapi.Request, data: Logout) -> fastapi.responses.Response:
 
-    result: Dict[str, Any] = await UserManager().login(data.email, data.password)
+    if await SESSIONS.revoke(data.session):
 
-    return fastapi.responses.JSONResponse(content=result)
+        return Responses.SESSION_CLOSED.response()
+
+    return Responses.INCORRECT_SESSION.response()
 
 
 @API.post("/register")
 @IPLimiter.limiter(max_calls=5, time=30)
 async def register(
     request: fastapi.Request, data: Register
-) -> fastapi.responses.JSONResponse:
+) -> fastapi.responses.Response:
 
-    result: Dict[str, Any] = await UserManager().register_user(
+    result: Envelope = await UserManager().register_user(
         data.username, data.email, data.password
     )
 
-    return fastapi.responses.JSONResponse(content=result)
+    return result.response()
 
 
 @API.post("/verify")
 @IPLimiter.limiter(max_calls=5, time=30)
-async def verify(
-    request: fastapi.Request, data: Verify
-) -> fastapi.responses.JSONResponse:
+async def verify(request: fastapi.Request, data: Verify) -> fastapi.responses.Response:
 
-    result: Dict[str, Any] = await UserManager().verify_user(data.code)
+    result: Envelope = await UserManager().verify_user(data.code)
 
-    return fastapi.responses.JSONResponse(content=result)
+    return result.response()
 
 
 @API.post("/user/delete")
 @IPLimiter.limiter(max_calls=50, time=20)
 async def delete_user(
     request: fastapi.Request, data: DeleteUser
-) -> fastapi.responses.JSONResponse:
+) -> fastapi.responses.Response:
 
-    result: Dict[str, Any] = await UserManager().delete_user(data.email, data.password)
+    result: Envelope = await UserManager().delete_user(data.email, data.password)
 
-    return fastapi.responses.JSONResponse(content=result)
+    return result.response()
 
 
 @API.post("/user/token")
 @IPLimiter.limiter(max_calls=10, time=60)
-async def token(
-    request: fastapi.Request, data: Token
-) -> fastapi.responses.JSONResponse:
+async def token(request: fastapi.Request, data: Token) -> fastapi.responses.Response:
 
     result: list[str, Any] | bool = await get_token_with_email_and_password(
         data.email, data.password
@@ -172,74 +321,87 @@ async def token(
 
     if isinstance(result, list):
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "username": result[1],
-                "token": result[0],
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+        return respond(Constants.OK, username=result[1], token=result[0])
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Incorrect Credentials",
-            "message": "The email or password is not valid. Or the user does not exist.",
-            "status": Constants.EMAIL_AND_PASSWORD_IS_NOT_VALID.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
-    )
+    return Responses.INCORRECT_CREDENTIALS.response()
 
 
-@API.post("user/set-profile")
+@API.post("/user/set-profile")
 @IPLimiter.limiter(max_calls=5, time=20)
 async def set_profile(
     request: fastapi.Request, data: SetProfile
-) -> fastapi.responses.JSONResponse:
+) -> fastapi.responses.Response:
 
-    if not Parser().is_hex(data.image) or not Parser().check_img_or_video_size(
-        bytes.fromhex(data.image)
-    ):
+    if not Media.validate(data.image, "img"):
+
+        return Responses.INCORRECT_PROFILE_IMAGE.response()
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Incorrect Image",
-                "message": "The size of the image is not valid or the image not is a hex.",
-                "status": Constants.INCORRECT_SIZE_IMAGE.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+    user: Dict[str, Any] | bool = await authorize(data.token)
+
+    if not isinstance(user, dict):
+
+        return Responses.INCORRECT_TOKEN.response()
+
+    if IMAGES.available:
+
+        result: bool = isinstance(
+            await MediaManager.store_profile(
+                user["token"],
+                user["username"],
+                bytes.fromhex(data.image),
+                Media.sniff(data.image, "img"),
+            ),
+            dict,
         )
 
-    result: bool = await set_user_profile(data.token, data.image)
+    else:
+
+        result = await set_user_profile(user["token"], data.image)
 
     if result:
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Profile Image Updated",
-                "message": "The profile image was updated successfully.",
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+        return Responses.PROFILE_UPDATED.response()
+
+    return Responses.INCORRECT_TOKEN.response()
+
+
+@API.post("/user/upload-profile")
+@IPLimiter.limiter(max_calls=5, time=20)
+async def upload_profile(
+    request: fastapi.Request, token: str = fastapi.Header()
+) -> fastapi.responses.Response:
+
+    user: Dict[str, Any] | bool = await authorize(token)
+
+    if not isinstance(user, dict):
+
+        return Responses.INCORRECT_TOKEN.response()
+
+    upload: MediaUpload = MediaUpload("img")
+
+    try:
+
+        if not await upload.receive(request):
+
+            return Responses.INCORRECT_PROFILE_UPLOAD.response()
+
+        media: Dict[str, Any] | bool = await MediaManager.store_profile(
+            user["token"], user["username"], upload
         )
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Incorrect Token",
-            "message": "The token is not valid.",
-            "status": Constants.INCORRECT_TOKEN_FOR_THE_USER.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
+    finally:
+
+        upload.close()
+
+    if not isinstance(media, dict):
+
+        return Responses.INCORRECT_TOKEN.response()
+
+    return respond(
+        Constants.OK,
+        title=Responses.PROFILE_UPDATED.title,
+        message=Responses.PROFILE_UPDATED.message,
+        media=media,
     )
 
 
@@ -247,67 +409,50 @@ async def set_profile(
 @IPLimiter.limiter(max_calls=25, time=20)
 async def profile(
     request: fastapi.Request, data: Profile
-) -> fastapi.responses.JSONResponse:
+) -> fastapi.responses.Response:
 
-    result: Dict[str, Any] | bool = await get_user(data.token)
+    user: Dict[str, Any] | bool = await authorize(data.token)
 
-    if isinstance(result, dict):
+    if not isinstance(user, dict):
 
-        contact_profile: bool = await check_if_user_in_contacts(
-            data.token, data.username
-        )
+        return Responses.INCORRECT_TOKEN_OR_USER.response()
 
-        if not contact_profile:
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - User not found",
-                    "message": "The user is not in your contacts.",
-                    "status": Constants.INVALID_USER_IN_CONCTACTS.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    profile: List[str] | bool = await check_if_user_in_contacts(
+        user["token"], data.username
+    ) and await get_user_profile(data.username)
 
-        profile: List[str] | bool = await get_user_profile(data.token, data.username)
+    if not isinstance(profile, list):
 
-        if not isinstance(profile, list):
+        return Responses.USER_NOT_IN_CONTACTS.response()
 
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - User not found",
-                    "message": "The user is not in your contacts.",
-                    "status": Constants.INVALID_USER_IN_CONCTACTS.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    return respond(
+        Constants.OK,
+        title="BlackWell API - User Profile",
+        message={
+            "username": profile[0],
+            "image": profile[1],
+            "media": profile[2],
+        },
+    )
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - User Profile",
-                "message": {
-                    "username": profile[0],
-                    "image": profile[1],
-                },
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Incorrect Credentials",
-            "message": "The token is not valid. Or the user does not exist.",
-            "status": Constants.INCORRECT_TOKEN_FOR_THE_USER.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
+def quota_exceeded(retry_after: float) -> FastJSONResponse:
+
+    return respond(
+        Constants.SEND_QUOTA_EXCEEDED,
+        fastapi.status.HTTP_429_TOO_MANY_REQUESTS,
+        {"Retry-After": str(math.ceil(retry_after))},
+        title="BlackWell API - Send Quota Exceeded",
+        message=f"Too many messages. Unlock to the: {datetime.datetime.strftime(datetime.datetime.now() + datetime.timedelta(seconds=retry_after), '%H:%M:%S')}",
+    )
+
+
+def gateway_mistake(result: str) -> FastJSONResponse:
+
+    return respond(
+        Constants.INCORRECT_USERNAME_IN_THE_GATEWAY,
+        title="BlackWell API - Gateway mistake",
+        message=result,
     )
 
 
@@ -317,325 +462,342 @@ async def send_message(
     request: fastapi.Request,
     type: Literal["img", "video", "text"] | None,
     data: SendMessage,
-) -> fastapi.responses.JSONResponse:
+) -> fastapi.responses.Response:
 
     if type is None:
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Bad Type",
-                "message": "The type of message is not valid.",
-                "status": Constants.REQUIRED_TYPE_OF_MESSAGE.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+        return Responses.REQUIRED_TYPE.response()
 
-    elif type not in ["img", "video", "text"]:
-
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Bad Type",
-                "message": "The type of message is not valid.",
-                "status": Constants.INCORRECT_TYPE_OF_MESSAGE.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+    elif type not in ["img", "video", "text"] or data.message.type != type:
 
-    elif type == "text":
+        return Responses.INCORRECT_TYPE.response()
 
-        parsed_message: Dict[str, Any] | bool = Parser().parse_plane_text(data.message)
+    parsed_message: Dict[str, Any] = data.message.to_message()
 
-        if not isinstance(parsed_message, dict):
+    if type != "text" and not Media.validate(parsed_message["contain"], type):
 
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Incorrect Syntax in Message Post",
-                    "message": "The message is not valid. Please use the correct syntax.",
-                    "status": Constants.INCORRECT_SYNTAX.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+        return Responses.INCORRECT_MEDIA[type].response()
 
-        elif not any(
-            data.email == conexion["email"] and data.password == conexion["password"]
-            for conexion in GATEWAY_CONEXIONS
-        ):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Gateway mistake",
-                    "message": "The credentials are not valid.",
-                    "status": Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    sender: str | None = await gateway_sender(data.email, data.password, data.session)
 
-        result: bool | str = await Gateway.send_message(data.to, parsed_message)
+    if sender is None:
 
-        if isinstance(result, str):
+        return Responses.GATEWAY_INCORRECT_CREDENTIALS.response()
 
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Gateway mistake",
-                    "message": result,
-                    "status": Constants.INCORRECT_USERNAME_IN_THE_GATEWAY.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    # Only messages that can reach their recipient are charged.
+    elif data.to not in GATEWAY_INDEX:
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Message Sent",
-                "message": "The message was sent.",
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+        return gateway_mistake(UNKNOWN_RECIPIENT)
 
-    elif type == "img":
+    # The sender is the authenticated user, never the "from" the client wrote.
+    parsed_message["from"] = sender
+    retry_after: float = await QUOTAS.charge(sender, type, parsed_message)
 
-        parsed_message: Dict[str, Any] | bool = Parser().parse_video_or_img_message(
-            data.message
-        )
+    if retry_after:
 
-        if not Parser.is_hex(
-            parsed_message["contain"]
-        ) or not Parser().check_img_or_video_size(
-            bytes.fromhex(parsed_message["contain"])
-        ):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Incorrect Size Image",
-                    "message": "The size of the image is not valid or the image not this in hex. Please use the correct syntax.",
-                    "status": Constants.INCORRECT_SIZE_IMAGE.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+        return quota_exceeded(retry_after)
 
-        elif not isinstance(parsed_message, dict):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Incorrect Syntax in Message Post",
-                    "message": "The message is not valid. Please use the correct syntax.",
-                    "status": Constants.INCORRECT_SYNTAX.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    result: bool | str = await Gateway.send_message(data.to, parsed_message)
 
-        elif not any(
-            data.email == conexion["email"] and data.password == conexion["password"]
-            for conexion in GATEWAY_CONEXIONS
-        ):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Gateway mistake",
-                    "message": "The credentials are not valid.",
-                    "status": Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
+    # Neither delivered nor queued, the recipient is gone.
+    if result is not True:
+
+        await QUOTAS.refund(sender, type, parsed_message)
+
+        return gateway_mistake(result if isinstance(result, str) else UNKNOWN_RECIPIENT)
+
+    await add_conversation_messages(
+        sender,
+        data.to,
+        [await MediaManager.store_hex_message(sender, data.to, parsed_message)],
+    )
+
+    return Responses.MESSAGE_SENT.response()
+
+
+@API.post("/messages/send-batch")
+@IPLimiter.limiter(max_calls=5, time=5)
+async def send_batch(
+    request: fastapi.Request, data: SendBatch
+) -> fastapi.responses.Response:
+
+    sender: str | None = await gateway_sender(data.email, data.password, data.session)
+
+    if sender is None:
+
+        return Responses.GATEWAY_INCORRECT_CREDENTIALS.response()
+
+    results: List[Dict[str, Any]] = []
+    batch: Dict[str, List[Dict[str, Any]]] = {}
+
+    for item in data.messages:
+
+        type: str = item.message.type
+        message: Dict[str, Any] = {**item.message.to_message(), "from": sender}
+        result: Dict[str, Any] = {"to": item.to, "id": message["id"]}
+        results.append(result)
+
+        if type != "text" and not Media.validate(message["contain"], type):
+
+            result["status"] = Responses.INCORRECT_MEDIA[type].status
+            continue
+
+        elif item.to not in GATEWAY_INDEX:
+
+            result["message"] = UNKNOWN_RECIPIENT
+            result["status"] = Constants.INCORRECT_USERNAME_IN_THE_GATEWAY.value
+            continue
+
+        retry_after: float = await QUOTAS.charge(sender, type, message)
+
+        if retry_after:
+
+            result["retry-after"] = math.ceil(retry_after)
+            result["status"] = Constants.SEND_QUOTA_EXCEEDED.value
+            continue
+
+        batch.setdefault(item.to, []).append(message)
+
+    delivered: Dict[str, bool | str] = await Gateway.send_batch(batch)
+
+    for to, messages in batch.items():
+
+        if delivered[to] is True:
+
+            await add_conversation_messages(
+                sender,
+                to,
+                [
+                    await MediaManager.store_hex_message(sender, to, message)
+                    for message in messages
+                ],
             )
+            continue
+
+        for message in messages:
+            await QUOTAS.refund(sender, message["type"], message)
+
+    for result in results:
+
+        if "status" in result:
+            continue
 
-        result: bool | str = await Gateway.send_message(data.to, parsed_message)
+        outcome: bool | str = delivered[result["to"]]
 
-        if isinstance(result, str):
+        if outcome is True:
 
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Gateway mistake",
-                    "message": result,
-                    "status": Constants.INCORRECT_USERNAME_IN_THE_GATEWAY.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
+            result["status"] = Constants.OK.value
+
+        else:
+
+            result["message"] = (
+                outcome
+                if isinstance(outcome, str)
+                else "The message could not be sent."
             )
+            result["status"] = Constants.INCORRECT_USERNAME_IN_THE_GATEWAY.value
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Message Sent",
-                "message": "The message was sent.",
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+    return respond(
+        Constants.OK,
+        title="BlackWell API - Messages Sent",
+        message="The batch was processed, every message has its own status.",
+        results=results,
+    )
+
+
+@API.post("/messages/upload")
+@IPLimiter.limiter(max_calls=10, time=5)
+async def upload_message(
+    request: fastapi.Request,
+    type: Literal["img", "video"] | None,
+    to: str,
+    email: str = fastapi.Header(""),
+    password: str = fastapi.Header(""),
+    session: str = fastapi.Header(""),
+) -> fastapi.responses.Response:
+
+    if type is None:
+
+        return Responses.REQUIRED_TYPE.response()
+
+    sender: str | None = await gateway_sender(email, password, session)
+
+    if sender is None:
+
+        return Responses.GATEWAY_INCORRECT_CREDENTIALS.response()
 
-    elif type == "video":
+    elif to not in GATEWAY_INDEX:
 
-        parsed_message: Dict[str, Any] | bool = Parser().parse_video_or_img_message(
-            data.message
+        return gateway_mistake(UNKNOWN_RECIPIENT)
+
+    upload: MediaUpload = MediaUpload(type)
+
+    try:
+
+        if not await upload.receive(request):
+
+            return Responses.INCORRECT_UPLOAD[type].response()
+
+        retry_after: float = await QUOTAS.charge(sender, type, {}, upload.size)
+
+        if retry_after:
+
+            return quota_exceeded(retry_after)
+
+        media: Dict[str, Any] = await MediaManager.store_message(
+            sender, to, type, upload
         )
 
-        if not Parser.is_hex(
-            parsed_message["contain"]
-        ) or not Parser().check_img_or_video_size(
-            bytes.fromhex(parsed_message["contain"])
-        ):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Incorrect Size Video",
-                    "message": "The size of the video is not valid or the video not this in hex. Please use the correct syntax.",
-                    "status": Constants.INCORRECT_SIZE_VIDEO.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    finally:
 
-        elif not isinstance(parsed_message, dict):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Incorrect Syntax in Message Post",
-                    "message": "The message is not valid. Please use the correct syntax.",
-                    "status": Constants.INCORRECT_SYNTAX.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+        upload.close()
 
-        elif not any(
-            data.email == conexion["email"] and data.password == conexion["password"]
-            for conexion in GATEWAY_CONEXIONS
-        ):
-
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Gateway mistake",
-                    "message": "The credentials are not valid.",
-                    "status": Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+    reference: Dict[str, Any] = generate_media_reference_schema(sender, type, media)
+    result: bool | str = await Gateway.send_message(to, reference)
 
-        result: bool | str = await Gateway.send_message(data.to, parsed_message)
+    if result is not True:
 
-        if isinstance(result, str):
+        await QUOTAS.refund(sender, type, {}, media["size"])
+        await MediaManager.discard(media)
 
-            return fastapi.responses.JSONResponse(
-                content={
-                    "title": "BlackWell API - Gateway mistake",
-                    "message": result,
-                    "status": Constants.INCORRECT_USERNAME_IN_THE_GATEWAY.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-            )
+        return gateway_mistake(result if isinstance(result, str) else UNKNOWN_RECIPIENT)
+
+    await add_conversation_messages(sender, to, [reference])
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Message Sent",
-                "message": "The message was sent.",
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+    return respond(
+        Constants.OK,
+        title=Responses.MESSAGE_SENT.title,
+        message=Responses.MESSAGE_SENT.message,
+        media=media,
+    )
+
+
+@API.post("/messages/history")
+@IPLimiter.limiter(max_calls=25, time=20)
+async def history(
+    request: fastapi.Request, data: History
+) -> fastapi.responses.Response:
+
+    user: Dict[str, Any] | bool = await authorize(data.token)
+
+    if not isinstance(user, dict):
+
+        return Responses.INCORRECT_TOKEN_OR_USER.response()
+
+    page: Dict[str, Any] | bool = await get_conversation_history(
+        user["username"], data.username, data.cursor, data.limit
+    )
+
+    if not isinstance(page, dict):
+
+        return Responses.INCORRECT_CURSOR.response()
+
+    return respond(
+        Constants.OK, title="BlackWell API - Conversation History", message=page
+    )
+
+
+@API.post("/messages/last")
+@IPLimiter.limiter(max_calls=25, time=20)
+async def last_messages(
+    request: fastapi.Request, data: LastMessage
+) -> fastapi.responses.Response:
+
+    user: Dict[str, Any] | bool = await authorize(data.token)
+
+    if not isinstance(user, dict):
+
+        return Responses.INCORRECT_TOKEN_OR_USER.response()
+
+    return respond(
+        Constants.OK,
+        title="BlackWell API - Last Messages",
+        message=await get_last_messages(user["username"], data.limit),
+    )
+
+
+@API.get("/media/{media_id}")
+@IPLimiter.limiter(max_calls=50, time=20)
+async def download_media(
+    request: fastapi.Request, media_id: str, token: str = fastapi.Header()
+) -> fastapi.responses.Response:
+
+    user: Dict[str, Any] | bool = await authorize(token)
+    stream: Any | bool = await get_media(media_id)
+
+    # Message media is private to its sender and recipient, profiles to any user.
+    if (
+        not isinstance(user, dict)
+        or stream is False
+        or (
+            not stream.metadata.get("profile")
+            and user["username"] not in (stream.metadata["from"], stream.metadata["to"])
         )
+    ):
+
+        return Responses.MEDIA_NOT_FOUND.response(fastapi.status.HTTP_404_NOT_FOUND)
 
+    async def chunks() -> AsyncIterator[bytes]:
+
+        while chunk := await stream.read(MEDIA_CHUNK_SIZE):
+            yield chunk
+
+    return fastapi.responses.StreamingResponse(
+        chunks(),
+        media_type=stream.metadata["mime"],
+        headers={"Content-Length": str(stream.length)},
+    )
 
-@API.get("/messages/delete")
+
+@API.post("/messages/delete")
+@API.get("/messages/delete", include_in_schema=False)
+@IPLimiter.limiter(max_calls=10, time=5)
 async def delete_messages(
     request: fastapi.Request, data: DeleteMessage
-) -> fastapi.responses.JSONResponse:
+) -> fastapi.responses.Response:
 
-    if not any(
-        data.email == conexion["email"] and data.password == conexion["password"]
-        for conexion in GATEWAY_CONEXIONS
-    ):
+    sender: str | None = await gateway_sender(data.email, data.password, data.session)
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Gateway mistake",
-                "message": "The credentials are not valid.",
-                "status": Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+    if sender is None:
 
-    result: bool | str = await Gateway.send_message(
+        return Responses.GATEWAY_INCORRECT_CREDENTIALS.response()
+
+    result: bool | str = await Gateway.delete_message(
         data.to,
-        {
-            "title": "BlackWell API - Actions -> Delete Message",
-            "from": data.from_,
-            "message id": data.message_id,
-            "action": "delete message",
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        },
+        ActionMessage(
+            type="action",
+            action="delete message",
+            from_=sender,
+            message_id=data.message_id,
+        ).to_message(),
     )
 
     if isinstance(result, str):
 
-        return fastapi.responses.JSONResponse(
-            content={
-                "title": "BlackWell API - Gateway mistake",
-                "message": result,
-                "status": Constants.INCORRECT_USERNAME_IN_THE_GATEWAY.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-        )
+        return gateway_mistake(result)
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Message Deleted",
-            "message": "The message was deleted.",
-            "status": Constants.OK.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
-    )
+    await delete_conversation_message(sender, data.to, data.message_id)
+
+    return Responses.MESSAGE_DELETED.response()
 
 
 """Exception Handlers."""
 
 
+def exception_content(
+    title: str, exc: fastapi.exceptions.HTTPException
+) -> Dict[str, Any]:
+
+    return {"title": title, "message": exc.detail, "date": DATE.now()}
+
+
 @API.exception_handler(fastapi.status.HTTP_429_TOO_MANY_REQUESTS)
 def rate_limit_exceeded(
     request: fastapi.Request, exc: fastapi.exceptions.HTTPException
-) -> fastapi.responses.JSONResponse:
+) -> FastJSONResponse:
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Rate Limit Exceeded",
-            "message": exc.detail,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        },
+    return FastJSONResponse(
+        content=exception_content("BlackWell API - Rate Limit Exceeded", exc),
         status_code=exc.status_code,
     )
 
@@ -643,16 +805,10 @@ def rate_limit_exceeded(
 @API.exception_handler(fastapi.status.HTTP_404_NOT_FOUND)
 async def not_found(
     request: fastapi.Request, exc: fastapi.exceptions.HTTPException
-) -> fastapi.responses.JSONResponse:
+) -> FastJSONResponse:
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Not Found",
-            "message": exc.detail,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        },
+    return FastJSONResponse(
+        content=exception_content("BlackWell API - Not Found", exc),
         status_code=exc.status_code,
     )
 
@@ -660,16 +816,10 @@ async def not_found(
 @API.exception_handler(fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY)
 async def unprocessable_entity(
     request: fastapi.Request, exc: fastapi.exceptions.HTTPException
-) -> fastapi.responses.JSONResponse:
+) -> FastJSONResponse:
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Unprocessable Entity",
-            "message": exc.detail,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        },
+    return FastJSONResponse(
+        content=exception_content("BlackWell API - Unprocessable Entity", exc),
         status_code=exc.status_code,
     )
 
@@ -677,16 +827,10 @@ async def unprocessable_entity(
 @API.exception_handler(fastapi.status.HTTP_503_SERVICE_UNAVAILABLE)
 async def overloaded(
     request: fastapi.Request, exc: fastapi.exceptions.HTTPException
-) -> fastapi.responses.JSONResponse:
+) -> FastJSONResponse:
 
-    return fastapi.responses.JSONResponse(
-        content={
-            "title": "BlackWell API - Overloaded",
-            "message": exc.detail,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        },
+    return FastJSONResponse(
+        content=exception_content("BlackWell API - Overloaded", exc),
         status_code=exc.status_code,
     )
 
@@ -0,0 +1,61 @@
+"""Microbenchmark of the validation of hex encoded media.
+
+Compares the old regex plus full decode against the bounded chunked decode:
+
+    STORAGE_ENGINE=memory python -m benchmarks.media_validation
+"""
+
+# Standard modules.
+
+import os
+import re
+import time
+import tracemalloc
+
+from typing import Callable, Tuple
+
+# Own modules.
+
+from core.media import Media
+
+
+def legacy(string: str) -> bool:
+
+    return bool(re.match(r"^[0-9a-fA-F]+$", string)) and (
+        round(len(bytes.fromhex(string)) / 1048576) <= 5
+    )
+
+
+def measure(
+    check: Callable[[str], object], string: str, runs: int = 20
+) -> Tuple[float, int]:
+
+    tracemalloc.start()
+    check(string)
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start: float = time.perf_counter()
+
+    for _ in range(runs):
+        check(string)
+
+    return (time.perf_counter() - start) / runs, peak
+
+
+if __name__ == "__main__":
+
+    for size in (64 * 1024, 1024 * 1024, 5 * 1024 * 1024):
+
+        string: str = (b"\x89PNG\r\n\x1a\n" + os.urandom(size - 8)).hex()
+
+        for name, check in (
+            ("legacy", legacy),
+            ("media", lambda string: Media.validate(string, "img")),
+        ):
+
+            seconds, peak = measure(check, string)
+            print(
+                f"{size // 1024:>5} KiB {name:>6} {seconds * 1e3:>8.2f} ms "
+                f"{peak / 1024:>8.0f} KiB peak"
+            )
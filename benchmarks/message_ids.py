@@ -0,0 +1,41 @@
+"""Microbenchmark of generating message ids.
+
+The legacy ids were 39 random digits, the snowflake ids are 13 characters
+that sort by creation time:
+
+    STORAGE_ENGINE=memory python -m benchmarks.message_ids
+"""
+
+# Standard modules.
+
+import timeit
+import uuid
+
+from typing import List
+
+# Own modules.
+
+from core.ids import new_id
+
+
+def legacy() -> str:
+
+    return str(uuid.uuid4().int)
+
+
+def main() -> None:
+
+    for name, function in (("uuid4", legacy), ("snowflake", new_id)):
+
+        runs: int = 500000
+        ids: List[str] = [function() for _ in range(10000)]
+
+        print(
+            f"{name:>10} {timeit.timeit(function, number=runs) / runs * 1e9:>6.0f} ns/id "
+            f"{len(ids[0]):>3} chars sorted={ids == sorted(ids)}"
+        )
+
+
+if __name__ == "__main__":
+
+    main()
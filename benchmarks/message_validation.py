@@ -0,0 +1,73 @@
+"""Microbenchmark of the validation of incoming messages, in messages per second.
+
+Compares the hand-written loops Parser used with the compiled message models:
+
+    STORAGE_ENGINE=memory python -m benchmarks.message_validation
+"""
+
+# Standard modules.
+
+import time
+import uuid
+
+from typing import Any, Callable, Dict
+
+# Own modules.
+
+from core.models import MESSAGE_ADAPTER, TextMessage
+from core.systems import Parser
+
+
+def legacy(message: Dict[str, Any]) -> Dict[str, Any] | bool:
+    """The parse_plane_text of Parser before the message models."""
+
+    for key in message.keys():
+
+        if key not in ["id", "type", "read", "from", "contain"]:
+            return False
+
+    for key, value in message.items():
+
+        if not isinstance(value, str):
+            return False
+
+        elif key == "id":
+
+            message["id"] = str(uuid.uuid4().int)
+            continue
+
+        elif key == "type" and value != "text":
+            return False
+
+    return message
+
+
+def measure(parse: Callable[[Dict[str, Any]], Any], count: int = 200000) -> float:
+
+    message: Dict[str, Any] = {
+        "id": "",
+        "type": "text",
+        "from": "bob",
+        "contain": "Hello there, how is it going?",
+    }
+    start: float = time.perf_counter()
+
+    for _ in range(count):
+        parse(dict(message))
+
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+
+    for name, parse in (
+        ("legacy parser", legacy),
+        ("parser shim", Parser().parse_plane_text),
+        ("text model", lambda message: TextMessage.model_validate(message)),
+        ("union adapter", MESSAGE_ADAPTER.validate_python),
+        (
+            "union + dump",
+            lambda message: MESSAGE_ADAPTER.validate_python(message).to_message(),
+        ),
+    ):
+        print(f"{name:>14} {measure(parse):>12,.0f} messages/s")
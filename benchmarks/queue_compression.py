@@ -0,0 +1,154 @@
+"""Storage ratio and CPU cost of compressing queued payloads.
+
+Packs and unpacks chat texts of a few sizes and hex media with every codec
+available (zstd needs the zstandard package), then the longest stall of the
+event loop while hex media is packed, to tune the QUEUE_COMPRESSION_* thresholds:
+
+    STORAGE_ENGINE=memory python -m benchmarks.queue_compression
+"""
+
+# Standard modules.
+
+import asyncio
+import os
+import random
+import time
+
+from typing import Any, Dict, List, Tuple
+
+# Own modules.
+
+from core.compression import PayloadCompressor, zstandard
+from core.schemas import generate_img_or_video_schema, generate_text_plane_schema
+
+WORDS: List[str] = (
+    "hello hi are we still on for tomorrow see you at the office i will be "
+    "late sorry thanks a lot can you send me the file later tonight ok sure "
+    "sounds good let me know when you arrive call me back please"
+).split()
+
+
+def text(size: int, generator: random.Random) -> str:
+
+    words: List[str] = []
+
+    while sum(len(word) + 1 for word in words) < size:
+        words.append(generator.choice(WORDS))
+
+    return " ".join(words)[:size]
+
+
+def measure(
+    compressor: PayloadCompressor, messages: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+
+    packed: List[Dict[str, Any]] = [compressor.pack(message) for message in messages]
+
+    for message in packed:
+        compressor.unpack(message)
+
+    return compressor.report()
+
+
+async def stall(compressor: PayloadCompressor, messages: List[Dict[str, Any]]) -> float:
+    """The longest gap, in milliseconds, between ticks of the loop while packing."""
+
+    longest: float = 0.0
+    done: bool = False
+
+    async def ticker() -> None:
+
+        nonlocal longest
+        last: float = time.perf_counter()
+
+        while not done:
+
+            await asyncio.sleep(0)
+            now: float = time.perf_counter()
+            longest = max(longest, now - last)
+            last = now
+
+    task: asyncio.Task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+
+    # Yielding between messages, as separate requests would.
+    for message in messages:
+
+        await compressor.pack_async(message)
+        await asyncio.sleep(0)
+
+    done = True
+    await task
+
+    return longest * 1000
+
+
+def main() -> None:
+
+    generator: random.Random = random.Random(7)
+    corpora: List[Tuple[str, List[Dict[str, Any]]]] = [
+        (
+            f"text {size}B",
+            [
+                generate_text_plane_schema("bob", text(size, generator))
+                for _ in range(5000)
+            ],
+        )
+        for size in (64, 256, 1024, 4096)
+    ] + [
+        (
+            "hex media 64KiB",
+            [
+                generate_img_or_video_schema("bob", "img", os.urandom(32 * 1024).hex())
+                for _ in range(50)
+            ],
+        )
+    ]
+
+    codecs: List[Tuple[str, Dict[str, Any]]] = [("zlib", {"kind": "zlib"})]
+
+    if zstandard is not None:
+
+        codecs.append(("zstd", {"kind": "zstd"}))
+
+    else:
+
+        print("zstandard is not installed, only zlib is measured")
+
+    print(
+        f"{'corpus':>16} {'codec':>10} {'ratio':>6} {'packed':>6} "
+        f"{'pack us':>8} {'unpack us':>9}"
+    )
+
+    for corpus, messages in corpora:
+
+        for name, options in codecs:
+
+            report: Dict[str, Any] = measure(
+                PayloadCompressor(min_size=0, max_ratio=1.0, **options), messages
+            )
+
+            print(
+                f"{corpus:>16} {name:>10} {report['ratio']:>6.3f} "
+                f"{report['compressed'] / len(messages):>6.0%} "
+                f"{report['compress-microseconds']:>8.1f} "
+                f"{report['decompress-microseconds']:>9.1f}"
+            )
+
+    media: List[Dict[str, Any]] = corpora[-1][1]
+
+    print(f"\n{'codec':>10} {'thread size':>11} {'loop stall ms':>13}")
+
+    for name, options in codecs:
+
+        for thread_size in (len(media[0]["contain"]) + 1, 16384):
+
+            print(
+                f"{name:>10} {thread_size:>11} "
+                f"{asyncio.run(stall(PayloadCompressor(thread_size=thread_size, **options), media)):>13.2f}"
+            )
+
+
+if __name__ == "__main__":
+
+    main()
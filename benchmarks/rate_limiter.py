@@ -0,0 +1,73 @@
+"""Microbenchmark of the per-request cost of the rate limiter states.
+
+The cost per hit has to stay flat as the number of distinct clients grows:
+
+    STORAGE_ENGINE=memory python -m benchmarks.rate_limiter
+"""
+
+# Standard modules.
+
+import asyncio
+import os
+import tempfile
+import time
+
+from typing import List
+
+# Own modules.
+
+from core.limiter import (
+    DatabaseLimiterState,
+    MemoryLimiterState,
+    MmapLimiterState,
+    SlidingWindowLimiter,
+)
+
+
+async def measure(
+    limiter: SlidingWindowLimiter, clients: int, hits: int = 200000
+) -> float:
+
+    keys: List[str] = [
+        f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)
+    ]
+
+    for key in keys:
+        await limiter.hit(key)
+
+    start: float = time.perf_counter()
+
+    for index in range(hits):
+        await limiter.hit(keys[index % clients])
+
+    return (time.perf_counter() - start) / hits
+
+
+async def main() -> None:
+
+    path: str = os.path.join(tempfile.gettempdir(), "blackwell-limiter-benchmark")
+
+    for name, state in (
+        ("memory", MemoryLimiterState()),
+        ("mmap", MmapLimiterState(path)),
+        ("database", DatabaseLimiterState()),
+    ):
+
+        for clients in (10, 1000, 10000, 100000):
+
+            limiter: SlidingWindowLimiter = SlidingWindowLimiter(
+                10, 60, state, f"{name}-{clients}"
+            )
+            hits: int = 20000 if name == "database" else 200000
+
+            print(
+                f"{name:>8} {clients:>7} clients "
+                f"{await measure(limiter, clients, hits) * 1e9:>8.0f} ns/hit"
+            )
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""Microbenchmark of building a static response envelope.
+
+The legacy handlers formatted the date and serialized the whole dict per
+request, the cached envelopes only append the date of the minute:
+
+    STORAGE_ENGINE=memory python -m benchmarks.responses
+"""
+
+# Standard modules.
+
+import datetime
+import timeit
+
+# Own modules.
+
+from core.constants import Constants
+from core.responses import Responses
+from core.serializer import SERIALIZER, FastJSONResponse
+
+
+def legacy() -> bytes:
+
+    return FastJSONResponse(
+        content={
+            "title": "BlackWell API - Message Sent",
+            "message": "The message was sent.",
+            "status": Constants.OK.value,
+            "date": datetime.datetime.strftime(
+                datetime.datetime.now(), "%Y-%m-%d %H:%M"
+            ),
+        }
+    ).body
+
+
+def cached() -> bytes:
+
+    return Responses.MESSAGE_SENT.response().body
+
+
+def main() -> None:
+
+    assert SERIALIZER.loads(legacy()) == SERIALIZER.loads(cached())
+
+    for name, function in (("legacy", legacy), ("cached", cached)):
+
+        runs: int = 200000
+        print(
+            f"{name:>8} {timeit.timeit(function, number=runs) / runs * 1e9:>8.0f} ns/response"
+        )
+
+
+if __name__ == "__main__":
+
+    main()
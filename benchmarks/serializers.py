@@ -0,0 +1,62 @@
+"""Microbenchmark of the JSON serializers on gateway frames.
+
+Encodes a backlog of text and media frames with every available backend, and
+compares encoding a frame per socket against sharing one encoded Frame:
+
+    STORAGE_ENGINE=memory python -m benchmarks.serializers
+"""
+
+# Standard modules.
+
+import json
+import os
+import time
+
+from typing import Any, Callable, Dict, List
+
+# Own modules.
+
+from core.schemas import generate_img_or_video_schema, generate_text_plane_schema
+from core.serializer import SERIALIZER, Frame, create_serializer
+
+
+def measure(encode: Callable[[Any], Any], frames: List[Dict[str, Any]]) -> float:
+
+    start: float = time.perf_counter()
+
+    for frame in frames:
+        encode(frame)
+
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+
+    backlog: List[Dict[str, Any]] = [
+        generate_text_plane_schema("bob", "Hello there, how is it going?" * 4)
+        for _ in range(20000)
+    ] + [
+        generate_img_or_video_schema("bob", "img", os.urandom(256 * 1024).hex())
+        for _ in range(50)
+    ]
+
+    print(f"{'stdlib send_json':>18} {measure(json.dumps, backlog) * 1e3:>8.1f} ms")
+
+    for kind in ("json", "msgspec", "orjson"):
+
+        serializer: Any = create_serializer(kind)
+
+        if serializer.name == kind:
+            print(f"{kind:>18} {measure(serializer.dumps, backlog) * 1e3:>8.1f} ms")
+
+    sockets: int = 5
+    media: List[Dict[str, Any]] = backlog[-50:]
+
+    print(
+        f"{'per socket x5':>18} "
+        f"{measure(lambda frame: [SERIALIZER.dumps(frame).decode() for _ in range(sockets)], media) * 1e3:>8.1f} ms"
+    )
+    print(
+        f"{'shared Frame x5':>18} "
+        f"{measure(lambda frame: [Frame(frame).text] * sockets, media) * 1e3:>8.1f} ms"
+    )
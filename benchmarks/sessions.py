@@ -0,0 +1,58 @@
+"""Microbenchmark of authenticating a request.
+
+Email and password requests scan every gateway connection, sessions cost one
+HMAC the first time and a dictionary lookup afterwards, plus the revocation
+lookup of the repository (not measured here):
+
+    STORAGE_ENGINE=memory python -m benchmarks.sessions
+"""
+
+# Standard modules.
+
+import timeit
+
+from typing import Any, Dict, List
+
+# Own modules.
+
+from core.sessions import SessionManager
+
+
+def main() -> None:
+
+    for users in (100, 10000, 100000):
+
+        conexions: List[Dict[str, Any]] = [
+            {"username": f"user{i}", "email": f"user{i}@x.com", "password": "pw"}
+            for i in range(users)
+        ]
+        email: str = f"user{users - 1}@x.com"
+        sessions: SessionManager = SessionManager(cache_size=0)
+        cached: SessionManager = SessionManager()
+        token: str = sessions.issue(f"user{users - 1}")["session"]
+        cached.key = sessions.key
+
+        runs: int = 2000
+
+        for name, function in (
+            (
+                "scan",
+                lambda: next(
+                    c["username"]
+                    for c in conexions
+                    if c["email"] == email and c["password"] == "pw"
+                ),
+            ),
+            ("hmac", lambda: sessions.claims(token)),
+            ("cached", lambda: cached.claims(token)),
+        ):
+
+            print(
+                f"{users:>7} users {name:>7} "
+                f"{timeit.timeit(function, number=runs) / runs * 1e9:>10.0f} ns/request"
+            )
+
+
+if __name__ == "__main__":
+
+    main()
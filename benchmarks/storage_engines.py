@@ -0,0 +1,102 @@
+"""Benchmark of the repository layer on the selected storage engine.
+
+Run from the repository root, once per engine, to compare their overheads:
+
+    STORAGE_ENGINE=memory python -m benchmarks.storage_engines
+    STORAGE_ENGINE=mongodb MongoDB=mongodb://localhost:27017 python -m benchmarks.storage_engines
+"""
+
+# Standard modules.
+
+import asyncio
+import sys
+import time
+import uuid
+
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Own modules.
+
+from core.config import STORAGE_ENGINE
+from core.db.primary import post_user, get_token_with_username, fetch_user
+from core.db.secundary import (
+    ensure_indexes,
+    post_temp_user,
+    claim_temp_user,
+    add_message_queue_history,
+    find_possible_user,
+)
+from core.schemas import generate_temp_user_schema, generate_text_plane_schema
+
+
+async def measure(
+    name: str, operation: Callable[[int], Awaitable[Any]], count: int
+) -> None:
+
+    start: float = time.perf_counter()
+
+    for index in range(count):
+        await operation(index)
+
+    elapsed: float = time.perf_counter() - start
+
+    print(
+        f"{name:<28} {count / elapsed:>12,.0f} ops/s {elapsed / count * 1e6:>10.1f} us/op"
+    )
+
+
+async def main(count: int) -> None:
+
+    await ensure_indexes()
+
+    run: str = uuid.uuid4().hex[:8]
+    codes: List[str] = []
+
+    async def register(index: int) -> None:
+
+        user: Dict[str, Any] = generate_temp_user_schema(
+            username=f"bench-{run}-{index}",
+            email=f"bench-{run}-{index}@gmail.com",
+            password="bench",
+        )
+
+        await find_possible_user(user["username"], user["email"])
+        await post_temp_user(user)
+        codes.append(user["verification"]["code"])
+
+    async def verify(index: int) -> None:
+
+        user: Dict[str, Any] | bool = await claim_temp_user(codes[index])
+
+        if isinstance(user, dict):
+
+            del user["verification"]
+            await post_user(user)
+
+    async def lookup(index: int) -> None:
+
+        await get_token_with_username(f"bench-{run}-{index}")
+
+    async def credentials(index: int) -> None:
+
+        await fetch_user(f"bench-{run}-{index}@gmail.com", "bench")
+
+    async def queue(index: int) -> None:
+
+        await add_message_queue_history(
+            f"bench-{run}-{index % 100}",
+            generate_text_plane_schema(from_="bench", contain="benchmark message"),
+        )
+
+    print(f"engine: {STORAGE_ENGINE}, operations: {count}")
+
+    await measure("register (temporal)", register, count)
+    await measure("verify (claim + insert)", verify, count)
+    await measure("lookup by username", lookup, count)
+    await measure("lookup by credentials", credentials, count)
+    await measure("queue history append", queue, count)
+
+
+if __name__ == "__main__":
+
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,225 @@
+"""The compression of queued payloads of BlackWell."""
+
+# Standard modules.
+
+import asyncio
+import time
+import zlib
+
+from typing import Any, Dict, Tuple
+
+# Third party modules.
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Own modules.
+
+from .config import (
+    QUEUE_COMPRESSION,
+    QUEUE_COMPRESSION_LEVEL,
+    QUEUE_COMPRESSION_MAX_RATIO,
+    QUEUE_COMPRESSION_MIN_SIZE,
+    QUEUE_COMPRESSION_THREAD_SIZE,
+)
+
+
+class ZlibCodec:
+
+    name: str = "zlib"
+
+    def __init__(self, level: int) -> None:
+
+        self.level: int = level
+
+    def compress(self, data: bytes) -> bytes:
+
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+
+        return zlib.decompress(data)
+
+
+class ZstdCodec:
+
+    name: str = "zstd"
+
+    def __init__(self, level: int) -> None:
+
+        self.compressor: Any = zstandard.ZstdCompressor(level=level)
+        self.decompressor: Any = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+
+        return self.compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+
+        return self.decompressor.decompress(data)
+
+
+class PayloadCompressor:
+    """Compressing the contain of queued entries, undone before they are replayed.
+
+    A compressed entry keeps its contain as bytes and names the codec in
+    "encoding"; entries stored before, or too small to gain, are left as they are.
+    """
+
+    def __init__(
+        self,
+        kind: str = QUEUE_COMPRESSION,
+        level: int = QUEUE_COMPRESSION_LEVEL,
+        min_size: int = QUEUE_COMPRESSION_MIN_SIZE,
+        max_ratio: float = QUEUE_COMPRESSION_MAX_RATIO,
+        thread_size: int = QUEUE_COMPRESSION_THREAD_SIZE,
+    ) -> None:
+
+        # Every installed codec decodes, whichever one is writing now.
+        self.codecs: Dict[str, ZlibCodec | ZstdCodec] = {"zlib": ZlibCodec(level)}
+
+        if zstandard is not None:
+            self.codecs["zstd"] = ZstdCodec(level)
+
+        if kind == "auto":
+            kind = "zstd" if zstandard is not None else "zlib"
+
+        if kind == "none":
+            self.codec: ZlibCodec | ZstdCodec | None = None
+
+        elif kind in ("zstd", "zlib"):
+            self.codec = self.codecs.get(kind, self.codecs["zlib"])
+
+        else:
+            raise ValueError(f"Unknown queue compression: {kind}")
+
+        self.min_size: int = min_size
+        self.max_ratio: float = max_ratio
+        self.thread_size: int = thread_size
+        self.metrics: Dict[str, Any] = {
+            "compressed": 0,
+            "uncompressed": 0,
+            "threaded": 0,
+            "raw-bytes": 0,
+            "stored-bytes": 0,
+            "compress-seconds": 0.0,
+            "decompressed": 0,
+            "decompress-seconds": 0.0,
+        }
+
+    def pack(self, message: Dict[str, Any]) -> Dict[str, Any]:
+
+        raw: bytes | None = self.payload(message)
+
+        if raw is None:
+            return message
+
+        return self.store(message, raw, self.compress(raw))
+
+    async def pack_async(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Packing on the loop, or in a thread for contents as large as hex media."""
+
+        raw: bytes | None = self.payload(message)
+
+        if raw is None:
+            return message
+
+        elif len(raw) < self.thread_size:
+            return self.store(message, raw, self.compress(raw))
+
+        # Both codecs release the GIL, only the metrics are kept on the loop.
+        self.metrics["threaded"] += 1
+
+        return self.store(message, raw, await asyncio.to_thread(self.compress, raw))
+
+    def payload(self, message: Dict[str, Any]) -> bytes | None:
+
+        contain: Any = message.get("contain")
+
+        if self.codec is None or not isinstance(contain, str):
+            return None
+
+        return contain.encode("utf-8")
+
+    def compress(self, raw: bytes) -> Tuple[bytes | None, float]:
+
+        if len(raw) < self.min_size:
+            return None, 0.0
+
+        start: float = time.perf_counter()
+        packed: bytes = self.codec.compress(raw)
+
+        return packed, time.perf_counter() - start
+
+    def store(
+        self,
+        message: Dict[str, Any],
+        raw: bytes,
+        compressed: Tuple[bytes | None, float],
+    ) -> Dict[str, Any]:
+
+        packed, seconds = compressed
+        self.metrics["raw-bytes"] += len(raw)
+        self.metrics["compress-seconds"] += seconds
+
+        if packed is not None and len(packed) <= len(raw) * self.max_ratio:
+
+            self.metrics["compressed"] += 1
+            self.metrics["stored-bytes"] += len(packed)
+
+            return {**message, "contain": packed, "encoding": self.codec.name}
+
+        self.metrics["uncompressed"] += 1
+        self.metrics["stored-bytes"] += len(raw)
+
+        return message
+
+    def unpack(self, message: Dict[str, Any]) -> Dict[str, Any]:
+
+        encoding: str | None = message.get("encoding")
+
+        if encoding is None:
+            return message
+
+        elif encoding not in self.codecs:
+            raise ValueError(f"Unknown queue compression: {encoding}")
+
+        start: float = time.perf_counter()
+        contain: str = (
+            self.codecs[encoding].decompress(message["contain"]).decode("utf-8")
+        )
+        self.metrics["decompress-seconds"] += time.perf_counter() - start
+        self.metrics["decompressed"] += 1
+
+        return {
+            **{key: value for key, value in message.items() if key != "encoding"},
+            "contain": contain,
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """The metrics with the storage ratio and the microseconds per entry."""
+
+        metrics: Dict[str, Any] = dict(self.metrics)
+        entries: int = metrics["compressed"] + metrics["uncompressed"]
+
+        metrics["codec"] = self.codec.name if self.codec is not None else "none"
+        metrics["ratio"] = (
+            metrics["stored-bytes"] / metrics["raw-bytes"]
+            if metrics["raw-bytes"]
+            else 1.0
+        )
+        metrics["compress-microseconds"] = (
+            metrics["compress-seconds"] / entries * 1e6 if entries else 0.0
+        )
+        metrics["decompress-microseconds"] = (
+            metrics["decompress-seconds"] / metrics["decompressed"] * 1e6
+            if metrics["decompressed"]
+            else 0.0
+        )
+
+        return metrics
+
+
+COMPRESSOR: PayloadCompressor = PayloadCompressor()
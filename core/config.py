@@ -0,0 +1,230 @@
+"""The configuration of BlackWell API."""
+
+# Standard modules.
+
+import datetime
+import os
+import tempfile
+
+from typing import Any, Dict, List
+
+# Third party modules.
+
+import dotenv
+
+dotenv.load_dotenv()
+
+
+def env_int(name: str, default: int) -> int:
+    """Reading an integer setting from the environment."""
+
+    value: str | None = os.environ.get(name)
+
+    return int(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Reading a boolean setting ("1", "true", "yes" or "on") from the environment."""
+
+    value: str | None = os.environ.get(name)
+
+    if value in (None, ""):
+        return default
+
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def env_seconds(name: str, default: datetime.timedelta) -> datetime.timedelta:
+    """Reading a duration in seconds from the environment."""
+
+    value: str | None = os.environ.get(name)
+
+    return (
+        datetime.timedelta(seconds=int(value)) if value not in (None, "") else default
+    )
+
+
+# Storage Section.
+
+# "mongodb" (the MongoDB environment variable holds the URI) or "memory".
+STORAGE_ENGINE: str = os.environ.get("STORAGE_ENGINE", "mongodb")
+
+
+def read_routing(category: str, mode: str) -> Dict[str, Any]:
+    """Reading the read preference, max staleness and tags of a category."""
+
+    return {
+        "mode": os.environ.get(f"READ_PREFERENCE_{category.upper()}", mode),
+        "max-staleness": env_int(f"READ_MAX_STALENESS_{category.upper()}", -1),
+        "tags": os.environ.get(f"READ_TAGS_{category.upper()}", ""),
+    }
+
+
+# Credential checks and read-your-writes paths always use "primary".
+READ_ROUTING: Dict[str, Dict[str, Any]] = {
+    "primary": read_routing("primary", "primary"),
+    "profile": read_routing("profile", "secondaryPreferred"),
+    "lookup": read_routing("lookup", "secondaryPreferred"),
+    "backlog": read_routing("backlog", "secondaryPreferred"),
+}
+
+# Secrets Section.
+
+# "database" (the 'systems' collection), "env" (SECRET_<ID> variables) or "file".
+SECRETS_BACKEND: str = os.environ.get("SECRETS_BACKEND", "database")
+SECRETS_FILE: str = os.environ.get("SECRETS_FILE", "secrets.json")
+SECRETS_TTL: int = env_int("SECRETS_TTL", 300)
+
+# Session Section.
+
+# Seconds a session token issued at /login stays valid.
+SESSION_TTL: int = env_int("SESSION_TTL", 3600)
+
+# Verified tokens remembered, a hit skips decoding and the HMAC.
+SESSION_CACHE_SIZE: int = env_int("SESSION_CACHE_SIZE", 10000)
+
+# Signing with a random key of the process instead of the "session key" secret,
+# only sound with one process, like the memory engine always is.
+SESSION_EPHEMERAL_KEY: bool = env_bool(
+    "SESSION_EPHEMERAL_KEY", STORAGE_ENGINE == "memory"
+)
+
+# Rate Limiter Section.
+
+# "memory" (per process), "mmap" (workers of one host) or "database" (every host).
+LIMITER_BACKEND: str = os.environ.get("LIMITER_BACKEND", "memory")
+# Most client keys the memory state remembers before evicting the least recent.
+LIMITER_MAX_KEYS: int = env_int("LIMITER_MAX_KEYS", 100000)
+LIMITER_MMAP_PATH: str = os.environ.get(
+    "LIMITER_MMAP_PATH",
+    os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+        "blackwell-limiter",
+    ),
+)
+# Buckets of 8 slots of 24 bytes, 65536 buckets map 12 MiB.
+LIMITER_MMAP_BUCKETS: int = env_int("LIMITER_MMAP_BUCKETS", 65536)
+
+# Serializer Section.
+
+# "auto" (orjson, then msgspec, then stdlib), "orjson", "msgspec" or "json".
+SERIALIZER_BACKEND: str = os.environ.get("SERIALIZER_BACKEND", "auto")
+
+# Media Section.
+
+# Largest decoded image or video, in bytes.
+MEDIA_MAX_SIZE: int = env_int("MEDIA_MAX_SIZE", 5 * 1024 * 1024)
+# Bytes of an upload kept in memory before it is spooled to a temporary file.
+UPLOAD_SPOOL_SIZE: int = env_int("UPLOAD_SPOOL_SIZE", 1024 * 1024)
+# Bytes read from the media store per chunk of a download, GridFS uses 255 KiB.
+MEDIA_CHUNK_SIZE: int = env_int("MEDIA_CHUNK_SIZE", 255 * 1024)
+
+# Image Processing Section.
+
+# Processes downscaling images (needs Pillow), 0 keeps only the originals.
+IMAGE_WORKERS: int = env_int("IMAGE_WORKERS", 2)
+# Square sizes, in pixels, of the avatars made from every profile image.
+AVATAR_SIZES: List[int] = sorted(
+    int(size) for size in os.environ.get("AVATAR_SIZES", "64,128,256").split(",")
+)
+THUMBNAIL_SIZE: int = env_int("THUMBNAIL_SIZE", 320)
+# "WEBP", "JPEG" or "PNG".
+IMAGE_FORMAT: str = os.environ.get("IMAGE_FORMAT", "WEBP").upper()
+IMAGE_QUALITY: int = env_int("IMAGE_QUALITY", 80)
+# Larger images are refused as decompression bombs.
+IMAGE_MAX_PIXELS: int = env_int("IMAGE_MAX_PIXELS", 40000000)
+
+# Send Quota Section.
+
+QUOTA_PERIOD: int = env_int("QUOTA_PERIOD", 60)
+
+# Messages and bytes every account may send per type in each QUOTA_PERIOD.
+SEND_QUOTAS: Dict[str, Dict[str, int]] = {
+    "text": {
+        "messages": env_int("QUOTA_TEXT_MESSAGES", 120),
+        "bytes": env_int("QUOTA_TEXT_BYTES", 256 * 1024),
+    },
+    "img": {
+        "messages": env_int("QUOTA_IMG_MESSAGES", 20),
+        "bytes": env_int("QUOTA_IMG_BYTES", 32 * 1024 * 1024),
+    },
+    "video": {
+        "messages": env_int("QUOTA_VIDEO_MESSAGES", 5),
+        "bytes": env_int("QUOTA_VIDEO_BYTES", 64 * 1024 * 1024),
+    },
+}
+
+# Most messages one /messages/send-batch request may carry.
+SEND_BATCH_MAX_SIZE: int = env_int("SEND_BATCH_MAX_SIZE", 100)
+
+# Email Section.
+
+EMAIL_SMTP_HOST: str = os.environ.get("EMAIL_SMTP_HOST", "smtp.gmail.com")
+EMAIL_SMTP_PORT: int = env_int("EMAIL_SMTP_PORT", 465)
+EMAIL_SMTP_SSL: bool = env_bool("EMAIL_SMTP_SSL", True)
+EMAIL_SMTP_LOGIN: bool = env_bool("EMAIL_SMTP_LOGIN", True)
+EMAIL_SMTP_TIMEOUT: int = env_int("EMAIL_SMTP_TIMEOUT", 30)
+# Used when the "gmail" secret does not exist, e.g. against a local SMTP stand-in.
+EMAIL_SENDER: str = os.environ.get("EMAIL_SENDER", "blackwell@localhost")
+EMAIL_WORKERS: int = env_int("EMAIL_WORKERS", 2)
+EMAIL_BATCH_SIZE: int = env_int("EMAIL_BATCH_SIZE", 20)
+EMAIL_QUEUE_SIZE: int = env_int("EMAIL_QUEUE_SIZE", 10000)
+EMAIL_RETRIES: int = env_int("EMAIL_RETRIES", 5)
+EMAIL_BACKOFF: int = env_int("EMAIL_BACKOFF", 2)
+
+# Message Id Section.
+
+# 0-1023, unique per process generating ids, -1 claims a free one in the registry.
+NODE_ID: int = env_int("NODE_ID", -1)
+
+# Seconds a claimed node stays reserved, renewed every third of it.
+NODE_LEASE: int = env_int("NODE_LEASE", 60)
+
+# Queue History Section.
+
+QUEUE_HISTORY_RETENTION: Dict[str, datetime.timedelta] = {
+    "text": env_seconds("QUEUE_RETENTION_TEXT", datetime.timedelta(days=60)),
+    "img": env_seconds("QUEUE_RETENTION_IMG", datetime.timedelta(days=14)),
+    "video": env_seconds("QUEUE_RETENTION_VIDEO", datetime.timedelta(days=7)),
+    "action": env_seconds("QUEUE_RETENTION_ACTION", datetime.timedelta(days=60)),
+}
+
+QUEUE_HISTORY_SWEEP_DELETES_PER_SECOND: int = env_int(
+    "QUEUE_SWEEP_DELETES_PER_SECOND", 100
+)
+QUEUE_HISTORY_SWEEP_INTERVAL: int = env_int("QUEUE_SWEEP_INTERVAL", 60)
+QUEUE_HISTORY_SWEEP_JITTER: int = env_int("QUEUE_SWEEP_JITTER", 10)
+
+# Most messages and bytes queued per user, an append past either compacts the queue.
+QUEUE_MAX_MESSAGES: int = env_int("QUEUE_MAX_MESSAGES", 1000)
+# A queue is one document, MongoDB caps them at 16 MiB with the entry fields.
+QUEUE_MAX_BYTES: int = env_int("QUEUE_MAX_BYTES", 8 * 1024 * 1024)
+
+# "media-first" drops the oldest img and video before any text, "oldest" any type.
+QUEUE_OVERFLOW_POLICY: str = os.environ.get("QUEUE_OVERFLOW_POLICY", "media-first")
+# Share of the caps a compaction trims down to, leaving room for the next appends.
+QUEUE_LOW_WATER: float = float(os.environ.get("QUEUE_LOW_WATER", 0.9))
+
+QUEUE_COMPACTION_INTERVAL: int = env_int("QUEUE_COMPACTION_INTERVAL", 900)
+
+# "auto" (zstd when the zstandard package is installed, else zlib), "zstd", "zlib" or "none".
+QUEUE_COMPRESSION: str = os.environ.get("QUEUE_COMPRESSION", "auto")
+QUEUE_COMPRESSION_LEVEL: int = env_int("QUEUE_COMPRESSION_LEVEL", 3)
+# Contents shorter than this are stored as they are, and so is any that shrinks less.
+QUEUE_COMPRESSION_MIN_SIZE: int = env_int("QUEUE_COMPRESSION_MIN_SIZE", 64)
+QUEUE_COMPRESSION_MAX_RATIO: float = float(
+    os.environ.get("QUEUE_COMPRESSION_MAX_RATIO", 0.9)
+)
+# Contents from this size (hex media) are compressed in a thread, off the event loop.
+QUEUE_COMPRESSION_THREAD_SIZE: int = env_int("QUEUE_COMPRESSION_THREAD_SIZE", 16384)
+
+# Conversation History Section.
+
+# Messages per page of /messages/history, a client may ask for up to the maximum.
+HISTORY_PAGE_SIZE: int = env_int("HISTORY_PAGE_SIZE", 50)
+HISTORY_MAX_PAGE_SIZE: int = env_int("HISTORY_MAX_PAGE_SIZE", 200)
+
+# Metrics Section.
+
+# The "token" header /metrics asks for, empty keeps the endpoint disabled.
+METRICS_TOKEN: str = os.environ.get("METRICS_TOKEN", "")
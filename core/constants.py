@@ -23,6 +23,7 @@ class Constants(Enum):
     USER_NOT_FOUND: str = "user not found"
     USER_EXISTS: str = "user exists"
     USER_DELETED: str = "user deleted"
+    INCORRECT_SESSION: str = "incorrect session"
 
     EMAIL_AND_PASSWORD_IS_NOT_VALID: str = "email and password is not valid"
     EMAIL_AND_PASSWORD_IS_NOT_VALID_OR_USER_NOT_EXISTS: str = (
@@ -45,5 +46,10 @@ class Constants(Enum):
     INCORRECT_SIZE_IMAGE: str = "incorrect size image"
     INCORRECT_SIZE_VIDEO: str = "incorrect size video"
 
+    SEND_QUOTA_EXCEEDED: str = "send quota exceeded"
+
+    MEDIA_NOT_FOUND: str = "media not found"
+    INCORRECT_CURSOR: str = "incorrect cursor"
+
     INVALID_USER_IN_CONCTACTS: str = "invalid user in contacts"
     USER_PROFILE_NOT_FOUND: str = "user profile not found"
@@ -0,0 +1,230 @@
+"""The storage engines of BlackWell."""
+
+# Standard modules.
+
+import datetime
+import os
+
+from typing import IO, Any, AsyncIterator, Dict, List, Protocol, Tuple
+
+# Own modules.
+
+from ..config import STORAGE_ENGINE
+
+
+class Repository(Protocol):
+    """Every storage operation of BlackWell, one method per domain operation.
+
+    The rules of the domain (token lookups, compaction, conversation ids,
+    compression) stay in core.db.primary and core.db.secundary, an engine only
+    stores and reads back. Writes refused by a unique key return False.
+    """
+
+    # Setup.
+
+    async def migrate(self) -> None:
+        """Bringing documents of older versions to the current shape."""
+
+    async def create_indexes(self) -> None: ...
+
+    async def unique_indexes(self) -> bool:
+        """Whether the unique username and email indexes of the users exist."""
+
+    # Secrets.
+
+    async def get_secret(self, id: str) -> Dict[str, Any] | None: ...
+
+    # Users.
+
+    async def insert_user(self, user: Dict[str, Any]) -> bool: ...
+
+    async def get_user(self, token: str) -> Dict[str, Any] | None: ...
+
+    async def find_user(self, email: str, password: str) -> Dict[str, Any] | None: ...
+
+    async def find_username(self, username: str) -> Dict[str, Any] | None:
+        """The token and username of a user, as {"_id": ..., "username": ...}."""
+
+    async def get_profile(self, username: str) -> Dict[str, Any] | None: ...
+
+    async def user_taken(self, username: str, email: str) -> bool:
+        """Whether a user has the username or the email, regardless of case."""
+
+    async def delete_user(self, email: str, password: str) -> bool: ...
+
+    async def set_profile(self, token: str, profile: str) -> bool: ...
+
+    async def set_profile_media(
+        self, token: str, media: Dict[str, Any] | None, profile: str
+    ) -> Dict[str, Any] | None:
+        """Replacing the profile, returning the media replaced or None without user."""
+
+    async def has_contact(self, token: str, contact: str) -> bool: ...
+
+    async def add_contact(self, username: str, contact: str) -> bool: ...
+
+    async def remove_contact(self, username: str, contact: str) -> bool: ...
+
+    def all_users(self, fields: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Every user, only with the fields given."""
+
+    # Temporal users.
+
+    async def insert_temp_user(self, user: Dict[str, Any]) -> bool: ...
+
+    async def delete_temp_user(self, id: str) -> bool: ...
+
+    async def claim_temp_user(
+        self, code: str, now: datetime.datetime
+    ) -> Dict[str, Any] | None:
+        """Taking and deleting the unexpired temporal user of a code, only once."""
+
+    # Queue History.
+
+    async def get_queue(
+        self, token: str, primary: bool = False
+    ) -> Dict[str, Any] | None:
+        """A queue, read from a secondary unless primary, which has the latest writes."""
+
+    async def push_queue(
+        self,
+        token: str,
+        username: str,
+        messages: List[Dict[str, Any]],
+        size: int,
+        max_messages: int,
+        max_bytes: int,
+    ) -> bool:
+        """Appending to a queue, False when its counters would pass the caps."""
+
+    async def pull_queue(self, token: str, ids: List[str]) -> None: ...
+
+    async def pull_queued(
+        self, token: str, id: str, from_: str
+    ) -> List[Dict[str, Any]]:
+        """Removing the entries of an id and a sender, returning the ones removed."""
+
+    async def discount_queue(self, token: str, count: int, size: int) -> None: ...
+
+    async def rewrite_queue(
+        self, token: str, version: int | None, messages: List[Dict[str, Any]], size: int
+    ) -> bool:
+        """Replacing the messages if the version is still the one read, else False."""
+
+    async def delete_queue(self, token: str) -> bool: ...
+
+    def all_queues(self) -> AsyncIterator[str]: ...
+
+    def expired_queues(self, now: datetime.datetime) -> AsyncIterator[str]: ...
+
+    async def expire_queue(self, token: str, now: datetime.datetime) -> None: ...
+
+    # Actions.
+
+    async def get_actions(
+        self, token: str, primary: bool = False
+    ) -> List[Dict[str, Any]] | None: ...
+
+    async def push_actions(self, token: str, actions: List[Dict[str, Any]]) -> None: ...
+
+    async def pull_actions(self, token: str, actions: List[Dict[str, Any]]) -> None: ...
+
+    async def delete_actions(self, token: str) -> bool: ...
+
+    def expired_actions(self, now: datetime.datetime) -> AsyncIterator[str]: ...
+
+    async def expire_actions(self, token: str, now: datetime.datetime) -> None: ...
+
+    # Conversation History.
+
+    async def insert_history(self, entries: List[Dict[str, Any]]) -> None:
+        """Appending entries, the ones of an id already stored are skipped."""
+
+    async def delete_history(self, id: str, conversation: str, from_: str) -> bool: ...
+
+    async def history_page(
+        self, conversation: str, before: str, limit: int, primary: bool = False
+    ) -> List[Dict[str, Any]]:
+        """The entries older than the before id (any when empty), newest first."""
+
+    async def get_conversation(self, id: str) -> Dict[str, Any] | None: ...
+
+    async def set_conversation(
+        self,
+        id: str,
+        members: List[str],
+        last_message: Dict[str, Any],
+        updated_at: datetime.datetime,
+    ) -> None: ...
+
+    async def delete_conversation(self, id: str) -> None: ...
+
+    async def conversations_of(
+        self, username: str, limit: int
+    ) -> List[Dict[str, Any]]: ...
+
+    # Media.
+
+    async def put_media(
+        self, source: IO[bytes], filename: str, metadata: Dict[str, Any] | None
+    ) -> str: ...
+
+    async def get_media(self, id: str) -> Any | None:
+        """A stream with metadata, length and async read(size), None when missing."""
+
+    async def delete_media(self, id: str) -> bool: ...
+
+    # Rate limits.
+
+    async def increment_window(
+        self, key: str, window: int, period: float, amount: int
+    ) -> Tuple[int, int]:
+        """Counting in a window, rolled over atomically, returning current and previous."""
+
+    async def decrement_window(self, key: str, window: int, amount: int) -> None: ...
+
+    # Node registry.
+
+    async def claim_node(
+        self,
+        node: int,
+        owner: str,
+        now: datetime.datetime,
+        expires_at: datetime.datetime,
+    ) -> bool:
+        """Taking a node that is free, lapsed or already of the owner."""
+
+    async def renew_node(
+        self, node: int, owner: str, expires_at: datetime.datetime
+    ) -> bool: ...
+
+    async def release_node(self, node: int, owner: str) -> None: ...
+
+    # Sessions.
+
+    async def revoke_session(self, id: str, expires_at: datetime.datetime) -> None: ...
+
+    async def revoke_user_sessions(
+        self, username: str, revoked_at: float, expires_at: datetime.datetime
+    ) -> None: ...
+
+    async def session_revoked(self, id: str, username: str, issued_at: float) -> bool:
+        """Whether the session, or its user from before it was issued, was revoked."""
+
+
+def create_repository(kind: str = STORAGE_ENGINE) -> Repository:
+    """Creating the repository of the engine selected by the STORAGE_ENGINE setting."""
+
+    if kind == "mongodb":
+
+        from .mongo import MongoRepository
+
+        return MongoRepository(os.environ["MongoDB"])
+
+    elif kind == "memory":
+
+        from .memory import MemoryRepository
+
+        return MemoryRepository()
+
+    raise ValueError(f"Unknown storage engine: {kind}")
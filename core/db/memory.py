@@ -0,0 +1,700 @@
+"""The in-memory repository of BlackWell, for benchmarks and offline runs."""
+
+# Standard modules.
+
+import bisect
+import copy
+import datetime
+import uuid
+
+from typing import IO, Any, AsyncIterator, Dict, List, Set, Tuple
+
+
+def clone(value: Any) -> Any:
+    """A copy of a stored value, callers never share the state of the engine."""
+
+    return copy.deepcopy(value)
+
+
+def lower(user: Dict[str, Any], field: str) -> str:
+
+    return user.get(f"{field}-lower", user[field].lower())
+
+
+class MemoryMedia:
+    """A stored file read back in chunks, like the GridOut of Motor."""
+
+    def __init__(self, data: bytes, metadata: Dict[str, Any] | None) -> None:
+
+        self.data: bytes = data
+        self.length: int = len(data)
+        self.metadata: Dict[str, Any] | None = metadata
+        self.position: int = 0
+
+    async def read(self, size: int = -1) -> bytes:
+
+        end: int = self.length if size < 0 else min(self.position + size, self.length)
+        chunk: bytes = self.data[self.position : end]
+        self.position = end
+
+        return chunk
+
+
+class MemoryRepository:
+    """Every document of BlackWell in dicts of this process, keyed like the indexes.
+
+    Each method runs without awaiting, so it is atomic on the event loop like
+    the single document operations of MongoDB it stands for.
+    """
+
+    def __init__(self) -> None:
+
+        self.secrets: Dict[str, Dict[str, Any]] = {}
+
+        self.users: Dict[str, Dict[str, Any]] = {}
+        # username, email -> token, and the unique lowercased keys -> token.
+        self.usernames: Dict[str, str] = {}
+        self.emails: Dict[str, str] = {}
+        self.unique: Dict[Tuple[str, str], str] = {}
+
+        self.temp_users: Dict[str, Dict[str, Any]] = {}
+        self.temp_unique: Dict[Tuple[str, str], str] = {}
+        self.codes: Dict[str, Set[str]] = {}
+
+        self.queues: Dict[str, Dict[str, Any]] = {}
+        self.actions: Dict[str, List[Dict[str, Any]]] = {}
+
+        self.history: Dict[str, Dict[str, Any]] = {}
+        # conversation -> its ids in ascending order, the ids sort by time.
+        self.pages: Dict[str, List[str]] = {}
+        self.conversations: Dict[str, Dict[str, Any]] = {}
+        self.members: Dict[str, Set[str]] = {}
+
+        self.media: Dict[str, Tuple[bytes, Dict[str, Any] | None]] = {}
+        self.windows: Dict[str, List[int]] = {}
+        self.nodes: Dict[int, Dict[str, Any]] = {}
+        # session:<id> and user:<username> -> [revoked-at, expires-at].
+        self.revocations: Dict[str, List[Any]] = {}
+
+    # Setup.
+
+    async def migrate(self) -> None:
+        """Nothing to migrate, the memory starts empty on every run."""
+
+    async def create_indexes(self) -> None:
+        """The dicts are the indexes."""
+
+    async def unique_indexes(self) -> bool:
+
+        return True
+
+    # Secrets.
+
+    async def get_secret(self, id: str) -> Dict[str, Any] | None:
+
+        return clone(self.secrets.get(id))
+
+    # Users.
+
+    async def insert_user(self, user: Dict[str, Any]) -> bool:
+
+        keys: List[Tuple[str, str]] = [
+            ("username", lower(user, "username")),
+            ("email", lower(user, "email")),
+        ]
+
+        if user["_id"] in self.users or any(key in self.unique for key in keys):
+            return False
+
+        self.users[user["_id"]] = clone(user)
+        self.usernames[user["username"]] = user["_id"]
+        self.emails[user["email"]] = user["_id"]
+
+        for key in keys:
+            self.unique[key] = user["_id"]
+
+        return True
+
+    async def get_user(self, token: str) -> Dict[str, Any] | None:
+
+        return clone(self.users.get(token))
+
+    async def find_user(self, email: str, password: str) -> Dict[str, Any] | None:
+
+        user: Dict[str, Any] | None = self.users.get(self.emails.get(email, ""))
+
+        return clone(user) if user and user["password"] == password else None
+
+    async def find_username(self, username: str) -> Dict[str, Any] | None:
+
+        token: str | None = self.usernames.get(username)
+
+        return {"_id": token, "username": username} if token is not None else None
+
+    async def get_profile(self, username: str) -> Dict[str, Any] | None:
+
+        user: Dict[str, Any] | None = self.users.get(self.usernames.get(username, ""))
+
+        if user is None:
+            return None
+
+        return clone(
+            {
+                key: user[key]
+                for key in ("_id", "username", "profile", "profile-media")
+                if key in user
+            }
+        )
+
+    async def user_taken(self, username: str, email: str) -> bool:
+
+        return ("username", username.lower()) in self.unique or (
+            "email",
+            email.lower(),
+        ) in self.unique
+
+    async def delete_user(self, email: str, password: str) -> bool:
+
+        user: Dict[str, Any] | None = self.users.get(self.emails.get(email, ""))
+
+        if user is None or user["password"] != password:
+            return False
+
+        del self.users[user["_id"]]
+        del self.usernames[user["username"]]
+        del self.emails[user["email"]]
+        del self.unique[("username", lower(user, "username"))]
+        del self.unique[("email", lower(user, "email"))]
+
+        return True
+
+    async def set_profile(self, token: str, profile: str) -> bool:
+
+        user: Dict[str, Any] | None = self.users.get(token)
+
+        if user is None or user.get("profile") == profile:
+            return False
+
+        user["profile"] = profile
+
+        return True
+
+    async def set_profile_media(
+        self, token: str, media: Dict[str, Any] | None, profile: str
+    ) -> Dict[str, Any] | None:
+
+        user: Dict[str, Any] | None = self.users.get(token)
+
+        if user is None:
+            return None
+
+        replaced: Dict[str, Any] = user.get("profile-media") or {}
+        user["profile"] = profile
+        user["profile-media"] = clone(media)
+
+        return replaced
+
+    async def has_contact(self, token: str, contact: str) -> bool:
+
+        user: Dict[str, Any] | None = self.users.get(token)
+
+        return user is not None and any(
+            entry["username"] == contact for entry in user["contacts"]
+        )
+
+    async def add_contact(self, username: str, contact: str) -> bool:
+
+        token: str = self.usernames.get(username, "")
+
+        if token not in self.users or await self.has_contact(token, contact):
+            return False
+
+        self.users[token]["contacts"].append({"username": contact})
+
+        return True
+
+    async def remove_contact(self, username: str, contact: str) -> bool:
+
+        user: Dict[str, Any] | None = self.users.get(self.usernames.get(username, ""))
+
+        if user is None:
+            return False
+
+        contacts: List[Dict[str, Any]] = [
+            entry for entry in user["contacts"] if entry["username"] != contact
+        ]
+        removed: bool = len(contacts) < len(user["contacts"])
+        user["contacts"] = contacts
+
+        return removed
+
+    async def all_users(self, fields: List[str]) -> AsyncIterator[Dict[str, Any]]:
+
+        for user in list(self.users.values()):
+            yield clone({field: user[field] for field in fields if field in user})
+
+    # Temporal users.
+
+    def remove_temp_user(self, id: str) -> Dict[str, Any] | None:
+
+        user: Dict[str, Any] | None = self.temp_users.pop(id, None)
+
+        if user is not None:
+
+            del self.temp_unique[("username", lower(user, "username"))]
+            del self.temp_unique[("email", lower(user, "email"))]
+            self.codes[user["verification"]["code"]].discard(id)
+
+        return user
+
+    def expired_temp_user(self, id: str, now: datetime.datetime) -> bool:
+        """Dropping a temporal user past its window, as the TTL index would have."""
+
+        if self.temp_users[id]["verification"]["expires-at"] > now:
+            return False
+
+        self.remove_temp_user(id)
+
+        return True
+
+    async def insert_temp_user(self, user: Dict[str, Any]) -> bool:
+
+        now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        keys: List[Tuple[str, str]] = [
+            ("username", lower(user, "username")),
+            ("email", lower(user, "email")),
+        ]
+
+        if user["_id"] in self.temp_users or any(
+            key in self.temp_unique
+            and not self.expired_temp_user(self.temp_unique[key], now)
+            for key in keys
+        ):
+            return False
+
+        self.temp_users[user["_id"]] = clone(user)
+        self.codes.setdefault(user["verification"]["code"], set()).add(user["_id"])
+
+        for key in keys:
+            self.temp_unique[key] = user["_id"]
+
+        return True
+
+    async def delete_temp_user(self, id: str) -> bool:
+
+        return self.remove_temp_user(id) is not None
+
+    async def claim_temp_user(
+        self, code: str, now: datetime.datetime
+    ) -> Dict[str, Any] | None:
+
+        for id in list(self.codes.get(code, ())):
+
+            if not self.expired_temp_user(id, now):
+                return self.remove_temp_user(id)
+
+        return None
+
+    # Queue History.
+
+    async def get_queue(
+        self, token: str, primary: bool = False
+    ) -> Dict[str, Any] | None:
+
+        return clone(self.queues.get(token))
+
+    async def push_queue(
+        self,
+        token: str,
+        username: str,
+        messages: List[Dict[str, Any]],
+        size: int,
+        max_messages: int,
+        max_bytes: int,
+    ) -> bool:
+
+        queue: Dict[str, Any] = self.queues.setdefault(
+            token,
+            {
+                "_id": token,
+                "messages": [],
+                "queued-messages": 0,
+                "queued-bytes": 0,
+                "version": 0,
+                "username": username,
+                "created-at": datetime.datetime.strftime(
+                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
+                ),
+            },
+        )
+        if (
+            queue["queued-messages"] + len(messages) > max_messages
+            or queue["queued-bytes"] + size > max_bytes
+        ):
+            self.drop_empty_queue(token)
+            return False
+
+        queue["messages"].extend(clone(messages))
+        queue["queued-messages"] += len(messages)
+        queue["queued-bytes"] += size
+        queue["version"] += 1
+
+        return True
+
+    def drop_empty_queue(self, token: str) -> None:
+
+        if not self.queues[token]["messages"]:
+            del self.queues[token]
+
+    async def pull_queue(self, token: str, ids: List[str]) -> None:
+
+        queue: Dict[str, Any] | None = self.queues.get(token)
+
+        if queue is None:
+            return
+
+        pulled: Set[str] = set(ids)
+        queue["messages"] = [
+            message for message in queue["messages"] if message.get("id") not in pulled
+        ]
+        queue["version"] += 1
+        self.drop_empty_queue(token)
+
+    async def pull_queued(
+        self, token: str, id: str, from_: str
+    ) -> List[Dict[str, Any]]:
+
+        queue: Dict[str, Any] | None = self.queues.get(token)
+
+        if queue is None:
+            return []
+
+        pulled: List[Dict[str, Any]] = []
+        messages: List[Dict[str, Any]] = []
+
+        for message in queue["messages"]:
+
+            (
+                pulled
+                if message.get("id") == id and message.get("from") == from_
+                else messages
+            ).append(message)
+
+        if pulled:
+
+            queue["messages"] = messages
+            queue["version"] += 1
+            self.drop_empty_queue(token)
+
+        return pulled
+
+    async def discount_queue(self, token: str, count: int, size: int) -> None:
+
+        queue: Dict[str, Any] | None = self.queues.get(token)
+
+        if queue is not None:
+
+            queue["queued-messages"] -= count
+            queue["queued-bytes"] -= size
+            queue["version"] += 1
+
+    async def rewrite_queue(
+        self, token: str, version: int | None, messages: List[Dict[str, Any]], size: int
+    ) -> bool:
+
+        queue: Dict[str, Any] | None = self.queues.get(token)
+
+        if queue is None or queue.get("version") != version:
+            return False
+
+        elif not messages:
+
+            del self.queues[token]
+            return True
+
+        queue["messages"] = clone(messages)
+        queue["queued-messages"] = len(messages)
+        queue["queued-bytes"] = size
+        queue["version"] += 1
+
+        return True
+
+    async def delete_queue(self, token: str) -> bool:
+
+        return self.queues.pop(token, None) is not None
+
+    async def all_queues(self) -> AsyncIterator[str]:
+
+        for token in list(self.queues):
+            yield token
+
+    async def expired_queues(self, now: datetime.datetime) -> AsyncIterator[str]:
+
+        for token, queue in list(self.queues.items()):
+
+            if any(message["expires-at"] <= now for message in queue["messages"]):
+                yield token
+
+    async def expire_queue(self, token: str, now: datetime.datetime) -> None:
+
+        queue: Dict[str, Any] | None = self.queues.get(token)
+
+        if queue is None:
+            return
+
+        queue["messages"] = [
+            message for message in queue["messages"] if message["expires-at"] > now
+        ]
+        queue["version"] += 1
+        self.drop_empty_queue(token)
+
+    # Actions.
+
+    async def get_actions(
+        self, token: str, primary: bool = False
+    ) -> List[Dict[str, Any]] | None:
+
+        return clone(self.actions.get(token))
+
+    async def push_actions(self, token: str, actions: List[Dict[str, Any]]) -> None:
+
+        self.actions.setdefault(token, []).extend(clone(actions))
+
+    def store_actions(self, token: str, actions: List[Dict[str, Any]]) -> None:
+
+        if actions:
+            self.actions[token] = actions
+        else:
+            self.actions.pop(token, None)
+
+    async def pull_actions(self, token: str, actions: List[Dict[str, Any]]) -> None:
+
+        if token in self.actions:
+
+            self.store_actions(
+                token,
+                [action for action in self.actions[token] if action not in actions],
+            )
+
+    async def delete_actions(self, token: str) -> bool:
+
+        return self.actions.pop(token, None) is not None
+
+    async def expired_actions(self, now: datetime.datetime) -> AsyncIterator[str]:
+
+        for token, actions in list(self.actions.items()):
+
+            if any(action["expires-at"] <= now for action in actions):
+                yield token
+
+    async def expire_actions(self, token: str, now: datetime.datetime) -> None:
+
+        if token in self.actions:
+
+            self.store_actions(
+                token,
+                [
+                    action
+                    for action in self.actions[token]
+                    if action["expires-at"] > now
+                ],
+            )
+
+    # Conversation History.
+
+    async def insert_history(self, entries: List[Dict[str, Any]]) -> None:
+
+        for entry in entries:
+
+            if entry["_id"] in self.history:
+                continue
+
+            self.history[entry["_id"]] = clone(entry)
+            bisect.insort(
+                self.pages.setdefault(entry["conversation"], []), entry["_id"]
+            )
+
+    async def delete_history(self, id: str, conversation: str, from_: str) -> bool:
+
+        entry: Dict[str, Any] | None = self.history.get(id)
+
+        if (
+            entry is None
+            or entry["conversation"] != conversation
+            or entry["message"].get("from") != from_
+        ):
+            return False
+
+        del self.history[id]
+        self.pages[conversation].remove(id)
+
+        return True
+
+    async def history_page(
+        self, conversation: str, before: str, limit: int, primary: bool = False
+    ) -> List[Dict[str, Any]]:
+
+        ids: List[str] = self.pages.get(conversation, [])
+        end: int = bisect.bisect_left(ids, before) if before else len(ids)
+
+        return [
+            clone(self.history[id]) for id in reversed(ids[max(end - limit, 0) : end])
+        ]
+
+    async def get_conversation(self, id: str) -> Dict[str, Any] | None:
+
+        return clone(self.conversations.get(id))
+
+    async def set_conversation(
+        self,
+        id: str,
+        members: List[str],
+        last_message: Dict[str, Any],
+        updated_at: datetime.datetime,
+    ) -> None:
+
+        conversation: Dict[str, Any] = self.conversations.setdefault(
+            id, {"_id": id, "members": list(members)}
+        )
+        conversation["last-message"] = clone(last_message)
+        conversation["updated-at"] = updated_at
+
+        for member in conversation["members"]:
+            self.members.setdefault(member, set()).add(id)
+
+    async def delete_conversation(self, id: str) -> None:
+
+        conversation: Dict[str, Any] | None = self.conversations.pop(id, None)
+
+        if conversation is not None:
+
+            for member in conversation["members"]:
+                self.members[member].discard(id)
+
+    async def conversations_of(self, username: str, limit: int) -> List[Dict[str, Any]]:
+
+        conversations: List[Dict[str, Any]] = sorted(
+            (self.conversations[id] for id in self.members.get(username, ())),
+            key=lambda conversation: conversation["updated-at"],
+            reverse=True,
+        )
+
+        return clone(conversations[:limit])
+
+    # Media.
+
+    async def put_media(
+        self, source: IO[bytes], filename: str, metadata: Dict[str, Any] | None
+    ) -> str:
+
+        id: str = uuid.uuid4().hex[:24]
+        self.media[id] = (source.read(), clone(metadata))
+
+        return id
+
+    async def get_media(self, id: str) -> MemoryMedia | None:
+
+        if id not in self.media:
+            return None
+
+        data, metadata = self.media[id]
+
+        return MemoryMedia(data, clone(metadata))
+
+    async def delete_media(self, id: str) -> bool:
+
+        return self.media.pop(id, None) is not None
+
+    # Rate limits.
+
+    async def increment_window(
+        self, key: str, window: int, period: float, amount: int
+    ) -> Tuple[int, int]:
+
+        # [window, current, previous], rolled over like the MongoDB pipeline.
+        entry: List[int] = self.windows.get(key, [window, 0, 0])
+
+        if entry[0] != window:
+            entry = [window, 0, entry[1] if entry[0] == window - 1 else 0]
+
+        entry[1] += amount
+        self.windows[key] = entry
+
+        return entry[1], entry[2]
+
+    async def decrement_window(self, key: str, window: int, amount: int) -> None:
+
+        entry: List[int] | None = self.windows.get(key)
+
+        if entry is not None and entry[0] == window and entry[1] >= amount:
+            entry[1] -= amount
+
+    # Node registry.
+
+    async def claim_node(
+        self,
+        node: int,
+        owner: str,
+        now: datetime.datetime,
+        expires_at: datetime.datetime,
+    ) -> bool:
+
+        lease: Dict[str, Any] | None = self.nodes.get(node)
+
+        if lease is not None and lease["owner"] != owner and lease["expires-at"] >= now:
+            return False
+
+        self.nodes[node] = {"owner": owner, "expires-at": expires_at}
+
+        return True
+
+    async def renew_node(
+        self, node: int, owner: str, expires_at: datetime.datetime
+    ) -> bool:
+
+        lease: Dict[str, Any] | None = self.nodes.get(node)
+
+        if lease is None or lease["owner"] != owner:
+            return False
+
+        lease["expires-at"] = expires_at
+
+        return True
+
+    async def release_node(self, node: int, owner: str) -> None:
+
+        if self.nodes.get(node, {}).get("owner") == owner:
+            del self.nodes[node]
+
+    # Sessions.
+
+    async def revoke_session(self, id: str, expires_at: datetime.datetime) -> None:
+
+        self.revocations[f"session:{id}"] = [0, expires_at]
+
+    async def revoke_user_sessions(
+        self, username: str, revoked_at: float, expires_at: datetime.datetime
+    ) -> None:
+
+        revocation: List[Any] = self.revocations.get(
+            f"user:{username}", [revoked_at, expires_at]
+        )
+        self.revocations[f"user:{username}"] = [
+            max(revocation[0], revoked_at),
+            max(revocation[1], expires_at),
+        ]
+
+    async def session_revoked(self, id: str, username: str, issued_at: float) -> bool:
+
+        now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+
+        # Expired lazily, like the TTL index of MongoDB.
+        for key in (f"session:{id}", f"user:{username}"):
+
+            if key in self.revocations and self.revocations[key][1] <= now:
+                del self.revocations[key]
+
+        return (
+            f"session:{id}" in self.revocations
+            or self.revocations.get(f"user:{username}", [-1])[0] >= issued_at
+        )
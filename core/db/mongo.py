@@ -0,0 +1,715 @@
+"""The MongoDB repository of BlackWell."""
+
+# Standard modules.
+
+import datetime
+
+from typing import IO, Any, AsyncIterator, Dict, List, Tuple
+
+# Third party modules.
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import DeleteResult, InsertOneResult, UpdateResult
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from motor.core import AgnosticClient, AgnosticCollection
+
+# Own modules.
+
+from .routing import route
+
+# The server code of a write refused by a unique index.
+DUPLICATE_KEY: int = 11000
+
+
+class MongoRepository:
+    """MongoDB through Motor, the production engine."""
+
+    def __init__(self, uri: str) -> None:
+
+        self.client: AgnosticClient = AsyncIOMotorClient(uri, maxPoolSize=None)
+
+        self.system: AgnosticCollection = self.collection("systems", "system")
+        self.nodes: AgnosticCollection = self.collection("systems", "nodes")
+        self.rate_limits: AgnosticCollection = self.collection("systems", "rate limits")
+        self.revocations: AgnosticCollection = self.collection(
+            "systems", "session revocations"
+        )
+        self.users: AgnosticCollection = self.collection("users", "users permanent")
+        self.temp_users: AgnosticCollection = self.collection("users", "users temporal")
+        self.actions: AgnosticCollection = self.collection("messages", "actions")
+        self.queue_history: AgnosticCollection = self.collection(
+            "messages", "queue history"
+        )
+        self.history: AgnosticCollection = self.collection("messages", "history")
+        self.conversations: AgnosticCollection = self.collection(
+            "messages", "conversations"
+        )
+        self.media: AsyncIOMotorGridFSBucket = AsyncIOMotorGridFSBucket(
+            self.client.get_database("media"), bucket_name="uploads"
+        )
+
+    def collection(self, database: str, name: str) -> AgnosticCollection:
+
+        return self.client.get_database(database).get_collection(name)
+
+    # Setup.
+
+    async def migrate(self) -> None:
+
+        # Accounts created with the old string date are never matched by the TTL index.
+        await self.temp_users.delete_many(
+            {"verification.expires-at": {"$exists": False}}
+        )
+
+        # Usernames and emails are unique regardless of their case.
+        await self.users.update_many(
+            {"username-lower": {"$exists": False}},
+            [
+                {
+                    "$set": {
+                        "username-lower": {"$toLower": "$username"},
+                        "email-lower": {"$toLower": "$email"},
+                    }
+                }
+            ],
+        )
+        await self.temp_users.delete_many({"username-lower": {"$exists": False}})
+
+    async def create_indexes(self) -> None:
+
+        # Let MongoDB expire the temporal accounts once the verification window ends.
+        await self.temp_users.create_index(
+            "verification.expires-at", name="verification-expiry", expireAfterSeconds=0
+        )
+        await self.temp_users.create_index(
+            "verification.code", name="verification-code"
+        )
+
+        await self.rate_limits.create_index(
+            "expires-at", name="rate-limit-expiry", expireAfterSeconds=0
+        )
+        await self.revocations.create_index(
+            "expires-at", name="revocation-expiry", expireAfterSeconds=0
+        )
+
+        # The sweeper looks up the queues holding expired entries through these.
+        await self.queue_history.create_index(
+            "messages.expires-at", name="messages-expiry"
+        )
+        await self.actions.create_index("actions.expires-at", name="actions-expiry")
+
+        # Pages of a conversation are ranges of time ordered ids, newest first.
+        await self.history.create_index(
+            [("conversation", 1), ("_id", -1)], name="conversation-history"
+        )
+        await self.conversations.create_index(
+            [("members", 1), ("updated-at", -1)], name="conversations-of-member"
+        )
+
+        await self.users.create_index("username", name="username-lookup")
+
+        for collection in (self.users, self.temp_users):
+
+            await collection.create_index(
+                "username-lower", name="username", unique=True
+            )
+            await collection.create_index("email-lower", name="email", unique=True)
+
+    async def unique_indexes(self) -> bool:
+
+        indexes: Dict[str, Any] = await self.users.index_information()
+
+        return all(
+            indexes.get(name, {}).get("unique") for name in ("username", "email")
+        )
+
+    # Secrets.
+
+    async def get_secret(self, id: str) -> Dict[str, Any] | None:
+
+        return await route(self.system, "lookup").find_one({"_id": id})
+
+    # Users.
+
+    async def insert_user(self, user: Dict[str, Any]) -> bool:
+
+        try:
+
+            result: InsertOneResult = await self.users.insert_one(user)
+
+        except DuplicateKeyError:
+
+            return False
+
+        return result.inserted_id == user["_id"]
+
+    async def get_user(self, token: str) -> Dict[str, Any] | None:
+
+        return await self.users.find_one({"_id": token})
+
+    async def find_user(self, email: str, password: str) -> Dict[str, Any] | None:
+
+        return await self.users.find_one({"email": email, "password": password})
+
+    async def find_username(self, username: str) -> Dict[str, Any] | None:
+
+        return await route(self.users, "lookup").find_one(
+            {"username": username}, {"username": 1}
+        )
+
+    async def get_profile(self, username: str) -> Dict[str, Any] | None:
+
+        return await route(self.users, "profile").find_one(
+            {"username": username}, {"username": 1, "profile": 1, "profile-media": 1}
+        )
+
+    async def user_taken(self, username: str, email: str) -> bool:
+
+        user: Dict[str, Any] | None = await self.users.find_one(
+            {
+                "$or": [
+                    {"username-lower": username.lower()},
+                    {"email-lower": email.lower()},
+                ]
+            },
+            {"_id": 1},
+        )
+
+        return user is not None
+
+    async def delete_user(self, email: str, password: str) -> bool:
+
+        result: DeleteResult = await self.users.delete_one(
+            {"email": email, "password": password}
+        )
+
+        return result.deleted_count == 1
+
+    async def set_profile(self, token: str, profile: str) -> bool:
+
+        result: UpdateResult = await self.users.update_one(
+            {"_id": token}, {"$set": {"profile": profile}}
+        )
+
+        return result.modified_count > 0
+
+    async def set_profile_media(
+        self, token: str, media: Dict[str, Any] | None, profile: str
+    ) -> Dict[str, Any] | None:
+
+        result: Dict[str, Any] | None = await self.users.find_one_and_update(
+            {"_id": token},
+            {"$set": {"profile": profile, "profile-media": media}},
+            {"profile-media": 1},
+        )
+
+        return (result.get("profile-media") or {}) if result is not None else None
+
+    async def has_contact(self, token: str, contact: str) -> bool:
+
+        result: Dict[str, Any] | None = await self.users.find_one(
+            {"_id": token, "contacts.username": contact}, {"_id": 1}
+        )
+
+        return result is not None
+
+    async def add_contact(self, username: str, contact: str) -> bool:
+
+        # Matching only users without the contact, a concurrent add pushes it once.
+        result: UpdateResult = await self.users.update_one(
+            {"username": username, "contacts.username": {"$ne": contact}},
+            {"$push": {"contacts": {"username": contact}}},
+        )
+
+        return result.modified_count > 0
+
+    async def remove_contact(self, username: str, contact: str) -> bool:
+
+        result: UpdateResult = await self.users.update_one(
+            {"username": username}, {"$pull": {"contacts": {"username": contact}}}
+        )
+
+        return result.modified_count > 0
+
+    async def all_users(self, fields: List[str]) -> AsyncIterator[Dict[str, Any]]:
+
+        async for user in self.users.find({}, fields):
+            yield user
+
+    # Temporal users.
+
+    async def insert_temp_user(self, user: Dict[str, Any]) -> bool:
+
+        try:
+
+            result: InsertOneResult = await self.temp_users.insert_one(user)
+
+        except DuplicateKeyError:
+
+            return False
+
+        return result.inserted_id == user["_id"]
+
+    async def delete_temp_user(self, id: str) -> bool:
+
+        result: DeleteResult = await self.temp_users.delete_one({"_id": id})
+
+        return result.deleted_count == 1
+
+    async def claim_temp_user(
+        self, code: str, now: datetime.datetime
+    ) -> Dict[str, Any] | None:
+
+        return await self.temp_users.find_one_and_delete(
+            {"verification.code": code, "verification.expires-at": {"$gt": now}}
+        )
+
+    # Queue History.
+
+    async def get_queue(
+        self, token: str, primary: bool = False
+    ) -> Dict[str, Any] | None:
+
+        return await (
+            self.queue_history if primary else route(self.queue_history, "backlog")
+        ).find_one({"_id": token})
+
+    async def push_queue(
+        self,
+        token: str,
+        username: str,
+        messages: List[Dict[str, Any]],
+        size: int,
+        max_messages: int,
+        max_bytes: int,
+    ) -> bool:
+
+        try:
+
+            # A queue that would pass the caps is not matched, the upsert then collides.
+            await self.queue_history.update_one(
+                {
+                    "_id": token,
+                    "queued-messages": {"$lte": max_messages - len(messages)},
+                    "queued-bytes": {"$lte": max_bytes - size},
+                },
+                {
+                    "$push": {"messages": {"$each": messages}},
+                    "$inc": {
+                        "queued-messages": len(messages),
+                        "queued-bytes": size,
+                        "version": 1,
+                    },
+                    "$setOnInsert": {
+                        "username": username,
+                        "created-at": datetime.datetime.strftime(
+                            datetime.datetime.now(), "%Y-%m-%d %H:%M"
+                        ),
+                    },
+                },
+                upsert=True,
+            )
+
+        except DuplicateKeyError:
+
+            return False
+
+        return True
+
+    async def pull_queue(self, token: str, ids: List[str]) -> None:
+
+        await self.queue_history.update_one(
+            {"_id": token},
+            {"$pull": {"messages": {"id": {"$in": ids}}}, "$inc": {"version": 1}},
+        )
+        await self.queue_history.delete_one({"_id": token, "messages": {"$size": 0}})
+
+    async def pull_queued(
+        self, token: str, id: str, from_: str
+    ) -> List[Dict[str, Any]]:
+
+        # On the primary in one write, the image before it tells what was pulled.
+        # Only its first match is projected, a duplicate left counted is fixed by
+        # the next compaction.
+        queue: Dict[str, Any] | None = await self.queue_history.find_one_and_update(
+            {"_id": token, "messages": {"$elemMatch": {"id": id, "from": from_}}},
+            {
+                "$pull": {"messages": {"id": id, "from": from_}},
+                "$inc": {"version": 1},
+            },
+            {"messages": {"$elemMatch": {"id": id, "from": from_}}},
+            return_document=ReturnDocument.BEFORE,
+        )
+
+        if queue is None:
+            return []
+
+        await self.queue_history.delete_one({"_id": token, "messages": {"$size": 0}})
+
+        return queue["messages"]
+
+    async def discount_queue(self, token: str, count: int, size: int) -> None:
+
+        await self.queue_history.update_one(
+            {"_id": token},
+            {
+                "$inc": {
+                    "queued-messages": -count,
+                    "queued-bytes": -size,
+                    "version": 1,
+                }
+            },
+        )
+
+    async def rewrite_queue(
+        self, token: str, version: int | None, messages: List[Dict[str, Any]], size: int
+    ) -> bool:
+
+        # Queues written before the version field match on its absence.
+        filter: Dict[str, Any] = {
+            "_id": token,
+            "version": version if version is not None else {"$exists": False},
+        }
+
+        if not messages:
+
+            result: DeleteResult = await self.queue_history.delete_one(filter)
+
+            return result.deleted_count == 1
+
+        rewritten: Dict[str, Any] | None = await self.queue_history.find_one_and_update(
+            filter,
+            {
+                "$set": {
+                    "messages": messages,
+                    "queued-messages": len(messages),
+                    "queued-bytes": size,
+                },
+                "$inc": {"version": 1},
+            },
+            {"_id": 1},
+        )
+
+        return rewritten is not None
+
+    async def delete_queue(self, token: str) -> bool:
+
+        result: DeleteResult = await self.queue_history.delete_one({"_id": token})
+
+        return result.deleted_count == 1
+
+    async def all_queues(self) -> AsyncIterator[str]:
+
+        async for queue in self.queue_history.find({}, {"_id": 1}):
+            yield queue["_id"]
+
+    async def expired_queues(self, now: datetime.datetime) -> AsyncIterator[str]:
+
+        async for queue in self.queue_history.find(
+            {"messages.expires-at": {"$lte": now}}, {"_id": 1}
+        ):
+            yield queue["_id"]
+
+    async def expire_queue(self, token: str, now: datetime.datetime) -> None:
+
+        await self.queue_history.update_one(
+            {"_id": token},
+            {
+                "$pull": {"messages": {"expires-at": {"$lte": now}}},
+                "$inc": {"version": 1},
+            },
+        )
+        await self.queue_history.delete_one({"_id": token, "messages": {"$size": 0}})
+
+    # Actions.
+
+    async def get_actions(
+        self, token: str, primary: bool = False
+    ) -> List[Dict[str, Any]] | None:
+
+        result: Dict[str, Any] | None = await (
+            self.actions if primary else route(self.actions, "backlog")
+        ).find_one({"_id": token})
+
+        return result["actions"] if result is not None else None
+
+    async def push_actions(self, token: str, actions: List[Dict[str, Any]]) -> None:
+
+        await self.actions.update_one(
+            {"_id": token}, {"$push": {"actions": {"$each": actions}}}, upsert=True
+        )
+
+    async def pull_actions(self, token: str, actions: List[Dict[str, Any]]) -> None:
+
+        await self.actions.update_one(
+            {"_id": token}, {"$pull": {"actions": {"$in": actions}}}
+        )
+        await self.actions.delete_one({"_id": token, "actions": {"$size": 0}})
+
+    async def delete_actions(self, token: str) -> bool:
+
+        result: DeleteResult = await self.actions.delete_one({"_id": token})
+
+        return result.deleted_count > 0
+
+    async def expired_actions(self, now: datetime.datetime) -> AsyncIterator[str]:
+
+        async for actions in self.actions.find(
+            {"actions.expires-at": {"$lte": now}}, {"_id": 1}
+        ):
+            yield actions["_id"]
+
+    async def expire_actions(self, token: str, now: datetime.datetime) -> None:
+
+        await self.actions.update_one(
+            {"_id": token}, {"$pull": {"actions": {"expires-at": {"$lte": now}}}}
+        )
+        await self.actions.delete_one({"_id": token, "actions": {"$size": 0}})
+
+    # Conversation History.
+
+    async def insert_history(self, entries: List[Dict[str, Any]]) -> None:
+
+        try:
+
+            await self.history.insert_many(entries, ordered=False)
+
+        except BulkWriteError as error:
+
+            if any(
+                failure.get("code") != DUPLICATE_KEY
+                for failure in error.details.get("writeErrors", [])
+            ):
+                raise
+
+    async def delete_history(self, id: str, conversation: str, from_: str) -> bool:
+
+        result: DeleteResult = await self.history.delete_one(
+            {"_id": id, "conversation": conversation, "message.from": from_}
+        )
+
+        return result.deleted_count == 1
+
+    async def history_page(
+        self, conversation: str, before: str, limit: int, primary: bool = False
+    ) -> List[Dict[str, Any]]:
+
+        filter: Dict[str, Any] = {"conversation": conversation}
+
+        if before:
+            filter["_id"] = {"$lt": before}
+
+        return await (
+            (self.history if primary else route(self.history, "backlog"))
+            .find(filter)
+            .sort("_id", -1)
+            .limit(limit)
+        ).to_list(limit)
+
+    async def get_conversation(self, id: str) -> Dict[str, Any] | None:
+
+        return await self.conversations.find_one({"_id": id})
+
+    async def set_conversation(
+        self,
+        id: str,
+        members: List[str],
+        last_message: Dict[str, Any],
+        updated_at: datetime.datetime,
+    ) -> None:
+
+        await self.conversations.update_one(
+            {"_id": id},
+            {
+                "$set": {"last-message": last_message, "updated-at": updated_at},
+                "$setOnInsert": {"members": members},
+            },
+            upsert=True,
+        )
+
+    async def delete_conversation(self, id: str) -> None:
+
+        await self.conversations.delete_one({"_id": id})
+
+    async def conversations_of(self, username: str, limit: int) -> List[Dict[str, Any]]:
+
+        return await (
+            route(self.conversations, "backlog")
+            .find({"members": username})
+            .sort("updated-at", -1)
+            .limit(limit)
+        ).to_list(limit)
+
+    # Media.
+
+    async def put_media(
+        self, source: IO[bytes], filename: str, metadata: Dict[str, Any] | None
+    ) -> str:
+
+        return str(
+            await self.media.upload_from_stream(filename, source, metadata=metadata)
+        )
+
+    async def get_media(self, id: str) -> Any | None:
+
+        try:
+
+            return await self.media.open_download_stream(ObjectId(id))
+
+        except (InvalidId, NoFile):
+
+            return None
+
+    async def delete_media(self, id: str) -> bool:
+
+        try:
+
+            await self.media.delete(ObjectId(id))
+
+        except (InvalidId, NoFile):
+
+            return False
+
+        return True
+
+    # Rate limits.
+
+    async def increment_window(
+        self, key: str, window: int, period: float, amount: int
+    ) -> Tuple[int, int]:
+
+        # One atomic round-trip that also rolls the windows over.
+        result: Dict[str, Any] = await self.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {
+                    "$set": {
+                        "previous": {
+                            "$cond": [
+                                {"$eq": ["$window", window]},
+                                "$previous",
+                                {
+                                    "$cond": [
+                                        {"$eq": ["$window", window - 1]},
+                                        "$current",
+                                        0,
+                                    ]
+                                },
+                            ]
+                        },
+                        "current": {
+                            "$add": [
+                                {
+                                    "$cond": [
+                                        {"$eq": ["$window", window]},
+                                        "$current",
+                                        0,
+                                    ]
+                                },
+                                amount,
+                            ]
+                        },
+                        "window": window,
+                        "expires-at": datetime.datetime.now(datetime.timezone.utc)
+                        + datetime.timedelta(seconds=period * 2),
+                    }
+                }
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        return result["current"], result["previous"]
+
+    async def decrement_window(self, key: str, window: int, amount: int) -> None:
+
+        await self.rate_limits.update_one(
+            {"_id": key, "window": window, "current": {"$gte": amount}},
+            {"$inc": {"current": -amount}},
+        )
+
+    # Node registry.
+
+    async def claim_node(
+        self,
+        node: int,
+        owner: str,
+        now: datetime.datetime,
+        expires_at: datetime.datetime,
+    ) -> bool:
+
+        claim: Dict[str, Any] = {"owner": owner, "expires-at": expires_at}
+
+        # A lapsed lease is taken over, its process stopped renewing it.
+        taken: Dict[str, Any] | None = await self.nodes.find_one_and_update(
+            {"_id": node, "$or": [{"owner": owner}, {"expires-at": {"$lt": now}}]},
+            {"$set": claim},
+        )
+
+        if taken is not None:
+            return True
+
+        try:
+
+            await self.nodes.insert_one({"_id": node, **claim})
+
+        except DuplicateKeyError:
+
+            return False
+
+        return True
+
+    async def renew_node(
+        self, node: int, owner: str, expires_at: datetime.datetime
+    ) -> bool:
+
+        result: UpdateResult = await self.nodes.update_one(
+            {"_id": node, "owner": owner}, {"$set": {"expires-at": expires_at}}
+        )
+
+        return result.matched_count > 0
+
+    async def release_node(self, node: int, owner: str) -> None:
+
+        await self.nodes.delete_one({"_id": node, "owner": owner})
+
+    # Sessions.
+
+    async def revoke_session(self, id: str, expires_at: datetime.datetime) -> None:
+
+        await self.revocations.update_one(
+            {"_id": f"session:{id}"},
+            {"$set": {"expires-at": expires_at}},
+            upsert=True,
+        )
+
+    async def revoke_user_sessions(
+        self, username: str, revoked_at: float, expires_at: datetime.datetime
+    ) -> None:
+
+        await self.revocations.update_one(
+            {"_id": f"user:{username}"},
+            {"$max": {"revoked-at": revoked_at, "expires-at": expires_at}},
+            upsert=True,
+        )
+
+    async def session_revoked(self, id: str, username: str, issued_at: float) -> bool:
+
+        # Read from the primary, a lagging secondary would accept a closed session.
+        return (
+            await self.revocations.find_one(
+                {
+                    "$or": [
+                        {"_id": f"session:{id}"},
+                        {"_id": f"user:{username}", "revoked-at": {"$gte": issued_at}},
+                    ]
+                },
+                {"_id": 1},
+            )
+            is not None
+        )
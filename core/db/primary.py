@@ -3,64 +3,44 @@
 # Standard modules.
 
 import datetime
-import time
-import os
 
 from typing import Any, Dict, List, Literal
 
-# Third party modules.
+# Own modules.
 
-import pymongo
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.results import UpdateResult, InsertOneResult, DeleteResult
-
-from motor.motor_asyncio import AsyncIOMotorClient
-from motor.core import AgnosticClient, AgnosticCollection
+from .engine import Repository, create_repository
+from ..compression import COMPRESSOR
+from ..config import QUEUE_HISTORY_RETENTION
+from ..ids import NODE_COUNT
 
 """Primary Client Database."""
 
-PRIMARY_CLIENT: AgnosticClient = AsyncIOMotorClient(
-    os.environ["MongoDB"], maxPoolSize=None
-)
-
-SYSTEM: AgnosticCollection = PRIMARY_CLIENT.get_database("systems").get_collection(
-    "system"
-)
-USERS: AgnosticCollection = PRIMARY_CLIENT.get_database("users").get_collection(
-    "users permanent"
-)
-ACTIONS: AgnosticCollection = PRIMARY_CLIENT.get_database("messages").get_collection(
-    "actions"
-)
+REPOSITORY: Repository = create_repository()
 
 
 async def get_secret(id: str = "") -> Dict[str, Any] | bool:
 
-    result: Dict[str, Any] | None = await SYSTEM.find_one({"_id": id})
+    result: Dict[str, Any] | None = await REPOSITORY.get_secret(id)
 
     return result if isinstance(result, dict) else False
 
 
 async def post_user(user: Dict[str, Any]) -> bool:
+    """Inserting a user, False when the username or email is taken."""
 
-    result: InsertOneResult = await USERS.insert_one(user)
-
-    return True if result.inserted_id == user["_id"] else False
+    return await REPOSITORY.insert_user(user)
 
 
 async def get_user(token: str = "") -> Dict[str, Any] | bool:
 
-    result: Dict[str, Any] | None = await USERS.find_one({"_id": token})
+    result: Dict[str, Any] | None = await REPOSITORY.get_user(token)
 
     return result if isinstance(result, dict) else False
 
 
 async def fetch_user(email: str = "", password: str = "") -> str | bool:
 
-    result: Dict[str, Any] | None = await USERS.find_one(
-        {"email": email, "password": password}
-    )
+    result: Dict[str, Any] | None = await REPOSITORY.find_user(email, password)
 
     return result["username"] if isinstance(result, dict) else False
 
@@ -69,146 +49,181 @@ async def get_user_with_email_and_password(
     email: str = "", password: str = ""
 ) -> Dict[str, Any] | bool:
 
-    result: Dict[str, Any] | None = await USERS.find_one(
-        {"email": email, "password": password}
-    )
+    result: Dict[str, Any] | None = await REPOSITORY.find_user(email, password)
 
     return result if isinstance(result, dict) else False
 
 
 async def delete_user(email: str = "", password: str = "") -> bool:
 
-    result: DeleteResult = await USERS.delete_one(
-        {"email": email, "password": password}
-    )
-
-    return True if result.deleted_count == 1 else False
+    return await REPOSITORY.delete_user(email, password)
 
 
 async def get_token_with_email_and_password(
     email: str = "", password: str = ""
 ) -> List[str] | bool:
 
-    result: Dict[str, Any] | None = await USERS.find_one(
-        {"email": email, "password": password}
-    )
+    result: Dict[str, Any] | None = await REPOSITORY.find_user(email, password)
 
     return [result["_id"], result["username"]] if isinstance(result, dict) else False
 
 
 async def get_token_with_username(username: str = "") -> List[str] | bool:
 
-    result: Dict[str, Any] | None = await USERS.find_one({"username": username})
+    result: Dict[str, Any] | None = await REPOSITORY.find_username(username)
 
     return [result["_id"], result["username"]] if isinstance(result, dict) else False
 
 
 async def set_user_profile(token: str = "", profile: str = "") -> bool:
 
-    result: UpdateResult = await USERS.update_one(
-        {"_id": token}, {"$set": {"profile": profile}}
-    )
+    return await REPOSITORY.set_profile(token, profile)
 
-    return True if result.modified_count > 0 else False
 
+async def set_user_profile_media(
+    token: str = "", media: Dict[str, Any] | None = None, profile: str = ""
+) -> Dict[str, Any] | bool:
+    """Pointing the profile to an uploaded image, returning the replaced media."""
 
-async def get_user_profile(username: str = "") -> List[str] | bool:
+    result: Dict[str, Any] | None = await REPOSITORY.set_profile_media(
+        token, media, profile
+    )
 
-    token: List[str] | bool = await get_token_with_username(username)
+    return result if isinstance(result, dict) else False
 
-    if not isinstance(token, list):
-        return False
 
-    result: Dict[str, Any] | None = await USERS.find_one({"_id": token})
+async def get_user_profile(username: str = "") -> List[Any] | bool:
 
-    return [result["profile"]] if isinstance(result, dict) else False
+    result: Dict[str, Any] | None = await REPOSITORY.get_profile(username)
+
+    return (
+        [result["username"], result["profile"], result.get("profile-media")]
+        if isinstance(result, dict)
+        else False
+    )
 
 
 async def check_if_user_in_contacts(token: str = "", contact: str = "") -> bool:
 
-    result: Dict[str, Any] | None = await USERS.find_one({"_id": token})
+    return await REPOSITORY.has_contact(token, contact)
 
-    if not isinstance(result, dict):
-        return False
 
-    for i in result["contacts"]:
+async def contact_add_or_remove(
+    action: Literal["add", "remove"], from_: str, to: str
+) -> bool:
 
-        if i["username"] == contact:
-            return True
+    if action == "add":
+        return await REPOSITORY.add_contact(to, from_)
 
-    return False
+    return await REPOSITORY.remove_contact(to, from_)
 
 
-async def contact_add_or_remove(
-    action: Literal["add", "remove"], from_: str, to: str
+# Action Messages Section - Primary DB
+
+
+async def delete_action_messages(
+    username: str, actions: List[Dict[str, Any]] | None = None
 ) -> bool:
+    """Deleting the replayed actions, the ones queued meanwhile are kept."""
 
-    token: List[str] | bool = await get_token_with_username(to)
+    token: List[str] | bool = await get_token_with_username(username)
 
     if not isinstance(token, list):
         return False
 
-    elif not await check_if_user_in_contacts(token[0], from_) and action == "add":
+    elif actions is None:
+        return await REPOSITORY.delete_actions(token[0])
 
-        add: UpdateResult = await USERS.update_one(
-            {"username": to}, {"$push": {"contacts": {"username": from_}}}
-        )
+    await REPOSITORY.pull_actions(token[0], actions)
 
-        return True if add.modified_count > 0 else False
+    return True
 
-    elif await check_if_user_in_contacts(token[0], from_) and action == "remove":
 
-        remove: UpdateResult = await USERS.update_one(
-            {"username": to}, {"$pull": {"contacts": {"username": from_}}}
-        )
+async def get_action_messages(username: str = "") -> List[Dict[str, Any]] | bool:
 
-        return True if remove.modified_count > 0 else False
+    token: List[str] | bool = await get_token_with_username(username)
 
-    return False
+    if not isinstance(token, list):
+        return False
 
+    result: List[Dict[str, Any]] | None = await REPOSITORY.get_actions(token[0])
 
-# Action Messages Section - Primary DB
+    return result if isinstance(result, list) else False
 
 
-async def delete_action_messages(username: str) -> bool:
+async def add_action_message(to: str, action: Dict[str, Any]) -> bool:
 
-    token: List[str] | bool = await get_token_with_username(username)
+    token: List[str] | bool = await get_token_with_username(to)
 
     if not isinstance(token, list):
         return False
 
-    result: DeleteResult = await ACTIONS.delete_one({"_id": token[0]})
+    await REPOSITORY.push_actions(
+        token[0],
+        [
+            {
+                **COMPRESSOR.pack(action),
+                "expires-at": datetime.datetime.now(datetime.timezone.utc)
+                + QUEUE_HISTORY_RETENTION["action"],
+            }
+        ],
+    )
 
-    return True if result.deleted_count > 0 else False
+    return True
 
 
-async def get_action_messages(username: str = "") -> List[Dict[str, Any]] | bool:
+# Node Registry Section - Primary DB
 
-    token: List[str] | bool = await get_token_with_username(username)
 
-    if not isinstance(token, list):
-        return False
+async def claim_node(owner: str, preferred: int, lease: int) -> int | bool:
+    """Reserving the first free node from the preferred one, False when all are taken."""
 
-    result: Dict[str, Any] | None = await ACTIONS.find_one({"_id": token[0]})
+    now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
 
-    return result["actions"] if isinstance(result, dict) else False
+    for offset in range(NODE_COUNT):
 
+        node: int = (preferred + offset) % NODE_COUNT
 
-async def add_action_message(to: str, action: Dict[str, Any]) -> bool:
+        if await REPOSITORY.claim_node(
+            node, owner, now, now + datetime.timedelta(seconds=lease)
+        ):
+            return node
 
-    token: List[str] | bool = await get_token_with_username(to)
+    return False
 
-    if not isinstance(token, list):
-        return False
 
-    fetch_possible_actions: List[Dict[str, Any]] | bool = await get_action_messages(to)
+async def renew_node(node: int, owner: str, lease: int) -> bool:
+    """Extending the lease of a node, False when another process took it over."""
+
+    return await REPOSITORY.renew_node(
+        node,
+        owner,
+        datetime.datetime.now(datetime.timezone.utc)
+        + datetime.timedelta(seconds=lease),
+    )
 
-    if not isinstance(fetch_possible_actions, list):
 
-        await ACTIONS.insert_one({"_id": token[0], "actions": [action]})
+async def release_node(node: int, owner: str) -> None:
 
-        return True
+    await REPOSITORY.release_node(node, owner)
 
-    await ACTIONS.update_one({"_id": token[0]}, {"$push": {"actions": action}})
 
-    return True
+# Sessions Section - Primary DB
+
+
+async def revoke_session(id: str, expires_at: datetime.datetime) -> None:
+
+    await REPOSITORY.revoke_session(id, expires_at)
+
+
+async def revoke_user_sessions(
+    username: str, revoked_at: float, expires_at: datetime.datetime
+) -> None:
+
+    await REPOSITORY.revoke_user_sessions(username, revoked_at, expires_at)
+
+
+async def session_revoked(id: str, username: str, issued_at: float) -> bool:
+    """Whether the session, or every session of its user issued until then, was revoked."""
+
+    return await REPOSITORY.session_revoked(id, username, issued_at)
@@ -0,0 +1,70 @@
+"""The read preference routing of BlackWell."""
+
+# Standard modules.
+
+from typing import Any, Dict, List, Tuple
+
+# Third party modules.
+
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+from motor.core import AgnosticCollection
+
+# Own modules.
+
+from ..config import READ_ROUTING
+
+MODES: Dict[str, type] = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+ROUTED: Dict[Tuple[int, str], AgnosticCollection] = {}
+
+
+def parse_tags(tags: str) -> List[Dict[str, str]] | None:
+    """Parsing 'dc:east,rack:1;dc:west;' into tag sets, a trailing ';' matches any."""
+
+    if not tags:
+        return None
+
+    return [
+        dict(pair.split(":", 1) for pair in tag_set.split(",") if pair)
+        for tag_set in tags.split(";")
+    ]
+
+
+def read_preference(category: str) -> Any:
+    """Building the read preference configured for an operation category."""
+
+    setting: Dict[str, Any] = READ_ROUTING.get(category, READ_ROUTING["primary"])
+
+    if setting["mode"] not in MODES:
+        raise ValueError(f"Unknown read preference: {setting['mode']}")
+
+    elif setting["mode"] == "primary":
+        return Primary()
+
+    return MODES[setting["mode"]](
+        tag_sets=parse_tags(setting["tags"]), max_staleness=setting["max-staleness"]
+    )
+
+
+def route(collection: AgnosticCollection, category: str) -> AgnosticCollection:
+    """Getting the collection handle that reads with the category preference."""
+
+    key: Tuple[int, str] = (id(collection), category)
+
+    if key not in ROUTED:
+        ROUTED[key] = collection.with_options(read_preference=read_preference(category))
+
+    return ROUTED[key]
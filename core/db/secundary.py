@@ -1,97 +1,105 @@
 # Standard modules.
 
+import asyncio
+import base64
 import datetime
-import time
-import os
 
-from typing import Any, Dict, List
-
-# Third party modules.
-
-import pymongo
-
-from motor.motor_asyncio import AsyncIOMotorClient
-from motor.core import AgnosticClient, AgnosticCollection
-from pymongo.results import DeleteResult, InsertOneResult
-from pymongo import MongoClient
-from pymongo.collection import Collection
+from typing import IO, Any, Dict, List
 
 # Own modules.
 
-from .primary import USERS, get_token_with_username
+from ..ids import is_id
+from ..compression import COMPRESSOR
+from .primary import REPOSITORY, get_token_with_username
+from ..config import (
+    QUEUE_MAX_BYTES,
+    QUEUE_MAX_MESSAGES,
+    QUEUE_OVERFLOW_POLICY,
+    QUEUE_LOW_WATER,
+    QUEUE_HISTORY_RETENTION,
+    QUEUE_HISTORY_SWEEP_DELETES_PER_SECOND,
+)
 
 """Secundary Client Database."""
 
-SECUNDARY_CLIENT: AgnosticClient = AsyncIOMotorClient(
-    os.environ["MongoDB"], maxPoolSize=None
-)
-QUEUE_HISTORY: AgnosticCollection = SECUNDARY_CLIENT.get_database(
-    "messages"
-).get_collection("queue history")
-TEMP_USERS: AgnosticCollection = SECUNDARY_CLIENT.get_database("users").get_collection(
-    "users temporal"
-)
+# Times a compaction is planned again after losing the queue to another write.
+QUEUE_COMPACTION_RETRIES: int = 5
 
 # Temporary Users Section - Secondary DB
 
 
-async def find_possible_user(username: str = "", email: str = "") -> bool:
+async def ensure_indexes() -> None:
+    """Migrating older documents, then creating the indexes of the engine."""
 
-    user: Dict[str, Any] | None = await USERS.find_one(
-        {
-            "username": {"$regex": username, "$options": "i"},
-            "email": {"$regex": email, "$options": "i"},
-        }
-    )
-    temp_user: Dict[str, Any] | None = await TEMP_USERS.find_one(
-        {
-            "username": {"$regex": username, "$options": "i"},
-            "email": {"$regex": email, "$options": "i"},
-        }
+    await REPOSITORY.migrate()
+
+    # Accounts older than the normalized fields may differ only by case, checked
+    # until the unique indexes are built, which then refuse them.
+    conflicts: List[str] = (
+        [] if await REPOSITORY.unique_indexes() else await case_duplicates()
     )
 
-    return True if user is None and temp_user is None else False
+    if conflicts:
 
+        raise RuntimeError(
+            "The unique username and email indexes can not be built, these "
+            "accounts differ only by case: "
+            + "; ".join(conflicts)
+            + ". Rename (with its username-lower and email-lower) or delete all "
+            "but one of each group and start again."
+        )
 
-async def post_temp_user(user: Dict[str, Any]) -> bool:
+    await REPOSITORY.create_indexes()
 
-    result: InsertOneResult = await TEMP_USERS.insert_one(user)
 
-    return True if result.inserted_id == user["_id"] else False
+async def case_duplicates() -> List[str]:
+    """The usernames and emails shared by several users once lowercased."""
 
+    groups: Dict[tuple, List[str]] = {}
 
-async def terminate_temp_user(id: str = "") -> bool:
+    # Grouped by the normalized fields, the ones the unique indexes are built on.
+    async for user in REPOSITORY.all_users(
+        ["username", "email", "username-lower", "email-lower"]
+    ):
 
-    result: DeleteResult = await TEMP_USERS.delete_one({"_id": id})
+        for field in ("username", "email"):
 
-    return True if result.deleted_count == 1 else False
+            groups.setdefault(
+                (field, user.get(f"{field}-lower", user[field].lower())), []
+            ).append(user[field])
 
+    return [
+        f"{field} {', '.join(values)}"
+        for (field, _), values in groups.items()
+        if len(values) > 1
+    ]
 
-async def is_valid_verification_code(code: str = "") -> bool:
 
-    result: Dict[str, Any] | None = await TEMP_USERS.find_one(
-        {"verification.code": code}
-    )
+async def find_possible_user(username: str = "", email: str = "") -> bool:
 
-    return (
-        True
-        if isinstance(result, dict) and result["verification"]["code"] == code
-        else False
-    )
+    return not await REPOSITORY.user_taken(username, email)
 
 
-async def get_temp_user(code: str = "") -> Dict[str, Any] | bool:
+async def post_temp_user(user: Dict[str, Any]) -> bool:
+    """Inserting a temporal user, False when the username or email is taken."""
 
-    result: Dict[str, Any] | None = await TEMP_USERS.find_one(
-        {"verification.code": code}
-    )
+    return await REPOSITORY.insert_temp_user(user)
 
-    return (
-        result
-        if isinstance(result, dict) and result["verification"]["code"] == code
-        else False
+
+async def terminate_temp_user(id: str = "") -> bool:
+
+    return await REPOSITORY.delete_temp_user(id)
+
+
+async def claim_temp_user(code: str = "") -> Dict[str, Any] | bool:
+    """Atomically taking the temporal user of a verification code, only once."""
+
+    result: Dict[str, Any] | None = await REPOSITORY.claim_temp_user(
+        code, datetime.datetime.now(datetime.timezone.utc)
     )
 
+    return result if isinstance(result, dict) else False
+
 
 # Queue History Section - Secondary DB
 
@@ -103,102 +111,491 @@ async def get_queue_history(username: str = "") -> List[Dict[str, Any]] | bool:
     if not isinstance(token, list):
         return False
 
-    result: Dict[str, Any] | None = await QUEUE_HISTORY.find_one({"_id": token[0]})
+    result: Dict[str, Any] | None = await REPOSITORY.get_queue(token[0])
 
     return result["messages"] if isinstance(result, dict) else False
 
 
-async def delete_queue_history(username: str = "") -> bool:
+async def delete_queue_history(
+    username: str = "", ids: List[str] | None = None
+) -> bool:
+    """Deleting the replayed messages, the ones queued meanwhile are kept."""
 
     token: List[str] | bool = await get_token_with_username(username)
 
     if not isinstance(token, list):
         return False
 
-    result: DeleteResult = await QUEUE_HISTORY.delete_one({"_id": token[0]})
+    elif ids is None:
+        return await REPOSITORY.delete_queue(token[0])
+
+    await REPOSITORY.pull_queue(token[0], ids)
+
+    return True
+
+
+def queue_expiration(type: str = "text") -> datetime.datetime:
+    """Computing when a queued entry of the given type stops being delivered."""
 
-    return True if result.deleted_count == 1 else False
+    return datetime.datetime.now(datetime.timezone.utc) + QUEUE_HISTORY_RETENTION.get(
+        type, QUEUE_HISTORY_RETENTION["text"]
+    )
 
 
 async def add_message_queue_history(to: str, message: Dict[str, Any]) -> bool:
 
+    return await add_messages_queue_history(to, [message])
+
+
+async def add_messages_queue_history(to: str, messages: List[Dict[str, Any]]) -> bool:
+    """Queueing many messages to one user in one update, their contain compressed."""
+
     token: List[str] | bool = await get_token_with_username(to)
 
     if not isinstance(token, list):
         return False
 
-    fetch_possible_history: List[Dict[str, Any]] | bool = await get_queue_history(
-        token[0]
+    messages = [await COMPRESSOR.pack_async(message) for message in messages]
+
+    # A batch over the caps on its own keeps only what fits in the queue.
+    dropped: List[Dict[str, Any]] = overflow(messages)
+    entries: List[Dict[str, Any]] = [
+        {**message, "expires-at": queue_expiration(message.get("type", "text"))}
+        for message in messages
+        if not any(message is entry for entry in dropped)
+    ]
+    size: int = sum(queued_size(message) for message in entries)
+
+    if not entries:
+        return False
+
+    for _ in range(QUEUE_COMPACTION_RETRIES):
+
+        # The counters only grow here, a compaction sets them back to the exact values.
+        # Every change bumps the version, a compaction planned on an older one retries.
+        if await REPOSITORY.push_queue(
+            token[0], to, entries, size, QUEUE_MAX_MESSAGES, QUEUE_MAX_BYTES
+        ):
+            return True
+
+        # Trimmed before the push, the queue document never outgrows the caps.
+        await compact_queue_history(token[0], len(entries), size)
+
+    return False
+
+
+def queued_size(message: Dict[str, Any]) -> int:
+
+    contain: Any = message.get("contain", "")
+
+    return len(contain) if isinstance(contain, (str, bytes)) else 0
+
+
+def is_delete_action(entry: Dict[str, Any]) -> bool:
+
+    return entry.get("action") == "delete message" and "message id" in entry
+
+
+def overflow(
+    messages: List[Dict[str, Any]],
+    max_messages: int = QUEUE_MAX_MESSAGES,
+    max_bytes: int = QUEUE_MAX_BYTES,
+    policy: str = QUEUE_OVERFLOW_POLICY,
+    low_water: float = QUEUE_LOW_WATER,
+) -> List[Dict[str, Any]]:
+    """The messages dropped to fit the caps, oldest first in the order of the policy."""
+
+    count: int = len(messages)
+    size: int = sum(queued_size(message) for message in messages)
+
+    if count <= max_messages and size <= max_bytes:
+        return []
+
+    # Trimmed below the caps, the next appends fit without compacting again.
+    max_messages = max(int(max_messages * low_water), 0)
+    max_bytes = max(int(max_bytes * low_water), 0)
+
+    candidates: List[Dict[str, Any]] = (
+        [message for message in messages if message.get("type") in ("img", "video")]
+        + [
+            message
+            for message in messages
+            if message.get("type") not in ("img", "video")
+        ]
+        if policy == "media-first"
+        else list(messages)
     )
+    dropped: List[Dict[str, Any]] = []
 
-    if isinstance(fetch_possible_history, list):
+    for message in candidates:
 
-        await QUEUE_HISTORY.update_one({"_id": token}, {"$push": {"messages": message}})
+        if count <= max_messages and size <= max_bytes:
+            break
 
-        return True
+        dropped.append(message)
+        count -= 1
+        size -= queued_size(message)
 
-    await QUEUE_HISTORY.insert_one(
-        {
-            "_id": token,
-            "username": to,
-            "created-at": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-            "messages": [message],
-        }
+    return dropped
+
+
+async def compact_queue_history(
+    token: str = "", count: int = 0, size: int = 0
+) -> Dict[str, int] | bool:
+    """Folding delete actions into the queued messages they target, dropping
+    duplicates and the overflow of the caps, with room left for count messages
+    of size bytes about to be queued. False when there is no queue.
+    """
+
+    for _ in range(QUEUE_COMPACTION_RETRIES):
+
+        # From the primary, a secondary lags behind the version the rewrite checks.
+        queue: Dict[str, Any] | None = await REPOSITORY.get_queue(token, primary=True)
+
+        if not isinstance(queue, dict):
+            return False
+
+        plan: Dict[str, Any] = compaction_plan(
+            queue["messages"],
+            await REPOSITORY.get_actions(token, primary=True) or [],
+            count,
+            size,
+        )
+
+        # Written only over the version it was planned on, else planned again.
+        if await REPOSITORY.rewrite_queue(
+            token,
+            queue.get("version"),
+            plan["kept"],
+            sum(queued_size(message) for message in plan["kept"]),
+        ):
+            break
+
+    else:
+
+        return False
+
+    if plan["stale"]:
+        await REPOSITORY.pull_actions(token, plan["stale"])
+
+    if plan["moved"]:
+
+        await REPOSITORY.push_actions(
+            token,
+            [
+                {**action, "expires-at": queue_expiration("action")}
+                for action in plan["moved"]
+            ],
+        )
+
+    return {
+        "folded": len(plan["folded"]),
+        "duplicates": len(plan["duplicated"]),
+        "overflowed": len(plan["overflowed"]),
+        "actions": len(plan["stale"]),
+    }
+
+
+def compaction_plan(
+    messages: List[Dict[str, Any]],
+    actions: List[Dict[str, Any]],
+    count: int = 0,
+    size: int = 0,
+) -> Dict[str, Any]:
+    """The messages kept in their queued order, and the actions to drop or move."""
+
+    # Old clients queued their delete actions as messages.
+    legacy: List[Dict[str, Any]] = [
+        entry for entry in messages if is_delete_action(entry)
+    ]
+    targets: set = {
+        (action["message id"], action.get("from"))
+        for action in legacy + actions
+        if is_delete_action(action)
+    }
+
+    kept: List[Dict[str, Any]] = []
+    ids: set = set()
+    duplicated: set = set()
+    folded: set = set()
+
+    for message in messages:
+
+        if is_delete_action(message):
+            continue
+
+        elif message.get("id") in ids:
+            duplicated.add(message["id"])
+
+        elif (message.get("id"), message.get("from")) in targets:
+            folded.add(message["id"])
+
+        else:
+
+            ids.add(message.get("id"))
+            kept.append(message)
+
+    overflowed: List[Dict[str, Any]] = overflow(
+        kept, QUEUE_MAX_MESSAGES - count, QUEUE_MAX_BYTES - size
+    )
+    dropped: set = folded | {message.get("id") for message in overflowed}
+
+    # The actions of folded messages are never replayed, repeated ones once.
+    stale: List[Dict[str, Any]] = []
+    pending: set = set()
+
+    for action in actions:
+
+        key: tuple = (
+            action.get("action"),
+            action.get("message id"),
+            action.get("from"),
+        )
+
+        if action.get("message id") in folded or key in pending:
+            stale.append(action)
+
+        pending.add(key)
+
+    return {
+        "kept": [message for message in kept if message.get("id") not in dropped],
+        "folded": folded,
+        "duplicated": duplicated,
+        "overflowed": overflowed,
+        "stale": stale,
+        "moved": [
+            action
+            for action in legacy
+            if action["message id"] not in folded
+            and (action.get("action"), action["message id"], action.get("from"))
+            not in pending
+        ],
+    }
+
+
+async def compact_queue_histories() -> None:
+    """Paced compaction of every Queue History."""
+
+    pause: float = 1 / max(QUEUE_HISTORY_SWEEP_DELETES_PER_SECOND, 1)
+
+    async for token in REPOSITORY.all_queues():
+
+        await compact_queue_history(token)
+        await asyncio.sleep(pause)
+
+
+async def remove_queued_message(to: str = "", from_: str = "", id: str = "") -> bool:
+    """Removing a message still waiting in the Queue History, True when it was there."""
+
+    token: List[str] | bool = await get_token_with_username(to)
+
+    if not isinstance(token, list):
+        return False
+
+    # The sender is stamped by the server, so only its own messages match.
+    # Matched and pulled in one write, a message queued a moment ago is found.
+    removed: List[Dict[str, Any]] = await REPOSITORY.pull_queued(token[0], id, from_)
+
+    if not removed:
+        return False
+
+    # Discounted only by the write that pulled the entries.
+    await REPOSITORY.discount_queue(
+        token[0], len(removed), sum(queued_size(message) for message in removed)
     )
 
     return True
 
 
-def cleaner_temporal_accounts() -> None:
-    """Cleaner of temporal accounts."""
+# Conversation History Section - Secondary DB
+
+
+def conversation_id(first: str = "", second: str = "") -> str:
+    """The same id for both members, the length prefix keeps it unambiguous."""
+
+    first, second = sorted((first, second))
+
+    return f"{len(first)}:{first}:{second}"
+
+
+def summarize(message: Dict[str, Any]) -> Dict[str, Any]:
+    """The last message of a conversation, without the hex of its media."""
+
+    return {
+        key: value
+        for key, value in message.items()
+        if key != "contain" or message.get("type") == "text"
+    }
+
+
+async def add_conversation_messages(
+    from_: str, to: str, messages: List[Dict[str, Any]]
+) -> bool:
+    """Appending messages under their authenticated sender, then moving the summary."""
 
-    CLIENT: MongoClient = pymongo.MongoClient(os.environ["MongoDB"], maxPoolSize=None)
-    TEMP_USERS: Collection = CLIENT.get_database("users").get_collection(
-        "users temporal"
+    if not messages:
+        return False
+
+    id: str = conversation_id(from_, to)
+    now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+
+    # Already delivered, an id taken twice only loses its history copy.
+    await REPOSITORY.insert_history(
+        [
+            {
+                "_id": message["id"],
+                "conversation": id,
+                "message": {**message, "from": from_, "to": to},
+                "created-at": now,
+            }
+            for message in messages
+        ]
+    )
+    await REPOSITORY.set_conversation(
+        id,
+        sorted((from_, to)),
+        {**summarize(messages[-1]), "from": from_, "to": to},
+        now,
     )
 
-    while True:
+    return True
 
-        if TEMP_USERS.count_documents({}) == 0:
-            continue
 
-        temp_users: List[Dict[str, Any]] = list(TEMP_USERS.find())
+async def delete_conversation_message(
+    from_: str = "", to: str = "", id: str = ""
+) -> bool:
+    """Deleting a message of its sender, moving the summary back if it was the last."""
+
+    conversation: str = conversation_id(from_, to)
+
+    if not await REPOSITORY.delete_history(id, conversation, from_):
+        return False
+
+    summary: Dict[str, Any] | None = await REPOSITORY.get_conversation(conversation)
+
+    if isinstance(summary, dict) and summary["last-message"].get("id") == id:
 
-        for user in temp_users:
+        # From the primary, a lagging secondary still has the deleted message.
+        latest: List[Dict[str, Any]] = await REPOSITORY.history_page(
+            conversation, "", 1, primary=True
+        )
 
-            if (
-                datetime.datetime.strptime(
-                    user["verification"]["remaining"], "%Y-%m-%d %H:%M:%S.%f"
-                )
-                <= datetime.datetime.now()
-            ):
+        if latest:
 
-                TEMP_USERS.delete_one({"_id": user["_id"]})
-                continue
+            await REPOSITORY.set_conversation(
+                conversation,
+                summary["members"],
+                summarize(latest[0]["message"]),
+                latest[0]["created-at"],
+            )
 
-        time.sleep(60)
+        else:
 
+            await REPOSITORY.delete_conversation(conversation)
+
+    return True
+
+
+def encode_cursor(id: str) -> str:
+
+    return base64.urlsafe_b64encode(id.encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor: str = "") -> str | bool:
+
+    try:
+        id: str = base64.urlsafe_b64decode(cursor).decode("ascii")
+    except (TypeError, ValueError):
+        return False
+
+    return id if is_id(id) else False
 
-def cleaner_queue_history() -> None:
-    """Cleaner of the Queue History."""
 
-    CLIENT: MongoClient = pymongo.MongoClient(os.environ["MongoDB"], maxPoolSize=None)
-    QUEUE_HISTORY: Collection = CLIENT.get_database("messages").get_collection(
-        "queue history"
+async def get_conversation_history(
+    first: str = "", second: str = "", cursor: str = "", limit: int = 50
+) -> Dict[str, Any] | bool:
+    """A page of messages, newest first, and the cursor of the next one or None."""
+
+    before: str | bool = decode_cursor(cursor) if cursor else ""
+
+    if before is False:
+        return False
+
+    # One extra entry tells whether an older page exists.
+    entries: List[Dict[str, Any]] = await REPOSITORY.history_page(
+        conversation_id(first, second), before, limit + 1
     )
 
-    while True:
+    return {
+        "messages": [
+            {**entry["message"], "created-at": entry["created-at"]}
+            for entry in entries[:limit]
+        ],
+        "cursor": (
+            encode_cursor(entries[limit - 1]["_id"]) if len(entries) > limit else None
+        ),
+    }
 
-        time.sleep(60 * 60 * 25)
 
-        if QUEUE_HISTORY.count_documents({}) == 0:
-            continue
+async def get_last_messages(
+    username: str = "", limit: int = 50
+) -> List[Dict[str, Any]]:
+    """The latest conversations of a user from their summaries, no history scan."""
 
-        elif (
-            datetime.datetime.now().day == 1 and datetime.datetime.now().month % 2 == 0
-        ):
+    conversations: List[Dict[str, Any]] = await REPOSITORY.conversations_of(
+        username, limit
+    )
 
-            QUEUE_HISTORY.delete_many({})
-            continue
+    return [
+        {
+            "username": next(
+                (member for member in conversation["members"] if member != username),
+                username,
+            ),
+            "last-message": conversation["last-message"],
+            "updated-at": conversation["updated-at"],
+        }
+        for conversation in conversations
+    ]
+
+
+# Media Section - Secondary DB
+
+
+async def put_media(
+    source: IO[bytes], filename: str = "", metadata: Dict[str, Any] | None = None
+) -> str:
+    """Storing an uploaded file, read from the source in chunks by the bucket."""
+
+    return await REPOSITORY.put_media(source, filename, metadata)
+
+
+async def get_media(id: str = "") -> Any | bool:
+    """Opening a stored file for chunked reads, False when it does not exist."""
+
+    media: Any | None = await REPOSITORY.get_media(id)
+
+    return media if media is not None else False
+
+
+async def delete_media(id: str = "") -> bool:
+
+    return await REPOSITORY.delete_media(id)
+
+
+async def sweep_queue_history() -> None:
+    """Paced sweep of the expired Queue History and action entries."""
+
+    pause: float = 1 / max(QUEUE_HISTORY_SWEEP_DELETES_PER_SECOND, 1)
+
+    for expired, expire in [
+        (REPOSITORY.expired_queues, REPOSITORY.expire_queue),
+        (REPOSITORY.expired_actions, REPOSITORY.expire_actions),
+    ]:
+
+        now: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+
+        async for token in expired(now):
+
+            await expire(token, now)
+            await asyncio.sleep(pause)
@@ -7,14 +7,14 @@ import fastapi
 # Standard modules.
 
 import asyncio
-import concurrent.futures
+import hmac
 
-from typing import Any, Dict, List, Literal
+from typing import Any, Dict, List
 
 # Own modules.
 
 from .db.primary import (
-    USERS,
+    REPOSITORY,
     contact_add_or_remove,
     add_action_message,
     get_action_messages,
@@ -23,245 +23,262 @@ from .db.primary import (
 from .db.secundary import (
     get_queue_history,
     add_message_queue_history,
+    add_messages_queue_history,
     delete_queue_history,
+    remove_queued_message,
 )
+from .serializer import Frame
+from .compression import COMPRESSOR
 
-GATEWAY_THREAD_POOL: concurrent.futures.ThreadPoolExecutor = (
-    concurrent.futures.ThreadPoolExecutor(
-        max_workers=5000, thread_name_prefix="Gateway"
-    )
-)
+# The connections by username, and by email for the credential checks.
+GATEWAY_INDEX: Dict[str, Dict[str, Any]] = {}
+GATEWAY_EMAILS: Dict[str, Dict[str, Any]] = {}
 
-GATEWAY_CONEXIONS: List[Dict[str, Any]] = []
+UNKNOWN_RECIPIENT: str = "The user you are trying to send a message to does not exist."
 
 
 class GatewayTools:
 
+    @staticmethod
+    def find(email: str, password: str) -> Dict[str, Any] | None:
+        """The connection of an email and a password, looked up without a scan."""
+
+        connection: Dict[str, Any] | None = GATEWAY_EMAILS.get(email)
+
+        if connection is None or not hmac.compare_digest(
+            connection["password"].encode(), password.encode()
+        ):
+            return None
+
+        return connection
+
     @staticmethod
     async def connect_websocket(
-        connection: Dict[str, Any],
-        email: str,
-        password: str,
-        websocket: fastapi.WebSocket,
+        connection: Dict[str, Any], websocket: fastapi.WebSocket
     ) -> None:
 
-        if connection["email"] == email and connection["password"] == password:
+        await websocket.accept()
+
+        connection["websocket"] = websocket
 
-            await websocket.accept()
+        queue_history: List[Dict[str, Any]] | bool = await get_queue_history(
+            connection["username"]
+        )
+        actions_messages: List[Dict[str, Any]] | bool = await get_action_messages(
+            connection["username"]
+        )
 
-            connection["websocket"] = websocket
+        if isinstance(queue_history, list):
 
-            queue_history: List[Dict[str, Any]] | bool = await get_queue_history(
-                connection["username"]
+            await asyncio.gather(
+                *[
+                    GatewayTools.send_temp_message(message, websocket)
+                    for message in queue_history
+                ],
+                return_exceptions=True
             )
-            actions_messages: List[Dict[str, Any]] | bool = await get_action_messages(
-                connection["username"]
+            await delete_queue_history(
+                connection["username"],
+                [message["id"] for message in queue_history],
             )
 
-            if isinstance(queue_history, list):
+        if isinstance(actions_messages, list):
 
-                await asyncio.gather(
-                    *[
-                        GatewayTools.send_temp_message(message, websocket)
-                        for message in queue_history
-                    ],
-                    return_exceptions=True
-                )
-                await delete_queue_history(connection["username"])
+            await asyncio.gather(
+                *[
+                    GatewayTools.send_temp_message(message, websocket)
+                    for message in actions_messages
+                ],
+                return_exceptions=True
+            )
+            await delete_action_messages(connection["username"], actions_messages)
 
-            if isinstance(actions_messages, list):
+    @staticmethod
+    async def send_live(connection: Dict[str, Any], frame: Frame) -> bool:
+        """Sending to the socket of a connection, False when it has none or it dropped."""
 
-                await asyncio.gather(
-                    *[
-                        GatewayTools.send_temp_message(message, websocket)
-                        for message in actions_messages
-                    ],
-                    return_exceptions=True
-                )
-                await delete_action_messages(connection["username"])
+        if connection["websocket"] is None:
+            return False
 
-    @staticmethod
-    async def connect(email: str, password: str, websocket: fastapi.WebSocket) -> None:
+        try:
 
-        await asyncio.gather(
-            *[
-                GatewayTools.connect_websocket(connection, email, password, websocket)
-                for connection in GATEWAY_CONEXIONS
-            ],
-            return_exceptions=True
-        )
+            await frame.send(connection["websocket"])
 
-    @staticmethod
-    async def disconnect(websocket: fastapi.WebSocket) -> None:
+        except Exception:
 
-        await asyncio.gather(
-            *[
-                GatewayTools.disconnect_websocket(connection, websocket)
-                for connection in GATEWAY_CONEXIONS
-            ],
-            return_exceptions=True
-        )
+            return False
+
+        return True
 
     @staticmethod
-    async def disconnect_websocket(
-        connection: Dict[str, Any], websocket: fastapi.WebSocket
-    ) -> None:
+    async def send_group(
+        connection: Dict[str, Any] | None, to: str, messages: List[Dict[str, Any]]
+    ) -> bool | str:
 
-        if connection["websocket"] is websocket:
-            connection["websocket"] = None
+        if connection is None:
+            return UNKNOWN_RECIPIENT
 
-    @staticmethod
-    async def remove_connection(
-        connection: Dict[str, Any], email: str, password: str
-    ) -> None:
+        await asyncio.gather(
+            *[
+                contact_add_or_remove("add", from_, to)
+                for from_ in {message["from"] for message in messages}
+            ]
+        )
 
-        if connection["email"] == email and connection["password"] == password:
-            GATEWAY_CONEXIONS.remove(connection)
+        sent: int = 0
 
-    @staticmethod
-    async def send_if_have_websocket(
-        to: str,
-        type: Literal["send", "delete"],
-        connection: Dict[str, Any],
-        message: Dict[str, Any],
-    ) -> bool:
-
-        if (
-            type == "send"
-            and connection["username"] == to
-            and connection["websocket"] is not None
-        ):
+        for message in messages:
 
-            await contact_add_or_remove("add", message["from"], to)
-            await connection["websocket"].send_json(message)
-            return True
+            # The socket dropped mid-batch, the rest waits in the queue.
+            if not await GatewayTools.send_live(connection, Frame(message)):
+                break
 
-        elif (
-            type == "delete"
-            and connection["username"] == to
-            and connection["websocket"] is not None
-        ):
+            sent += 1
 
-            await connection["websocket"].send_json(message)
+        if sent == len(messages):
             return True
 
-        return False
+        return await add_messages_queue_history(to, messages[sent:])
 
     @staticmethod
     async def send_temp_message(
         message: Dict[str, Any], websocket: fastapi.WebSocket
     ) -> None:
 
-        await websocket.send_json(message)
+        await Frame(
+            {
+                key: value
+                for key, value in COMPRESSOR.unpack(message).items()
+                if key != "expires-at"
+            }
+        ).send(websocket)
 
 
 class GatewayManager:
 
     @staticmethod
-    def _connect(email: str, password: str, websocket: fastapi.WebSocket) -> None:
+    async def add(username: str, email: str, password: str, token: str) -> None:
 
-        asyncio.run(GatewayTools.connect(email, password, websocket))
+        # The token stays on the server, sessions resolve it from their username.
+        connection: Dict[str, Any] = {
+            "token": token,
+            "username": username,
+            "email": email,
+            "password": password,
+            "websocket": None,
+        }
+
+        GATEWAY_INDEX[username] = connection
+        GATEWAY_EMAILS[email] = connection
 
     @staticmethod
-    def _disconnect(websocket: fastapi.WebSocket) -> None:
+    async def remove(email: str, password: str) -> None:
 
-        asyncio.run(GatewayTools.disconnect(websocket))
+        connection: Dict[str, Any] | None = GatewayTools.find(email, password)
 
-    @staticmethod
-    async def add(username: str, email: str, password: str) -> None:
+        if connection is not None:
+
+            GATEWAY_INDEX.pop(connection["username"], None)
+            GATEWAY_EMAILS.pop(connection["email"], None)
 
-        GATEWAY_CONEXIONS.append(
-            {
-                "username": username,
-                "email": email,
-                "password": password,
-                "websocket": None,
-            }
-        )
+
+class Gateway:
 
     @staticmethod
-    async def remove(email: str, password: str) -> None:
+    async def connect(
+        email: str, password: str, websocket: fastapi.WebSocket
+    ) -> Dict[str, Any] | None:
+        """Connecting the user of an email and a password, None when there is none."""
 
-        await asyncio.gather(
-            *[
-                GatewayTools.remove_connection(connection, email, password)
-                for connection in GATEWAY_CONEXIONS
-            ],
-            return_exceptions=True
-        )
+        connection: Dict[str, Any] | None = GatewayTools.find(email, password)
 
+        if connection is not None:
 
-class Gateway:
+            # On the loop of the app, a socket can not be used from another event loop.
+            await GatewayTools.connect_websocket(connection, websocket)
+
+        return connection
 
     @staticmethod
-    def connect(email: str, password: str, websocket: fastapi.WebSocket) -> None:
+    async def connect_session(
+        username: str, websocket: fastapi.WebSocket
+    ) -> Dict[str, Any] | None:
+        """Connecting a verified session straight to its user, without a scan."""
+
+        connection: Dict[str, Any] | None = GATEWAY_INDEX.get(username)
+
+        if connection is not None:
+            await GatewayTools.connect_websocket(connection, websocket)
 
-        GATEWAY_THREAD_POOL.submit(GatewayManager._connect, email, password, websocket)
+        return connection
 
     @staticmethod
-    def disconnect(websocket: fastapi.WebSocket) -> None:
+    async def disconnect(
+        connection: Dict[str, Any], websocket: fastapi.WebSocket
+    ) -> None:
 
-        GATEWAY_THREAD_POOL.submit(GatewayManager._disconnect, websocket)
+        # A newer socket of the same user stays connected.
+        if connection["websocket"] is websocket:
+            connection["websocket"] = None
 
     @staticmethod
     async def send_message(to: str, message: Dict[str, Any]) -> bool | str:
 
-        results: List[bool | Any] = await asyncio.gather(
-            *[
-                GatewayTools.send_if_have_websocket(to, "send", connection, message)
-                for connection in GATEWAY_CONEXIONS
-            ],
-            return_exceptions=True
-        )
+        connection: Dict[str, Any] | None = GATEWAY_INDEX.get(to)
 
-        for result in results:
-
-            if isinstance(result, bool):
-                return True
+        if connection is None:
+            return UNKNOWN_RECIPIENT
 
         await contact_add_or_remove("add", message["from"], to)
-        return (
-            await add_message_queue_history(to, message)
-            if not any(to == connection["username"] for connection in GATEWAY_CONEXIONS)
-            else "The user you are trying to send a message to does not exist."
-        )
+
+        if await GatewayTools.send_live(connection, Frame(message)):
+            return True
+
+        return await add_message_queue_history(to, message)
 
     @staticmethod
-    async def delete_message(to: str, action: Dict[str, Any]) -> bool | str:
+    async def send_batch(
+        batch: Dict[str, List[Dict[str, Any]]],
+    ) -> Dict[str, bool | str]:
+        """Delivering messages grouped by recipient, each offline group queued at once."""
 
-        results: List[bool | Any] = await asyncio.gather(
+        results: List[bool | str | Any] = await asyncio.gather(
             *[
-                GatewayTools.send_if_have_websocket(to, "delete", connection, action)
-                for connection in GATEWAY_CONEXIONS
+                GatewayTools.send_group(GATEWAY_INDEX.get(to), to, messages)
+                for to, messages in batch.items()
             ],
             return_exceptions=True
         )
 
-        for result in results:
+        return {
+            to: result if isinstance(result, (bool, str)) else False
+            for to, result in zip(batch, results)
+        }
 
-            if isinstance(result, bool):
-                return True
+    @staticmethod
+    async def delete_message(to: str, action: Dict[str, Any]) -> bool | str:
 
-        return (
-            await add_action_message(to, action)
-            if not any(to == connection["username"] for connection in GATEWAY_CONEXIONS)
-            else "The user you are trying to send a message to does not exist."
-        )
+        connection: Dict[str, Any] | None = GATEWAY_INDEX.get(to)
+
+        if connection is None:
+            return UNKNOWN_RECIPIENT
+
+        # Still queued, it is removed in place: neither it nor the action is replayed.
+        elif await remove_queued_message(to, action["from"], action["message id"]):
+            return True
+
+        elif await GatewayTools.send_live(connection, Frame(action)):
+            return True
+
+        return await add_action_message(to, action)
 
     @staticmethod
     async def load() -> None:
 
-        conexions_to_add: List[Dict[str, Any]] = []
-
-        async for user in USERS.find({}):
+        async for user in REPOSITORY.all_users(
+            ["_id", "username", "email", "password"]
+        ):
 
-            conexions_to_add.append(
-                {
-                    "username": user["username"],
-                    "email": user["email"],
-                    "password": user["password"],
-                    "websocket": None,
-                }
+            await GatewayManager.add(
+                user["username"], user["email"], user["password"], user["_id"]
             )
-
-        GATEWAY_CONEXIONS.extend(conexions_to_add)
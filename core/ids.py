@@ -0,0 +1,122 @@
+"""The message ids of BlackWell."""
+
+# Standard modules.
+
+import os
+import socket
+import time
+import zlib
+
+from typing import List
+
+# Own modules.
+
+from .config import NODE_ID
+
+# Milliseconds of 2024-01-01 UTC, 41 bits of milliseconds last until 2093.
+EPOCH: int = 1704067200000
+
+NODE_BITS: int = 10
+NODE_COUNT: int = 1 << NODE_BITS
+SEQUENCE_BITS: int = 12
+SEQUENCE_MASK: int = (1 << SEQUENCE_BITS) - 1
+
+# 64 bits are 13 base32hex characters, its alphabet (0-9, A-V) sorts like the bits.
+ID_LENGTH: int = 13
+ALPHABET: str = "0123456789ABCDEFGHIJKLMNOPQRSTUV"
+ID_ALPHABET: frozenset = frozenset(ALPHABET)
+
+# Every 10 bits as their two characters, base64.b32hexencode is pure Python.
+PAIRS: List[str] = [ALPHABET[i >> 5] + ALPHABET[i & 31] for i in range(1024)]
+
+
+def default_node() -> int:
+    """A node from the host and the process, the first one tried in the registry."""
+
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) % NODE_COUNT
+
+
+class IdGenerator:
+    """Snowflake ids: milliseconds since EPOCH, the node and a sequence.
+
+    Ids of one node increase strictly, a clock going back or more than 4096
+    ids in a millisecond borrow the following milliseconds.
+    """
+
+    __slots__ = ("node", "last", "sequence")
+
+    def __init__(self, node: int = NODE_ID) -> None:
+
+        self.node: int = (node if node >= 0 else default_node()) << SEQUENCE_BITS
+        self.last: int = 0
+        self.sequence: int = 0
+
+    def next(self) -> int:
+
+        now: int = time.time_ns() // 1000000 - EPOCH
+
+        if now > self.last:
+
+            self.last = now
+            self.sequence = 0
+
+        else:
+
+            self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+
+            if self.sequence == 0:
+                self.last += 1
+
+        return self.last << (NODE_BITS + SEQUENCE_BITS) | self.node | self.sequence
+
+    def new(self) -> str:
+
+        return encode(self.next())
+
+
+def encode(value: int) -> str:
+
+    # 65 bits, the padding bit last: one character then six pairs.
+    value <<= 1
+
+    return (
+        ALPHABET[value >> 60]
+        + PAIRS[value >> 50 & 1023]
+        + PAIRS[value >> 40 & 1023]
+        + PAIRS[value >> 30 & 1023]
+        + PAIRS[value >> 20 & 1023]
+        + PAIRS[value >> 10 & 1023]
+        + PAIRS[value & 1023]
+    )
+
+
+def is_id(string: str) -> bool:
+
+    return (
+        isinstance(string, str)
+        and len(string) == ID_LENGTH
+        and ID_ALPHABET.issuperset(string)
+    )
+
+
+def id_time(string: str) -> float:
+    """The creation time of an id, in seconds since the Unix epoch."""
+
+    value: int = int(string, 32) >> 1
+
+    return ((value >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH) / 1000
+
+
+IDS: IdGenerator = IdGenerator()
+
+if NODE_ID < 0:
+
+    # Forked workers (e.g. a preloading server) would share the node of the parent.
+    os.register_at_fork(
+        after_in_child=lambda: IDS.__init__(default_node()),
+    )
+
+
+def new_id() -> str:
+
+    return IDS.new()
@@ -0,0 +1,133 @@
+"""The image processing of BlackWell, run in a pool of processes."""
+
+# Standard modules.
+
+import asyncio
+import concurrent.futures
+import io
+import multiprocessing
+
+from typing import Dict, List
+
+# Third party modules.
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Own modules.
+
+from .config import (
+    AVATAR_SIZES,
+    IMAGE_FORMAT,
+    IMAGE_MAX_PIXELS,
+    IMAGE_QUALITY,
+    IMAGE_WORKERS,
+    THUMBNAIL_SIZE,
+)
+
+IMAGE_MIMES: Dict[str, str] = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+}
+
+
+def render(source: bytes, sizes: List[int], square: bool) -> Dict[int, bytes]:
+    """Encoding the image at every size, cropped to squares or fit inside them."""
+
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+    renditions: Dict[int, bytes] = {}
+
+    with Image.open(io.BytesIO(source)) as image:
+
+        # JPEGs decode straight at a reduced scale, far cheaper than a full decode.
+        image.draft("RGB", (max(sizes), max(sizes)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if IMAGE_FORMAT != "JPEG" else "RGB")
+
+        for size in sizes:
+
+            if square:
+
+                resized: Image.Image = ImageOps.fit(
+                    image, (size, size), Image.Resampling.LANCZOS
+                )
+
+            else:
+
+                resized = image.copy()
+                resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+            output: io.BytesIO = io.BytesIO()
+            resized.save(output, IMAGE_FORMAT, quality=IMAGE_QUALITY)
+            renditions[size] = output.getvalue()
+
+    return renditions
+
+
+class ImagePipeline:
+    """Downscaling images off the event loop, disabled when Pillow is missing."""
+
+    def __init__(self, workers: int = IMAGE_WORKERS) -> None:
+
+        self.workers: int = workers
+        self.executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self.mime: str = IMAGE_MIMES.get(IMAGE_FORMAT, "application/octet-stream")
+
+    @property
+    def available(self) -> bool:
+
+        return Image is not None and self.executor is not None
+
+    def start(self) -> None:
+
+        if Image is not None and self.workers > 0:
+
+            # Forked workers would inherit the event loop and the database clients.
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    async def shutdown(self) -> None:
+
+        if self.executor is not None:
+
+            await asyncio.to_thread(self.executor.shutdown, True, cancel_futures=True)
+            self.executor = None
+
+    async def run(
+        self, source: bytes, sizes: List[int], square: bool
+    ) -> Dict[int, bytes] | bool:
+
+        if not self.available:
+            return False
+
+        try:
+
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, render, source, sizes, square
+            )
+
+        except Exception:
+
+            # Undecodable or oversized images keep only their original.
+            return False
+
+    async def avatars(self, source: bytes) -> Dict[int, bytes] | bool:
+        """Square avatars at every AVATAR_SIZES."""
+
+        return await self.run(source, AVATAR_SIZES, True)
+
+    async def thumbnail(self, source: bytes) -> bytes | bool:
+        """A thumbnail fit inside THUMBNAIL_SIZE, keeping the aspect ratio."""
+
+        result: Dict[int, bytes] | bool = await self.run(
+            source, [THUMBNAIL_SIZE], False
+        )
+
+        return result[THUMBNAIL_SIZE] if isinstance(result, dict) else False
+
+
+IMAGES: ImagePipeline = ImagePipeline()
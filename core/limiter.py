@@ -0,0 +1,302 @@
+"""The rate limiters of BlackWell."""
+
+# Standard modules.
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+# Own modules.
+
+from .db.engine import Repository
+from .db.primary import REPOSITORY
+from .config import (
+    LIMITER_BACKEND,
+    LIMITER_MAX_KEYS,
+    LIMITER_MMAP_BUCKETS,
+    LIMITER_MMAP_PATH,
+)
+
+
+class MemoryLimiterState:
+    """Window counters of one process, bounded by LRU and idle eviction."""
+
+    def __init__(self, max_keys: int = LIMITER_MAX_KEYS) -> None:
+
+        self.max_keys: int = max_keys
+        # key -> [window, current count, previous count, idle after]
+        self.entries: OrderedDict[str, List[Any]] = OrderedDict()
+
+    async def increment(
+        self, key: str, window: int, period: float, amount: int = 1
+    ) -> Tuple[int, int]:
+        """Counting a hit in the window, returning the current and previous counts."""
+
+        entry: List[Any] | None = self.entries.get(key)
+
+        if entry is None:
+
+            entry = [window, 0, 0, 0.0]
+            self.entries[key] = entry
+
+        else:
+
+            self.entries.move_to_end(key)
+
+        if entry[0] != window:
+
+            entry[2] = entry[1] if entry[0] == window - 1 else 0
+            entry[0], entry[1] = window, 0
+
+        entry[1] += amount
+
+        # Limiters of different periods share the table, so idleness is in seconds.
+        entry[3] = (window + 2) * period
+
+        self.evict(window * period)
+
+        return entry[1], entry[2]
+
+    async def decrement(self, key: str, window: int, amount: int = 1) -> None:
+
+        entry: List[Any] | None = self.entries.get(key)
+
+        if entry is not None and entry[0] == window:
+            entry[1] = max(entry[1] - amount, 0)
+
+    def evict(self, now: float) -> None:
+
+        while len(self.entries) > self.max_keys:
+            self.entries.popitem(last=False)
+
+        # The least recently used keys idle for two windows hold no information.
+        for _ in range(2):
+
+            if not self.entries:
+                return
+
+            key, entry = next(iter(self.entries.items()))
+
+            if entry[3] > now:
+                return
+
+            del self.entries[key]
+
+
+class MmapLimiterState:
+    """Window counters shared by the workers of one host through a mapped file.
+
+    The file is a table of buckets of SLOTS slots. A key only lives in the bucket
+    its hash points to, so a hit locks (fcntl) just the bytes of that bucket, and
+    a full bucket recycles the slot idle for the longest.
+    """
+
+    # key hash, window, current count, previous count, idle after.
+    SLOT: struct.Struct = struct.Struct("<QqIId")
+    SLOTS: int = 8
+
+    def __init__(
+        self, path: str = LIMITER_MMAP_PATH, buckets: int = LIMITER_MMAP_BUCKETS
+    ) -> None:
+
+        self.buckets: int = buckets
+        self.bucket_size: int = self.SLOT.size * self.SLOTS
+        self.fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        size: int = self.bucket_size * buckets
+
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+
+        self.map: mmap.mmap = mmap.mmap(self.fd, size)
+
+    @staticmethod
+    def digest(key: str) -> int:
+
+        # Never 0, which marks an empty slot.
+        return (
+            int.from_bytes(
+                hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+            )
+            or 1
+        )
+
+    def locked(
+        self, key: str, window: int, change: int, idle: float | None = None
+    ) -> Tuple[int, int]:
+
+        digest: int = self.digest(key)
+        start: int = (digest % self.buckets) * self.bucket_size
+
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, self.bucket_size, start)
+
+        try:
+
+            victim: int = start
+            oldest: float | None = None
+
+            for offset in range(start, start + self.bucket_size, self.SLOT.size):
+
+                slot_digest, slot_window, current, previous, slot_idle = (
+                    self.SLOT.unpack_from(self.map, offset)
+                )
+
+                if slot_digest == digest:
+
+                    if slot_window != window:
+
+                        previous = current if slot_window == window - 1 else 0
+                        current = 0
+
+                    current = max(current + change, 0)
+                    self.SLOT.pack_into(
+                        self.map,
+                        offset,
+                        digest,
+                        window,
+                        current,
+                        previous,
+                        slot_idle if idle is None else idle,
+                    )
+
+                    return current, previous
+
+                # Windows of different periods are not comparable, idle seconds are.
+                elif oldest is None or slot_idle < oldest:
+                    victim, oldest = offset, slot_idle
+
+            if change > 0:
+                self.SLOT.pack_into(
+                    self.map, victim, digest, window, change, 0, idle or 0.0
+                )
+
+            return max(change, 0), 0
+
+        finally:
+
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, self.bucket_size, start)
+
+    async def increment(
+        self, key: str, window: int, period: float, amount: int = 1
+    ) -> Tuple[int, int]:
+
+        return self.locked(key, window, amount, (window + 2) * period)
+
+    async def decrement(self, key: str, window: int, amount: int = 1) -> None:
+
+        self.locked(key, window, -amount)
+
+
+class DatabaseLimiterState:
+    """Window counters in the storage engine, shared by every host of the API."""
+
+    def __init__(self) -> None:
+
+        self.repository: Repository = REPOSITORY
+
+    async def increment(
+        self, key: str, window: int, period: float, amount: int = 1
+    ) -> Tuple[int, int]:
+
+        return await self.repository.increment_window(key, window, period, amount)
+
+    async def decrement(self, key: str, window: int, amount: int = 1) -> None:
+
+        await self.repository.decrement_window(key, window, amount)
+
+
+class SlidingWindowLimiter:
+    """Allowing max_calls per period with a sliding window counter, O(1) per hit."""
+
+    def __init__(
+        self,
+        max_calls: int,
+        period: float,
+        state: (
+            MemoryLimiterState | MmapLimiterState | DatabaseLimiterState | None
+        ) = None,
+        name: str = "",
+    ) -> None:
+
+        self.max_calls: int = max_calls
+        self.period: float = period
+        self.state: MemoryLimiterState | MmapLimiterState | DatabaseLimiterState = (
+            state if state is not None else MemoryLimiterState()
+        )
+        self.prefix: str = f"{name}:" if name else ""
+
+    def clock(self) -> float:
+
+        # Shared states need a clock every worker agrees on.
+        return (
+            time.monotonic()
+            if isinstance(self.state, MemoryLimiterState)
+            else time.time()
+        )
+
+    async def hit(self, key: str, now: float | None = None, cost: int = 1) -> float:
+        """Counting a call of some cost, returning 0 when allowed or the seconds to wait."""
+
+        window, elapsed = divmod(self.clock() if now is None else now, self.period)
+        weight: float = 1 - elapsed / self.period
+
+        current, previous = await self.state.increment(
+            self.prefix + key, int(window), self.period, cost
+        )
+
+        if previous * weight + current <= self.max_calls:
+            return 0
+
+        await self.state.decrement(self.prefix + key, int(window), cost)
+        current -= cost
+
+        # Seconds until the previous window has decayed enough for the call.
+        if previous == 0 or current + cost > self.max_calls:
+            return self.period - elapsed
+
+        decayed: float = 1 - (self.max_calls - current - cost) / previous
+
+        return max(decayed * self.period - elapsed, 0.001)
+
+    async def refund(self, key: str, now: float | None = None, cost: int = 1) -> None:
+        """Giving back an allowed call, when a later check rejected the request."""
+
+        window: float = (self.clock() if now is None else now) // self.period
+
+        await self.state.decrement(self.prefix + key, int(window), cost)
+
+
+LIMITER_STATES: Dict[
+    Tuple[str, str], MemoryLimiterState | MmapLimiterState | DatabaseLimiterState
+] = {}
+
+
+def limiter_state(
+    kind: str = LIMITER_BACKEND, pool: str = ""
+) -> MemoryLimiterState | MmapLimiterState | DatabaseLimiterState:
+    """Getting the state shared by the limiters of a pool of the process for a backend.
+
+    The memory and mmap states are bounded, so a pool keeps its keys from being
+    evicted by the keys of another one.
+    """
+
+    if (kind, pool) not in LIMITER_STATES:
+
+        if kind == "memory":
+            LIMITER_STATES[kind, pool] = MemoryLimiterState()
+        elif kind == "mmap":
+            LIMITER_STATES[kind, pool] = MmapLimiterState(
+                f"{LIMITER_MMAP_PATH}-{pool}" if pool else LIMITER_MMAP_PATH
+            )
+        elif kind == "database":
+            LIMITER_STATES[kind, pool] = DatabaseLimiterState()
+        else:
+            raise ValueError(f"Unknown limiter backend: {kind}")
+
+    return LIMITER_STATES[kind, pool]
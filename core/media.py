@@ -0,0 +1,163 @@
+"""The media validation of BlackWell."""
+
+# Standard modules.
+
+import tempfile
+
+from typing import Dict, List, Literal, Tuple
+
+# Third party modules.
+
+import fastapi
+
+# Own modules.
+
+from .config import MEDIA_MAX_SIZE, UPLOAD_SPOOL_SIZE
+
+# Hex characters checked per step, bounding the memory of a validation.
+HEX_CHUNK: int = 64 * 1024
+
+# (offset, signature, mime type) of every accepted format, per kind of media.
+SIGNATURES: Dict[str, List[Tuple[int, bytes, str]]] = {
+    "img": [
+        (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+        (0, b"\xff\xd8\xff", "image/jpeg"),
+        (0, b"GIF87a", "image/gif"),
+        (0, b"GIF89a", "image/gif"),
+        (8, b"WEBP", "image/webp"),
+    ],
+    "video": [
+        (4, b"ftyp", "video/mp4"),
+        (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+        (8, b"AVI ", "video/x-msvideo"),
+        (0, b"OggS", "video/ogg"),
+    ],
+}
+
+# Bytes decoded from the head of a payload to sniff its format.
+SNIFF_SIZE: int = 16
+
+
+class Media:
+    """Validating hex encoded media without decoding the whole payload."""
+
+    @staticmethod
+    def size(string: str) -> int:
+        """Decoded size of a hex string, two characters per byte."""
+
+        return len(string) // 2
+
+    @staticmethod
+    def is_hex(string: str) -> bool:
+        """Checking if a string is non-empty hex, decoding it in bounded chunks."""
+
+        if not string or not string.isascii() or len(string) % 2:
+            return False
+
+        for start in range(0, len(string), HEX_CHUNK):
+
+            chunk: str = string[start : start + HEX_CHUNK]
+
+            try:
+
+                # fromhex skips whitespace, which then shortens the result.
+                if len(bytes.fromhex(chunk)) * 2 != len(chunk):
+                    return False
+
+            except ValueError:
+
+                return False
+
+        return True
+
+    @staticmethod
+    def sniff(string: str, kind: Literal["img", "video"]) -> str | bool:
+        """Getting the mime type from the magic bytes of the first SNIFF_SIZE bytes."""
+
+        return Media.sniff_head(bytes.fromhex(string[: SNIFF_SIZE * 2]), kind)
+
+    @staticmethod
+    def sniff_head(head: bytes, kind: Literal["img", "video"]) -> str | bool:
+
+        for offset, signature, mime in SIGNATURES[kind]:
+
+            if head.startswith(signature, offset):
+                return mime
+
+        return False
+
+    @staticmethod
+    def validate(
+        string: str, kind: Literal["img", "video"], max_size: int = MEDIA_MAX_SIZE
+    ) -> str | bool:
+        """Checking a hex payload (size, charset, format), returning its mime type."""
+
+        if (
+            not isinstance(string, str)
+            or len(string) % 2
+            or Media.size(string) > max_size
+            or not Media.is_hex(string)
+        ):
+            return False
+
+        return Media.sniff(string, kind)
+
+
+class MediaUpload:
+    """A raw request body spooled to memory, then disk, checked while it arrives."""
+
+    def __init__(
+        self, kind: Literal["img", "video"], max_size: int = MEDIA_MAX_SIZE
+    ) -> None:
+
+        self.kind: Literal["img", "video"] = kind
+        self.max_size: int = max_size
+        self.file: tempfile.SpooledTemporaryFile = tempfile.SpooledTemporaryFile(
+            max_size=UPLOAD_SPOOL_SIZE
+        )
+        self.size: int = 0
+        self.head: bytes = b""
+        self.mime: str | bool = False
+
+    async def receive(self, request: fastapi.Request) -> bool:
+        """Reading the body, False as soon as it is too large or of another format."""
+
+        declared: str | None = request.headers.get("content-length")
+
+        if (
+            declared is not None
+            and declared.isdigit()
+            and int(declared) > self.max_size
+        ):
+            return False
+
+        async for chunk in request.stream():
+
+            self.size += len(chunk)
+
+            if self.size > self.max_size:
+                return False
+
+            if len(self.head) < SNIFF_SIZE:
+
+                self.head += chunk[: SNIFF_SIZE - len(self.head)]
+
+                if len(self.head) == SNIFF_SIZE:
+
+                    self.mime = Media.sniff_head(self.head, self.kind)
+
+                    if not self.mime:
+                        return False
+
+            self.file.write(chunk)
+
+        if len(self.head) < SNIFF_SIZE:
+            self.mime = Media.sniff_head(self.head, self.kind)
+
+        self.file.seek(0)
+
+        return self.size > 0 and bool(self.mime)
+
+    def close(self) -> None:
+
+        self.file.close()
@@ -1,7 +1,10 @@
 """The BaseModel of BlackWell API."""
 
-from pydantic import BaseModel
-from typing import Any, Dict
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import Annotated, Any, Dict, List, Literal, Union
+
+from .ids import new_id
+from .config import HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, SEND_BATCH_MAX_SIZE
 
 
 class Register(BaseModel):
@@ -46,25 +49,129 @@ class Login(BaseModel):
     password: str
 
 
+class Logout(BaseModel):
+
+    session: str
+
+
+class MessageModel(BaseModel):
+
+    # Unknown keys and non-string values are rejected, like the old Parser did.
+    model_config = ConfigDict(extra="forbid", strict=True, populate_by_name=True)
+
+    id: str = ""
+    from_: str = Field("", alias="from")
+    read: str = ""
+    contain: str
+
+    def to_message(self) -> Dict[str, Any]:
+        """The message as stored and delivered, with a new server side id."""
+
+        # Built by hand, model_dump costs as much as the whole validation.
+        message: Dict[str, Any] = {
+            "id": new_id(),
+            "type": self.type,
+            "from": self.from_,
+            "contain": self.contain,
+        }
+
+        if "read" in self.model_fields_set:
+            message["read"] = self.read
+
+        return message
+
+
+class TextMessage(MessageModel):
+
+    type: Literal["text"]
+
+
+class ImgMessage(MessageModel):
+
+    type: Literal["img"]
+
+
+class VideoMessage(MessageModel):
+
+    type: Literal["video"]
+
+
+class ActionMessage(BaseModel):
+
+    model_config = ConfigDict(extra="forbid", strict=True, populate_by_name=True)
+
+    type: Literal["action"]
+    action: Literal["delete message"]
+    from_: str = Field("", alias="from")
+    message_id: str = Field(alias="message id")
+
+    def to_message(self) -> Dict[str, Any]:
+
+        return self.model_dump(by_alias=True)
+
+
+Message = Annotated[
+    Union[TextMessage, ImgMessage, VideoMessage, ActionMessage],
+    Field(discriminator="type"),
+]
+
+MESSAGE_ADAPTER: TypeAdapter = TypeAdapter(Message)
+
+
 class SendMessage(BaseModel):
 
-    email: str
-    password: str
+    # Either the session issued at /login or the email and password.
+    session: str = ""
+    email: str = ""
+    password: str = ""
+
+    to: str
+    message: Annotated[
+        Union[TextMessage, ImgMessage, VideoMessage], Field(discriminator="type")
+    ]
+
+
+class BatchItem(BaseModel):
 
     to: str
-    message: Dict[str, Any] = {"id": "", "type": "", "from": "", "contain": ""}
+    message: Annotated[
+        Union[TextMessage, ImgMessage, VideoMessage], Field(discriminator="type")
+    ]
+
+
+class SendBatch(BaseModel):
+
+    session: str = ""
+    email: str = ""
+    password: str = ""
+
+    messages: List[BatchItem] = Field(min_length=1, max_length=SEND_BATCH_MAX_SIZE)
 
 
 class DeleteMessage(BaseModel):
 
-    email: str
-    password: str
+    session: str = ""
+    email: str = ""
+    password: str = ""
 
     to: str
-    from_: str
     message_id: str
 
+    # Unused, the action is always from the authenticated sender.
+    from_: str = ""
+
 
 class LastMessage(BaseModel):
 
     token: str
+    limit: int = Field(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE)
+
+
+class History(BaseModel):
+
+    token: str
+    username: str
+
+    # The opaque cursor of the previous page, empty for the newest messages.
+    cursor: str = ""
+    limit: int = Field(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE)
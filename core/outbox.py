@@ -0,0 +1,274 @@
+"""The email outbox of BlackWell."""
+
+# Standard modules.
+
+import asyncio
+import smtplib
+import time
+
+from email.message import EmailMessage
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Own modules.
+
+from .vault import SECRETS
+from .config import (
+    EMAIL_BACKOFF,
+    EMAIL_BATCH_SIZE,
+    EMAIL_QUEUE_SIZE,
+    EMAIL_RETRIES,
+    EMAIL_SENDER,
+    EMAIL_SMTP_HOST,
+    EMAIL_SMTP_LOGIN,
+    EMAIL_SMTP_PORT,
+    EMAIL_SMTP_SSL,
+    EMAIL_SMTP_TIMEOUT,
+    EMAIL_WORKERS,
+)
+
+
+class EmailJob:
+
+    def __init__(
+        self,
+        to: str,
+        subject: str,
+        content: str,
+        on_failure: Callable[[], Awaitable[Any]] | None = None,
+    ) -> None:
+
+        self.to: str = to
+        self.subject: str = subject
+        self.content: str = content
+        self.on_failure: Callable[[], Awaitable[Any]] | None = on_failure
+        self.attempts: int = 0
+        self.enqueued: float = time.monotonic()
+
+
+class SMTPConnection:
+    """An authenticated SMTP session kept open between batches (blocking, run in threads)."""
+
+    def __init__(self) -> None:
+
+        self.smtp: smtplib.SMTP | None = None
+
+    def ensure(self, user: str, password: str) -> smtplib.SMTP:
+
+        if self.smtp is not None:
+
+            try:
+
+                if self.smtp.noop()[0] == 250:
+                    return self.smtp
+
+            except smtplib.SMTPException:
+                pass
+
+            self.close()
+
+        self.smtp = (
+            smtplib.SMTP_SSL(
+                EMAIL_SMTP_HOST, EMAIL_SMTP_PORT, timeout=EMAIL_SMTP_TIMEOUT
+            )
+            if EMAIL_SMTP_SSL
+            else smtplib.SMTP(
+                EMAIL_SMTP_HOST, EMAIL_SMTP_PORT, timeout=EMAIL_SMTP_TIMEOUT
+            )
+        )
+
+        if EMAIL_SMTP_LOGIN:
+            self.smtp.login(user, password)
+
+        return self.smtp
+
+    def send(self, sender: str, password: str, jobs: List[EmailJob]) -> List[EmailJob]:
+        """Sending a batch over the session, returning the jobs that failed."""
+
+        failed: List[EmailJob] = []
+
+        try:
+
+            smtp: smtplib.SMTP = self.ensure(sender, password)
+
+        except (smtplib.SMTPException, OSError):
+
+            self.close()
+            return jobs
+
+        for job in jobs:
+
+            email: EmailMessage = EmailMessage()
+            email["From"] = sender
+            email["To"] = job.to
+            email["Subject"] = job.subject
+            email.set_content(job.content)
+
+            try:
+
+                smtp.send_message(email)
+
+            except smtplib.SMTPRecipientsRefused:
+
+                # The address will never accept it, retrying is pointless.
+                job.attempts = EMAIL_RETRIES
+                failed.append(job)
+
+            except (smtplib.SMTPException, OSError):
+
+                failed.append(job)
+
+        return failed
+
+    def close(self) -> None:
+
+        if self.smtp is not None:
+
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+        self.smtp = None
+
+
+class EmailOutbox:
+    """Delivering emails from a queue with a pool of persistent SMTP sessions."""
+
+    def __init__(self) -> None:
+
+        self.queue: asyncio.Queue[EmailJob] = asyncio.Queue(EMAIL_QUEUE_SIZE)
+        self.workers: List[asyncio.Task] = []
+        self.connections: List[SMTPConnection] = []
+        self.metrics: Dict[str, Any] = {
+            "sent": 0,
+            "failed": 0,
+            "retried": 0,
+            "last-latency": 0.0,
+            "max-latency": 0.0,
+            "total-latency": 0.0,
+        }
+
+    def enqueue(
+        self,
+        to: str,
+        subject: str,
+        content: str,
+        on_failure: Callable[[], Awaitable[Any]] | None = None,
+    ) -> bool:
+        """Queueing an email, False when the outbox is full."""
+
+        return self.enqueue_job(EmailJob(to, subject, content, on_failure))
+
+    def enqueue_job(self, job: EmailJob) -> bool:
+
+        try:
+
+            self.queue.put_nowait(job)
+
+        except asyncio.QueueFull:
+
+            return False
+
+        return True
+
+    def start(self) -> None:
+
+        self.connections = [SMTPConnection() for _ in range(EMAIL_WORKERS)]
+        self.workers = [
+            asyncio.create_task(self.worker(connection), name=f"Email {index}")
+            for index, connection in enumerate(self.connections)
+        ]
+
+    async def shutdown(self, timeout: float = 5) -> None:
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        for worker in self.workers:
+            worker.cancel()
+
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        await asyncio.gather(
+            *[asyncio.to_thread(connection.close) for connection in self.connections]
+        )
+
+        self.workers = []
+
+    async def worker(self, connection: SMTPConnection) -> None:
+
+        while True:
+
+            jobs: List[EmailJob] = [await self.queue.get()]
+
+            while len(jobs) < EMAIL_BATCH_SIZE and not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+
+            try:
+
+                await self.deliver(connection, jobs)
+
+            finally:
+
+                for _ in jobs:
+                    self.queue.task_done()
+
+    async def deliver(self, connection: SMTPConnection, jobs: List[EmailJob]) -> None:
+
+        try:
+
+            sender: Dict[str, Any] | bool = await SECRETS.get("gmail")
+            code: Dict[str, Any] | bool = await SECRETS.get("gmail code")
+
+            failed: List[EmailJob] = await asyncio.to_thread(
+                connection.send,
+                sender["gmail"] if isinstance(sender, dict) else EMAIL_SENDER,
+                code["code"] if isinstance(code, dict) else "",
+                jobs,
+            )
+
+        except Exception:
+
+            failed = jobs
+
+        for job in jobs:
+
+            if job in failed:
+                continue
+
+            latency: float = time.monotonic() - job.enqueued
+
+            self.metrics["sent"] += 1
+            self.metrics["last-latency"] = latency
+            self.metrics["max-latency"] = max(self.metrics["max-latency"], latency)
+            self.metrics["total-latency"] += latency
+
+        for job in failed:
+
+            job.attempts += 1
+
+            if job.attempts < EMAIL_RETRIES:
+
+                self.metrics["retried"] += 1
+                asyncio.get_running_loop().call_later(
+                    EMAIL_BACKOFF * 2 ** (job.attempts - 1), self.retry, job
+                )
+                continue
+
+            self.metrics["failed"] += 1
+
+            if job.on_failure is not None:
+                await asyncio.gather(job.on_failure(), return_exceptions=True)
+
+    def retry(self, job: EmailJob) -> None:
+
+        if not self.enqueue_job(job):
+
+            self.metrics["failed"] += 1
+
+            if job.on_failure is not None:
+                asyncio.create_task(job.on_failure())
+
+
+OUTBOX: EmailOutbox = EmailOutbox()
@@ -0,0 +1,97 @@
+"""The per-account send quotas of BlackWell."""
+
+# Standard modules.
+
+from typing import Any, Dict
+
+# Own modules.
+
+from .limiter import SlidingWindowLimiter, limiter_state
+from .config import QUOTA_PERIOD, SEND_QUOTAS
+
+
+class SendQuota:
+    """Charging every sent message to its sender, by count and by bytes per type."""
+
+    def __init__(
+        self,
+        quotas: Dict[str, Dict[str, int]] = SEND_QUOTAS,
+        period: int = QUOTA_PERIOD,
+    ) -> None:
+
+        self.limiters: Dict[str, Dict[str, SlidingWindowLimiter]] = {
+            type: {
+                budget: SlidingWindowLimiter(
+                    limit,
+                    period,
+                    # Apart from the IP limiters, a flood of addresses evicts none.
+                    limiter_state(pool="quotas"),
+                    f"quota-{type}-{budget}",
+                )
+                for budget, limit in budgets.items()
+            }
+            for type, budgets in quotas.items()
+        }
+
+    @staticmethod
+    def size(type: str, message: Dict[str, Any]) -> int:
+        """Bytes a message costs, media travels hex encoded at two chars per byte."""
+
+        contain: Any = message.get("contain", "")
+
+        if not isinstance(contain, str):
+            return 0
+
+        return len(contain) // 2 if type in ("img", "video") else len(contain.encode())
+
+    def cost(self, type: str, message: Dict[str, Any], size: int | None) -> int:
+
+        return max(self.size(type, message) if size is None else size, 1)
+
+    async def charge(
+        self,
+        username: str,
+        type: str,
+        message: Dict[str, Any],
+        size: int | None = None,
+    ) -> float:
+        """Charging a message, returning 0 when allowed or the seconds to wait."""
+
+        limiters: Dict[str, SlidingWindowLimiter] | None = self.limiters.get(type)
+
+        if limiters is None:
+            return 0
+
+        retry_after: float = await limiters["messages"].hit(username)
+
+        if retry_after:
+            return retry_after
+
+        retry_after = await limiters["bytes"].hit(
+            username, cost=self.cost(type, message, size)
+        )
+
+        if retry_after:
+            await limiters["messages"].refund(username)
+
+        return retry_after
+
+    async def refund(
+        self,
+        username: str,
+        type: str,
+        message: Dict[str, Any],
+        size: int | None = None,
+    ) -> None:
+        """Giving back a charged message that was neither delivered nor queued."""
+
+        limiters: Dict[str, SlidingWindowLimiter] | None = self.limiters.get(type)
+
+        if limiters is None:
+            return
+
+        await limiters["messages"].refund(username)
+        await limiters["bytes"].refund(username, cost=self.cost(type, message, size))
+
+
+QUOTAS: SendQuota = SendQuota()
@@ -0,0 +1,280 @@
+"""The response envelopes of BlackWell."""
+
+# Standard modules.
+
+import datetime
+import time
+
+from typing import Any, Dict
+
+# Third party modules.
+
+import fastapi
+
+# Own modules.
+
+from .constants import Constants
+from .serializer import SERIALIZER, FastJSONResponse, Frame
+
+
+class ResponseDate:
+    """The date of every envelope, formatted and encoded once per minute."""
+
+    __slots__ = ("minute", "text", "encoded")
+
+    def __init__(self) -> None:
+
+        self.minute: int = -1
+        self.text: str = ""
+        self.encoded: bytes = b'""'
+
+    def refresh(self) -> None:
+
+        minute: int = int(time.time() // 60)
+
+        if minute != self.minute:
+
+            self.minute = minute
+            self.text = datetime.datetime.strftime(
+                datetime.datetime.now(), "%Y-%m-%d %H:%M"
+            )
+            self.encoded = SERIALIZER.dumps(self.text)
+
+    def now(self) -> str:
+
+        self.refresh()
+
+        return self.text
+
+    def now_encoded(self) -> bytes:
+
+        self.refresh()
+
+        return self.encoded
+
+
+DATE: ResponseDate = ResponseDate()
+
+
+class Envelope:
+    """A static envelope serialized once, only its date is appended per request."""
+
+    __slots__ = ("title", "message", "status", "head")
+
+    def __init__(
+        self, status: Constants, message: str, title: str = Constants.TITLE.value
+    ) -> None:
+
+        self.title: str = title
+        self.message: str = message
+        self.status: str = status.value
+
+        # The serialized object without its closing brace, ready for the date.
+        self.head: bytes = (
+            SERIALIZER.dumps(
+                {"title": title, "message": message, "status": status.value}
+            )[:-1]
+            + b',"date":'
+        )
+
+    def render(self) -> bytes:
+
+        return self.head + DATE.now_encoded() + b"}"
+
+    def content(self) -> Dict[str, Any]:
+
+        return {
+            "title": self.title,
+            "message": self.message,
+            "status": self.status,
+            "date": DATE.now(),
+        }
+
+    def response(
+        self, status_code: int = 200, headers: Dict[str, str] | None = None
+    ) -> fastapi.responses.Response:
+
+        return fastapi.responses.Response(
+            self.render(), status_code, headers, media_type="application/json"
+        )
+
+
+def envelope(status: Constants, **fields: Any) -> Dict[str, Any]:
+    """An envelope with dynamic fields, closed by its status and the cached date."""
+
+    fields["status"] = status.value
+    fields["date"] = DATE.now()
+
+    return fields
+
+
+def respond(
+    status: Constants,
+    status_code: int = 200,
+    headers: Dict[str, str] | None = None,
+    **fields: Any,
+) -> FastJSONResponse:
+
+    return FastJSONResponse(envelope(status, **fields), status_code, headers)
+
+
+class Responses:
+    """Every static envelope of the API, serialized at import."""
+
+    INCORRECT_CREDENTIALS: Envelope = Envelope(
+        Constants.EMAIL_AND_PASSWORD_IS_NOT_VALID,
+        "The email or password is not valid. Or the user does not exist.",
+        "BlackWell API - Incorrect Credentials",
+    )
+    INCORRECT_TOKEN: Envelope = Envelope(
+        Constants.INCORRECT_TOKEN_FOR_THE_USER,
+        "The token is not valid.",
+        "BlackWell API - Incorrect Token",
+    )
+    INCORRECT_TOKEN_OR_USER: Envelope = Envelope(
+        Constants.INCORRECT_TOKEN_FOR_THE_USER,
+        "The token is not valid. Or the user does not exist.",
+        "BlackWell API - Incorrect Credentials",
+    )
+    INCORRECT_SESSION: Envelope = Envelope(
+        Constants.INCORRECT_SESSION,
+        "The session is not valid, it expired or it was closed.",
+        "BlackWell API - Incorrect Session",
+    )
+    SESSION_CLOSED: Envelope = Envelope(
+        Constants.OK, "The session was closed.", "BlackWell API - Logout"
+    )
+    PROFILE_UPDATED: Envelope = Envelope(
+        Constants.OK,
+        "The profile image was updated successfully.",
+        "BlackWell API - Profile Image Updated",
+    )
+    USER_NOT_IN_CONTACTS: Envelope = Envelope(
+        Constants.INVALID_USER_IN_CONCTACTS,
+        "The user is not in your contacts.",
+        "BlackWell API - User not found",
+    )
+    REQUIRED_TYPE: Envelope = Envelope(
+        Constants.REQUIRED_TYPE_OF_MESSAGE,
+        "The type of message is not valid.",
+        "BlackWell API - Bad Type",
+    )
+    INCORRECT_TYPE: Envelope = Envelope(
+        Constants.INCORRECT_TYPE_OF_MESSAGE,
+        "The type of message is not valid.",
+        "BlackWell API - Bad Type",
+    )
+    INCORRECT_PROFILE_IMAGE: Envelope = Envelope(
+        Constants.INCORRECT_SIZE_IMAGE,
+        "The size of the image is not valid, the image not is a hex or its format is not supported.",
+        "BlackWell API - Incorrect Image",
+    )
+    INCORRECT_PROFILE_UPLOAD: Envelope = Envelope(
+        Constants.INCORRECT_SIZE_IMAGE,
+        "The size of the image is not valid or its format is not supported.",
+        "BlackWell API - Incorrect Image",
+    )
+    INCORRECT_MEDIA: Dict[str, Envelope] = {
+        "img": Envelope(
+            Constants.INCORRECT_SIZE_IMAGE,
+            "The size of the image is not valid, it is not in hex or its format is not supported. Please use the correct syntax.",
+            "BlackWell API - Incorrect Size Image",
+        ),
+        "video": Envelope(
+            Constants.INCORRECT_SIZE_VIDEO,
+            "The size of the video is not valid, it is not in hex or its format is not supported. Please use the correct syntax.",
+            "BlackWell API - Incorrect Size Video",
+        ),
+    }
+    INCORRECT_UPLOAD: Dict[str, Envelope] = {
+        "img": Envelope(
+            Constants.INCORRECT_SIZE_IMAGE,
+            "The size of the file is not valid or its format is not supported.",
+            "BlackWell API - Incorrect Size Image",
+        ),
+        "video": Envelope(
+            Constants.INCORRECT_SIZE_VIDEO,
+            "The size of the file is not valid or its format is not supported.",
+            "BlackWell API - Incorrect Size Video",
+        ),
+    }
+    GATEWAY_INCORRECT_CREDENTIALS: Envelope = Envelope(
+        Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY,
+        "The credentials are not valid.",
+        "BlackWell API - Gateway mistake",
+    )
+    MESSAGE_SENT: Envelope = Envelope(
+        Constants.OK, "The message was sent.", "BlackWell API - Message Sent"
+    )
+    MESSAGE_DELETED: Envelope = Envelope(
+        Constants.OK, "The message was deleted.", "BlackWell API - Message Deleted"
+    )
+    INCORRECT_CURSOR: Envelope = Envelope(
+        Constants.INCORRECT_CURSOR,
+        "The cursor is not valid, use the one of the previous page.",
+        "BlackWell API - Incorrect Cursor",
+    )
+    MEDIA_NOT_FOUND: Envelope = Envelope(
+        Constants.MEDIA_NOT_FOUND,
+        "The media does not exist or the token is not valid.",
+        "BlackWell API - Media not found",
+    )
+
+    # The gateway, sent without a date.
+
+    GATEWAY_REQUIRED_EMAIL_AND_PASSWORD: Frame = Frame(
+        {
+            "title": "BlackWell API - Bad Connection to the Gateway",
+            "message": "Please provide an email and a password.",
+            "status": Constants.REQUIRED_EMAIL_AND_PASSWORD_IN_THE_GATEWAY.value,
+        }
+    )
+    GATEWAY_BAD_CONNECTION: Frame = Frame(
+        {
+            "title": "BlackWell API - Bad Connection to the Gateway",
+            "message": "The credentials are not valid.",
+            "status": Constants.INCORRECT_CREDENTIALS_IN_THE_GATEWAY.value,
+        }
+    )
+
+    # The user management.
+
+    USER_EXISTS: Envelope = Envelope(
+        Constants.USER_EXISTS, "The account already exists."
+    )
+    USER_PENDING: Envelope = Envelope(
+        Constants.USER_EXISTS, "The account already exists or is pending verification."
+    )
+    EMAIL_SEND_ERROR: Envelope = Envelope(
+        Constants.EMAIL_SEND_ERROR, "The message to the email could not be sent."
+    )
+    EMAIL_SENT: Envelope = Envelope(
+        Constants.OK, "You have 3 minutes to check the email."
+    )
+    EMAIL_CODE_INVALID: Envelope = Envelope(
+        Constants.EMAIL_CODE_INVALID, "The code is not valid."
+    )
+    USER_NOT_REGISTERED: Envelope = Envelope(
+        Constants.USER_EXISTS,
+        "The user could not be registered, the account already exists.",
+    )
+    USER_REGISTERED: Envelope = Envelope(Constants.OK, "The user has been registered.")
+    USER_NOT_FETCHED: Envelope = Envelope(
+        Constants.USER_NOT_FOUND, "The user could not be fetched."
+    )
+    USER_DELETED: Envelope = Envelope(Constants.OK, "The user has been deleted.")
+    USER_NOT_DELETED: Envelope = Envelope(
+        Constants.UNKNOWN_ERROR, "The user could not be deleted."
+    )
+    USER_NOT_FOUND: Envelope = Envelope(
+        Constants.USER_NOT_FOUND, "The user could not be found."
+    )
+
+
+def to_response(result: Envelope | Dict[str, Any]) -> fastapi.responses.Response:
+    """The response of a result that is either a static or a dynamic envelope."""
+
+    if isinstance(result, Envelope):
+        return result.response()
+
+    return FastJSONResponse(result)
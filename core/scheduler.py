@@ -0,0 +1,257 @@
+"""The background jobs scheduler of BlackWell."""
+
+# Standard modules.
+
+import asyncio
+import datetime
+import random
+import time
+
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class IntervalTrigger:
+    """Running a job every fixed amount of seconds."""
+
+    def __init__(self, seconds: float, jitter: float = 0) -> None:
+
+        self.seconds: float = seconds
+        self.jitter: float = jitter
+
+    def next_run(self, now: datetime.datetime) -> datetime.datetime:
+
+        return now + datetime.timedelta(seconds=self.seconds)
+
+
+class CronTrigger:
+    """Running a job at the minutes matching a cron expression (local time)."""
+
+    def __init__(
+        self,
+        minute: str = "*",
+        hour: str = "*",
+        day: str = "*",
+        month: str = "*",
+        weekday: str = "*",
+        jitter: float = 0,
+    ) -> None:
+
+        self.minutes: set[int] = CronTrigger.parse_field(minute, 0, 59)
+        self.hours: set[int] = CronTrigger.parse_field(hour, 0, 23)
+        self.days: set[int] = CronTrigger.parse_field(day, 1, 31)
+        self.months: set[int] = CronTrigger.parse_field(month, 1, 12)
+        self.weekdays: set[int] = CronTrigger.parse_field(weekday, 0, 6)
+        self.jitter: float = jitter
+
+        # Like cron, with both restricted a day matching either of them runs.
+        self.any_day: bool = not day.startswith("*") and not weekday.startswith("*")
+
+    @staticmethod
+    def parse_field(field: str, low: int, high: int) -> set[int]:
+        """Parsing '*', '*/n', 'a', 'a-b', 'a-b/n' and comma separated lists."""
+
+        values: set[int] = set()
+
+        for part in field.split(","):
+
+            step: int = 1
+
+            if "/" in part:
+
+                part, raw_step = part.split("/")
+                step = int(raw_step)
+
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(bound) for bound in part.split("-"))
+            else:
+                start = end = int(part)
+
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field: {field}")
+
+            values.update(range(start, end + 1, step))
+
+        return values
+
+    def next_run(self, now: datetime.datetime) -> datetime.datetime:
+
+        candidate: datetime.datetime = now.replace(
+            second=0, microsecond=0
+        ) + datetime.timedelta(minutes=1)
+
+        # Four years always contain every valid combination of day and month.
+        limit: datetime.datetime = candidate + datetime.timedelta(days=366 * 4)
+
+        while candidate <= limit:
+
+            if candidate.month not in self.months:
+
+                candidate = (
+                    candidate.replace(day=1, hour=0, minute=0)
+                    + datetime.timedelta(days=32)
+                ).replace(day=1)
+                continue
+
+            if not self.matches_day(candidate):
+
+                candidate = candidate.replace(hour=0, minute=0) + datetime.timedelta(
+                    days=1
+                )
+                continue
+
+            if candidate.hour not in self.hours:
+
+                candidate = candidate.replace(minute=0) + datetime.timedelta(hours=1)
+                continue
+
+            if candidate.minute not in self.minutes:
+
+                candidate += datetime.timedelta(minutes=1)
+                continue
+
+            return candidate
+
+        raise ValueError("The cron expression never matches a date.")
+
+    def matches_day(self, candidate: datetime.datetime) -> bool:
+
+        # Python counts Monday as 0, cron counts Sunday as 0.
+        day: bool = candidate.day in self.days
+        weekday: bool = (candidate.weekday() + 1) % 7 in self.weekdays
+
+        return day or weekday if self.any_day else day and weekday
+
+
+class Job:
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        trigger: IntervalTrigger | CronTrigger,
+    ) -> None:
+
+        self.name: str = name
+        self.func: Callable[[], Awaitable[Any]] = func
+        self.trigger: IntervalTrigger | CronTrigger = trigger
+        self.running: asyncio.Task | None = None
+        self.metrics: Dict[str, Any] = {
+            "runs": 0,
+            "failures": 0,
+            "skipped": 0,
+            "last-duration": 0.0,
+            "max-duration": 0.0,
+            "total-duration": 0.0,
+            "last-run": None,
+            "next-run": None,
+            "last-error": None,
+        }
+
+
+class Scheduler:
+    """Running the maintenance jobs on the event loop, one run per job at a time."""
+
+    def __init__(self) -> None:
+
+        self.jobs: Dict[str, Job] = {}
+        self.tasks: List[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        trigger: IntervalTrigger | CronTrigger,
+    ) -> Job:
+
+        if name in self.jobs:
+            raise ValueError(f"The job {name} already exists.")
+
+        job: Job = Job(name, func, trigger)
+        self.jobs[name] = job
+
+        if self.tasks:
+            self.tasks.append(asyncio.create_task(self.loop(job), name=name))
+
+        return job
+
+    def start(self) -> None:
+
+        self.tasks = [
+            asyncio.create_task(self.loop(job), name=job.name)
+            for job in self.jobs.values()
+        ]
+
+    async def shutdown(self) -> None:
+
+        running: List[asyncio.Task] = [
+            job.running for job in self.jobs.values() if job.running is not None
+        ]
+
+        for task in self.tasks + running:
+            task.cancel()
+
+        await asyncio.gather(*self.tasks, *running, return_exceptions=True)
+
+        self.tasks = []
+
+    async def loop(self, job: Job) -> None:
+
+        while True:
+
+            now: datetime.datetime = datetime.datetime.now()
+            next_run: datetime.datetime = job.trigger.next_run(now)
+
+            job.metrics["next-run"] = datetime.datetime.strftime(
+                next_run, "%Y-%m-%d %H:%M:%S"
+            )
+
+            await asyncio.sleep(
+                (next_run - now).total_seconds() + random.uniform(0, job.trigger.jitter)
+            )
+
+            # Single-flight: a run that outlives its interval skips the next one.
+            if job.running is not None:
+
+                job.metrics["skipped"] += 1
+                continue
+
+            job.running = asyncio.create_task(self.execute(job))
+
+    async def execute(self, job: Job) -> None:
+
+        start: float = time.perf_counter()
+
+        try:
+
+            await job.func()
+
+        except asyncio.CancelledError:
+
+            raise
+
+        except Exception as error:
+
+            job.metrics["failures"] += 1
+            job.metrics["last-error"] = repr(error)
+
+        finally:
+
+            duration: float = time.perf_counter() - start
+
+            job.metrics["runs"] += 1
+            job.metrics["last-duration"] = duration
+            job.metrics["total-duration"] += duration
+            job.metrics["max-duration"] = max(job.metrics["max-duration"], duration)
+            job.metrics["last-run"] = datetime.datetime.strftime(
+                datetime.datetime.now(), "%Y-%m-%d %H:%M:%S"
+            )
+            job.running = None
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+
+        return {name: dict(job.metrics) for name, job in self.jobs.items()}
+
+
+SCHEDULER: Scheduler = Scheduler()
@@ -6,6 +6,8 @@ import random
 
 from typing import Any, Dict, Literal
 
+from .ids import new_id
+
 
 def generate_text_plane_schema(
     from_: str = "System", contain: str = ""
@@ -13,7 +15,7 @@ def generate_text_plane_schema(
     """Generate text plane schema."""
 
     TEXT_PLANE: Dict[str, Any] = {
-        "id": str(uuid.uuid4().int),
+        "id": new_id(),
         "type": "text",
         "from": from_,
         "read": True if from_ == "System" else False,
@@ -29,7 +31,7 @@ def generate_img_or_video_schema(
     """Generate img or video schema."""
 
     IMG_OR_VIDEO: Dict[str, Any] = {
-        "id": str(uuid.uuid4().int),
+        "id": new_id(),
         "type": type,
         "from": from_,
         "read": True if from_ == "System" else False,
@@ -39,6 +41,25 @@ def generate_img_or_video_schema(
     return IMG_OR_VIDEO
 
 
+def generate_media_reference_schema(
+    from_: str = "System",
+    type: Literal["img", "video"] = "img",
+    media: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Generate the schema of an img or video uploaded to the media store."""
+
+    MEDIA_REFERENCE: Dict[str, Any] = {
+        "id": new_id(),
+        "type": type,
+        "from": from_,
+        "read": True if from_ == "System" else False,
+        "contain": "",
+        "media": media or {},
+    }
+
+    return MEDIA_REFERENCE
+
+
 def generate_temp_user_schema(
     profile: str = "", username: str = "", email: str = "", password: str = ""
 ) -> Dict[str, Any]:
@@ -48,11 +69,14 @@ def generate_temp_user_schema(
         "_id": uuid.uuid4().hex,
         "profile": "",
         "username": username,
+        "username-lower": username.lower(),
         "email": email,
+        "email-lower": email.lower(),
         "password": password,
         "created-at": "",
         "verification": {
-            "remaining": str(datetime.datetime.now() + datetime.timedelta(minutes=3)),
+            "expires-at": datetime.datetime.now(datetime.timezone.utc)
+            + datetime.timedelta(minutes=3),
             "code": str(random.randint(1000, 9999)) + str(random.randint(1000, 9999)),
         },
         "contacts": [],
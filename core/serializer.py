@@ -0,0 +1,133 @@
+"""The JSON serializers of BlackWell."""
+
+# Standard modules.
+
+import datetime
+import json
+
+from typing import Any
+
+# Third party modules.
+
+import fastapi
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Own modules.
+
+from .config import SERIALIZER_BACKEND
+
+
+def default(value: Any) -> Any:
+    """Encoding the values stdlib json does not know, like orjson does."""
+
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonSerializer:
+
+    name: str = "orjson"
+
+    def dumps(self, content: Any) -> bytes:
+
+        return orjson.dumps(content)
+
+    def loads(self, data: bytes | str) -> Any:
+
+        return orjson.loads(data)
+
+
+class MsgspecSerializer:
+
+    name: str = "msgspec"
+
+    def __init__(self) -> None:
+
+        self.encoder: Any = msgspec.json.Encoder()
+        self.decoder: Any = msgspec.json.Decoder()
+
+    def dumps(self, content: Any) -> bytes:
+
+        return self.encoder.encode(content)
+
+    def loads(self, data: bytes | str) -> Any:
+
+        return self.decoder.decode(data)
+
+
+class StdlibSerializer:
+
+    name: str = "json"
+
+    def dumps(self, content: Any) -> bytes:
+
+        # The same output Starlette's JSONResponse renders.
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+            default=default,
+        ).encode("utf-8")
+
+    def loads(self, data: bytes | str) -> Any:
+
+        return json.loads(data)
+
+
+def create_serializer(
+    kind: str = SERIALIZER_BACKEND,
+) -> OrjsonSerializer | MsgspecSerializer | StdlibSerializer:
+    """Creating the serializer selected by SERIALIZER_BACKEND, "auto" picks the fastest."""
+
+    if kind == "auto":
+        kind = "orjson" if orjson else "msgspec" if msgspec else "json"
+
+    if kind == "orjson" and orjson is not None:
+        return OrjsonSerializer()
+
+    elif kind == "msgspec" and msgspec is not None:
+        return MsgspecSerializer()
+
+    elif kind in ("orjson", "msgspec", "json"):
+        return StdlibSerializer()
+
+    raise ValueError(f"Unknown serializer: {kind}")
+
+
+SERIALIZER: OrjsonSerializer | MsgspecSerializer | StdlibSerializer = (
+    create_serializer()
+)
+
+
+class FastJSONResponse(fastapi.responses.JSONResponse):
+    """The JSONResponse of the API, rendered by the configured serializer."""
+
+    def render(self, content: Any) -> bytes:
+
+        return SERIALIZER.dumps(content)
+
+
+class Frame:
+    """A gateway message encoded once, sent as the same text to every socket."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, message: Any) -> None:
+
+        self.text: str = SERIALIZER.dumps(message).decode("utf-8")
+
+    async def send(self, websocket: fastapi.WebSocket) -> None:
+
+        await websocket.send_text(self.text)
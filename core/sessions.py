@@ -0,0 +1,180 @@
+"""The session tokens of BlackWell."""
+
+# Standard modules.
+
+import base64
+import datetime
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
+
+from typing import Any, Dict
+
+# Own modules.
+
+from .vault import SECRETS
+from .db.primary import revoke_session, revoke_user_sessions, session_revoked
+from .serializer import SERIALIZER
+from .config import SESSION_CACHE_SIZE, SESSION_EPHEMERAL_KEY, SESSION_TTL
+
+
+def encode(data: bytes) -> str:
+
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def decode(data: str) -> bytes:
+
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SessionManager:
+    """Signed short-lived tokens, verified in memory and revoked in the repository.
+
+    A token is "<payload>.<signature>", the payload being the session id, the
+    username and the issue and expiry times. The payload is only signed, so the
+    user token is never part of it and is resolved by the server.
+    """
+
+    def __init__(
+        self,
+        ttl: int = SESSION_TTL,
+        cache_size: int = SESSION_CACHE_SIZE,
+        ephemeral: bool = SESSION_EPHEMERAL_KEY,
+    ) -> None:
+
+        # Replaced by the "session key" secret, shared by every worker, at load.
+        self.key: bytes = secrets.token_bytes(32)
+        self.ephemeral: bool = ephemeral
+        self.ttl: int = ttl
+        self.cache_size: int = cache_size
+        self.verified: Dict[str, Dict[str, Any]] = {}
+
+    async def load(self) -> None:
+        """Loading the "session key" secret, failing without it unless ephemeral."""
+
+        try:
+
+            secret: Dict[str, Any] | bool = await SECRETS.get("session key")
+
+        except Exception:
+
+            if not self.ephemeral:
+                raise
+
+            return
+
+        if isinstance(secret, dict) and secret.get("key"):
+
+            self.key = str(secret["key"]).encode()
+            self.verified.clear()
+
+        elif not self.ephemeral:
+
+            # A key per process would fail the tokens issued by the other workers.
+            raise RuntimeError(
+                'The "session key" secret ({"key": ...}) is required to sign the '
+                "sessions of every worker. Set SESSION_EPHEMERAL_KEY=true to use a "
+                "random key, only with a single process."
+            )
+
+    def sign(self, payload: str) -> str:
+
+        return encode(hmac.new(self.key, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, username: str) -> Dict[str, Any]:
+
+        issued: int = int(time.time())
+        payload: str = encode(
+            SERIALIZER.dumps([uuid.uuid4().hex, username, issued, issued + self.ttl])
+        )
+
+        return {"session": f"{payload}.{self.sign(payload)}", "expires-in": self.ttl}
+
+    def claims(self, session: str) -> Dict[str, Any] | bool:
+        """The claims of a signed and unexpired session, without the revocations."""
+
+        claims: Dict[str, Any] | None = self.verified.get(session)
+
+        if claims is None:
+
+            payload, _, signature = session.partition(".")
+
+            if not hmac.compare_digest(self.sign(payload).encode(), signature.encode()):
+                return False
+
+            try:
+
+                id, username, issued, expires = SERIALIZER.loads(decode(payload))
+                claims = {
+                    "id": id,
+                    "username": username,
+                    "issued-at": issued,
+                    "expires-at": expires,
+                }
+
+            except Exception:
+
+                return False
+
+            if self.cache_size > 0:
+
+                if len(self.verified) >= self.cache_size:
+                    self.verified.pop(next(iter(self.verified)))
+
+                self.verified[session] = claims
+
+        if claims["expires-at"] <= time.time():
+
+            self.verified.pop(session, None)
+            return False
+
+        return claims
+
+    async def verify(self, session: str) -> Dict[str, Any] | bool:
+        """The claims of a valid session, False when forged, expired or revoked."""
+
+        claims: Dict[str, Any] | bool = self.claims(session)
+
+        if not isinstance(claims, dict):
+            return False
+
+        # Revoked by any worker, the repository is shared by all of them.
+        elif await session_revoked(
+            claims["id"], claims["username"], claims["issued-at"]
+        ):
+
+            self.verified.pop(session, None)
+            return False
+
+        return claims
+
+    async def revoke(self, session: str) -> bool:
+
+        claims: Dict[str, Any] | bool = await self.verify(session)
+
+        if not isinstance(claims, dict):
+            return False
+
+        await revoke_session(claims["id"], expiry(claims["expires-at"]))
+        self.verified.pop(session, None)
+
+        return True
+
+    async def revoke_user(self, username: str) -> None:
+        """Revoking every session of a user issued until now."""
+
+        now: float = time.time()
+
+        await revoke_user_sessions(username, now, expiry(now + self.ttl))
+
+
+def expiry(timestamp: float) -> datetime.datetime:
+    """When a revocation can be forgotten, its sessions have expired by then."""
+
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+SESSIONS: SessionManager = SessionManager()
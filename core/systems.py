@@ -2,12 +2,12 @@
 
 # Standard modules.
 
+import asyncio
 import datetime
+import io
+import math
 import uuid
-import smtplib
-import re
 
-from email.message import EmailMessage
 from typing import Any, Awaitable, Callable, Dict, List
 from functools import wraps
 
@@ -15,24 +15,39 @@ from functools import wraps
 
 import fastapi
 
+from pydantic import ValidationError
+
 # Own modules.
 
 from .db.primary import (
     fetch_user,
     delete_user,
-    get_secret,
     post_user,
     get_user_with_email_and_password,
+    set_user_profile_media,
+    claim_node,
+    renew_node,
+    release_node,
 )
 from .db.secundary import (
     find_possible_user,
     post_temp_user,
     terminate_temp_user,
-    is_valid_verification_code,
-    get_temp_user,
+    claim_temp_user,
+    put_media,
+    delete_media,
 )
 from .schemas import generate_temp_user_schema
+from .models import MESSAGE_ADAPTER, ImgMessage, TextMessage, VideoMessage
 from .gateway import GatewayManager
+from .outbox import OUTBOX
+from .limiter import SlidingWindowLimiter, limiter_state
+from .responses import Envelope, Responses, envelope
+from .sessions import SESSIONS
+from .media import Media, MediaUpload
+from .images import IMAGES
+from .ids import IDS, default_node
+from .config import MEDIA_MAX_SIZE, NODE_ID, NODE_LEASE, THUMBNAIL_SIZE
 from .constants import Constants
 
 
@@ -43,7 +58,9 @@ class IPLimiter:
 
         def decorator(func: Callable) -> Callable:
 
-            calls: List[Dict[str, Any]] = []
+            limiter: SlidingWindowLimiter = SlidingWindowLimiter(
+                max_calls, time, limiter_state(), func.__name__
+            )
 
             @wraps(func)
             async def wrapper(request: fastapi.Request, *args, **kwargs) -> Awaitable:
@@ -51,194 +68,304 @@ class IPLimiter:
                 if request.client is None:
                     return await func(request, *args, **kwargs)
 
-                elif len(calls) == 0:
-                    calls.append(
-                        {
-                            "ip": request.client.host,
-                            "counter": {"num": 1, "time": str(datetime.datetime.now())},
-                            "time": "",
-                            "block": False,
-                        }
+                retry_after: float = await limiter.hit(request.client.host)
+
+                if retry_after:
+
+                    raise fastapi.HTTPException(
+                        status_code=fastapi.status.HTTP_429_TOO_MANY_REQUESTS,
+                        detail=f"Too many requests. Unlock to the: {datetime.datetime.strftime(datetime.datetime.now() + datetime.timedelta(seconds=retry_after), '%H:%M:%S')}",
+                        headers={"Retry-After": str(math.ceil(retry_after))},
                     )
 
-                for call in calls:
+                return await func(request, *args, **kwargs)
 
-                    if request.client.host not in [z["ip"] for z in calls]:
+            return wrapper
 
-                        calls.append(
-                            {
-                                "ip": request.client.host,
-                                "counter": {
-                                    "num": 1,
-                                    "time": str(datetime.datetime.now()),
-                                },
-                                "time": "",
-                                "block": False,
-                            }
-                        )
+        return decorator
 
-                    if call["counter"]["num"] >= max_calls:
 
-                        if not call["block"]:
+class Parser:
+    """Compatibility shim over the message models of core.models."""
 
-                            call["time"] = str(
-                                datetime.datetime.now()
-                                + datetime.timedelta(seconds=time)
-                            )
-                            call["block"] = True
+    def parse_plane_text(self, message: Dict[str, Any]) -> Dict[str, Any] | bool:
+        """Parsing plane text."""
 
-                        elif (
-                            datetime.datetime.strptime(
-                                call["time"], "%Y-%m-%d %H:%M:%S.%f"
-                            )
-                            <= datetime.datetime.now()
-                        ):
+        try:
+            return TextMessage.model_validate(message).to_message()
+        except ValidationError:
+            return False
 
-                            calls.remove(call)
-                            continue
+    def parse_video_or_img_message(
+        self, message: Dict[str, Any]
+    ) -> Dict[str, Any] | bool:
+        """Parsing video or image message."""
 
-                        raise fastapi.HTTPException(
-                            status_code=fastapi.status.HTTP_429_TOO_MANY_REQUESTS,
-                            detail=f"Too many requests. Unlock to the: {datetime.datetime.strftime(datetime.datetime.strptime(call['time'], '%Y-%m-%d %H:%M:%S.%f'), '%H:%M:%S')}",
-                        )
+        try:
 
-                    if (
-                        datetime.datetime.strptime(
-                            call["counter"]["time"], "%Y-%m-%d %H:%M:%S.%f"
-                        )
-                        + datetime.timedelta(seconds=10)
-                        <= datetime.datetime.now()
-                    ):
+            parsed: Any = MESSAGE_ADAPTER.validate_python(message)
 
-                        calls.remove(call)
-                        continue
+        except ValidationError:
 
-                    if request.client.host in [z["ip"] for z in calls]:
+            return False
 
-                        call["counter"]["num"] += 1
-                        call["counter"]["time"] = str(datetime.datetime.now())
+        return (
+            parsed.to_message()
+            if isinstance(parsed, (ImgMessage, VideoMessage))
+            else False
+        )
 
-                return await func(request, *args, **kwargs)
+    def check_img_or_video_size(self, img_or_video: bytes) -> bool:
+        """Checking if the img or video have the correct size."""
 
-            return wrapper
+        return len(img_or_video) <= MEDIA_MAX_SIZE
 
-        return decorator
+    @staticmethod
+    def is_hex(string: str) -> bool:
+        """Checking if string is hex."""
 
+        return Media.is_hex(string)
 
-class Parser:
 
-    def parse_plane_text(self, message: Dict[str, Any]) -> Dict[str, Any] | bool:
-        """Parsing plane text."""
+class EmailSystem:
+
+    async def send_email(
+        self,
+        to: str = "",
+        message: str = """""",
+        on_failure: Callable[[], Awaitable[Any]] | None = None,
+    ) -> bool:
+        """Queueing an email with an verification code in the outbox."""
+
+        if to.endswith("@gmail.com"):
+
+            return OUTBOX.enqueue(
+                to, "BlackWell - Email Verification", message, on_failure
+            )
 
-        for key in message.keys():
+        """
+
+        Coming Soon...
 
-            if key not in ["id", "type", "read", "from", "contain"]:
+        elif to.endswith('@outlook.com'):
 
-                return False
+            smtp = smtplib.SMTP_SSL('smtp-mail.outlook.com', port= 587)
+            smtp.login(sender, "clave_de_gmail_123")
+            smtp.sendmail(sender, to, email.as_string())
+            smtp.quit()    
 
-        for key, value in message.items():
+            return True
 
-            if not isinstance(value, str):
-                return False
+        """
 
-            elif key == "id":
+        return False
 
-                message["id"] = str(uuid.uuid4().int)
-                continue
 
-            elif key == "type" and value != "text":
-                return False
+class MediaManager:
 
-        return message
+    @staticmethod
+    async def store(
+        source: bytes, filename: str, metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Storing a file of the media store, returning its reference."""
 
-    def parse_video_or_img_message(
-        self, message: Dict[str, Any]
+        media: Dict[str, Any] = {
+            "mime": metadata["mime"],
+            "size": len(source),
+        }
+        media["id"] = await put_media(
+            io.BytesIO(source), filename, {**metadata, "size": len(source)}
+        )
+
+        return media
+
+    @staticmethod
+    async def store_upload(
+        upload: MediaUpload, filename: str, metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Storing an upload, streamed from its spooled file by the bucket."""
+
+        media: Dict[str, Any] = {"mime": upload.mime, "size": upload.size}
+        media["id"] = await put_media(
+            upload.file,
+            filename,
+            {**metadata, "mime": upload.mime, "size": upload.size},
+        )
+
+        return media
+
+    @staticmethod
+    def read(source: bytes | MediaUpload) -> bytes:
+        """The whole image, only loaded for the image workers."""
+
+        if isinstance(source, bytes):
+            return source
+
+        source.file.seek(0)
+
+        return source.file.read()
+
+    @staticmethod
+    async def store_profile(
+        token: str, username: str, source: bytes | MediaUpload, mime: str = ""
     ) -> Dict[str, Any] | bool:
-        """Parsing video or image message."""
+        """Storing a profile image and its avatars, False when the token is not valid."""
 
-        for key in message.keys():
+        media: Dict[str, Any] = (
+            await MediaManager.store_upload(
+                source, f"profile-{username}", {"profile": username}
+            )
+            if isinstance(source, MediaUpload)
+            else await MediaManager.store(
+                source, f"profile-{username}", {"mime": mime, "profile": username}
+            )
+        )
+        avatars: Dict[int, bytes] | bool = (
+            await IMAGES.avatars(MediaManager.read(source))
+            if IMAGES.available
+            else False
+        )
+        profile: str = ""
 
-            if key not in ["id", "type", "read", "from", "contain"]:
-                return False
+        if isinstance(avatars, dict):
 
-        for key, value in message.items():
+            media["sizes"] = {
+                str(size): await MediaManager.store(
+                    avatar,
+                    f"profile-{username}-{size}",
+                    {"mime": IMAGES.mime, "profile": username, "width": size},
+                )
+                for size, avatar in avatars.items()
+            }
+            # Clients reading the hex image get the largest avatar, not the upload.
+            profile = avatars[max(avatars)].hex()
 
-            if not isinstance(value, str):
-                return False
+        replaced: Dict[str, Any] | bool = await set_user_profile_media(
+            token, media, profile
+        )
 
-            elif key == "id":
+        if not isinstance(replaced, dict):
 
-                message["id"] = str(uuid.uuid4().int)
-                continue
+            await MediaManager.discard(media)
+            return False
 
-            elif key == "type" and value not in ["img", "video"]:
-                return False
+        await MediaManager.discard(replaced)
 
-        return message
+        return media
 
-    def check_img_or_video_size(self, img_or_video: bytes) -> bool:
-        """Checking if the img or video have the correct size."""
+    @staticmethod
+    async def store_message(
+        sender: str, to: str, type: str, upload: MediaUpload
+    ) -> Dict[str, Any]:
+        """Storing the media of a message, with a thumbnail for images."""
 
-        return True if round(len(img_or_video) / 1048576) <= 5 else False
+        metadata: Dict[str, Any] = {"mime": upload.mime, "from": sender, "to": to}
+        media: Dict[str, Any] = await MediaManager.store_upload(
+            upload, f"{sender}-{to}", metadata
+        )
 
-    def is_hex(self, string: str) -> bool:
-        """Checking if string is hex."""
+        if type == "img" and IMAGES.available:
 
-        return bool(re.match(r"^[0-9a-fA-F]+$", string))
+            thumbnail: bytes | bool = await IMAGES.thumbnail(MediaManager.read(upload))
 
+            if isinstance(thumbnail, bytes):
 
-class EmailSystem:
+                media["thumbnail"] = await MediaManager.store(
+                    thumbnail,
+                    f"{sender}-{to}-thumbnail",
+                    {**metadata, "mime": IMAGES.mime, "width": THUMBNAIL_SIZE},
+                )
 
-    async def send_email(self, to: str = "", message: str = """""") -> bool:
-        """Sending email with an verification code."""
+        return media
 
-        if to.endswith("@gmail.com"):
+    @staticmethod
+    async def store_hex_message(
+        sender: str, to: str, message: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """The history copy of a hex media message, its payload moved to the store."""
+
+        if message["type"] == "text" or not message.get("contain"):
+            return message
+
+        media: Dict[str, Any] = await MediaManager.store(
+            bytes.fromhex(message["contain"]),
+            f"{sender}-{to}",
+            {
+                "mime": Media.sniff(message["contain"], message["type"]),
+                "from": sender,
+                "to": to,
+            },
+        )
 
-            gmail_code: Dict[str, Any] | bool = await get_secret("gmail code")
-            gmail_sender: Dict[str, Any] | bool = await get_secret("gmail")
+        return {**message, "contain": "", "media": media}
 
-            if not isinstance(gmail_code, dict):
-                return False
-            elif not isinstance(gmail_sender, dict):
-                return False
+    @staticmethod
+    async def discard(media: Dict[str, Any]) -> None:
+        """Deleting a file of the media store and every rendition of it."""
 
-            email = EmailMessage()
-            email["From"] = gmail_sender["gmail"]
-            email["To"] = to
-            email["Subject"] = "BlackWell - Email Verification"
+        ids: List[str] = [
+            rendition["id"]
+            for rendition in [
+                media,
+                media.get("thumbnail") or {},
+                *(media.get("sizes") or {}).values(),
+            ]
+            if rendition.get("id")
+        ]
 
-            email.set_content(message)
+        await asyncio.gather(*[delete_media(id) for id in ids])
 
-            smtp: smtplib.SMTP_SSL = smtplib.SMTP_SSL("smtp.gmail.com")
-            smtp.login(gmail_sender["gmail"], gmail_code["code"])
-            smtp.sendmail(gmail_sender["gmail"], to, email.as_string())
-            smtp.quit()
 
-            return True
+class NodeRegistry:
+    """The node of the message ids of this process, leased from the registry.
 
-        """
+    Two processes sharing a node would mint the same ids, so unless NODE_ID
+    is set each process claims a node of its own and keeps renewing it.
+    """
 
-        Coming Soon...
+    def __init__(self) -> None:
 
-        elif to.endswith('@outlook.com'):
+        self.owner: str = uuid.uuid4().hex
+        self.node: int = NODE_ID
 
-            smtp = smtplib.SMTP_SSL('smtp-mail.outlook.com', port= 587)
-            smtp.login(sender, "clave_de_gmail_123")
-            smtp.sendmail(sender, to, email.as_string())
-            smtp.quit()    
+    async def claim(self) -> None:
 
-            return True
+        if NODE_ID >= 0:
+            return
 
-        """
+        # A forked worker claims its own node, the parent one is not inherited.
+        self.owner = uuid.uuid4().hex
+        node: int | bool = await claim_node(self.owner, default_node(), NODE_LEASE)
 
-        return False
+        if node is False:
+            raise RuntimeError(
+                "Every node of the message ids is leased, set NODE_ID per process."
+            )
+
+        self.node = node
+        IDS.__init__(node)
+
+    async def renew(self) -> None:
+
+        if NODE_ID >= 0:
+            return
+
+        # The lease lapsed and was taken over, the ids move to a free node.
+        elif not await renew_node(self.node, self.owner, NODE_LEASE):
+            await self.claim()
+
+    async def release(self) -> None:
+
+        if NODE_ID < 0:
+            await release_node(self.node, self.owner)
+
+
+NODE_REGISTRY: NodeRegistry = NodeRegistry()
 
 
 class UserManager:
 
-    async def register_user(
-        self, username: str, email: str, password: str
-    ) -> Dict[str, Any]:
+    async def register_user(self, username: str, email: str, password: str) -> Envelope:
         """Registering user at a temp database."""
 
         TEMP_USER: Dict[str, Any] = generate_temp_user_schema(
@@ -251,27 +378,13 @@ class UserManager:
 
         if not possible_user:
 
-            return {
-                "title": Constants.TITLE.value,
-                "message": "The account already exists.",
-                "status": Constants.USER_EXISTS.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+            return Responses.USER_EXISTS
 
         result_post_temp_user: bool = await post_temp_user(TEMP_USER)
 
         if not result_post_temp_user:
 
-            return {
-                "title": Constants.TITLE.value,
-                "message": "The temporary account could not be created.",
-                "status": Constants.UNKNOWN_ERROR.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+            return Responses.USER_PENDING
 
         send_code: bool = await EmailSystem().send_email(
             to=TEMP_USER["email"],
@@ -280,131 +393,69 @@ class UserManager:
                         
         The email verification code is: {TEMP_USER['verification']['code']}                 
         """,
+            on_failure=lambda: terminate_temp_user(TEMP_USER["_id"]),
         )
 
         if not send_code:
 
             await terminate_temp_user(TEMP_USER["_id"])
 
-            return {
-                "title": Constants.TITLE.value,
-                "message": "The mensage to the email could not be send.",
-                "status": Constants.EMAIL_SEND_ERROR.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+            return Responses.EMAIL_SEND_ERROR
 
-        return {
-            "title": Constants.TITLE.value,
-            "message": "You have 3 minutes to check the email.",
-            "status": Constants.OK.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
+        return Responses.EMAIL_SENT
 
-    async def verify_user(self, code: str) -> Dict[str, Any] | bool:
+    async def verify_user(self, code: str) -> Envelope:
         """Verifying user at a temp database and creating a user at the primary database."""
 
-        is_valid: bool = await is_valid_verification_code(code)
+        temp_user: Dict[str, Any] | bool = await claim_temp_user(code)
 
-        if not is_valid:
+        if not isinstance(temp_user, dict):
 
-            return {
-                "title": Constants.TITLE.value,
-                "message": "The code is not valid.",
-                "status": Constants.EMAIL_CODE_INVALID.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
-
-        temp_user: Dict[str, Any] | bool = await get_temp_user(code)
+            return Responses.EMAIL_CODE_INVALID
 
-        if isinstance(temp_user, dict):
+        del temp_user["verification"]
+        temp_user["created-at"] = datetime.datetime.strftime(
+            datetime.datetime.now(), "%Y-%m-%d %H:%M"
+        )
 
-            temp_user["created-at"] = datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            )
+        result: bool = await post_user(temp_user)
 
-            result: bool = await post_user(temp_user)
+        if not result:
 
-            if result:
+            return Responses.USER_NOT_REGISTERED
 
-                await terminate_temp_user(temp_user["_id"])
-                await GatewayManager.add(
-                    temp_user["username"], temp_user["email"], temp_user["password"]
-                )
+        await GatewayManager.add(
+            temp_user["username"],
+            temp_user["email"],
+            temp_user["password"],
+            temp_user["_id"],
+        )
 
-                return {
-                    "title": Constants.TITLE.value,
-                    "message": "The user has been registered.",
-                    "status": Constants.OK.value,
-                    "date": datetime.datetime.strftime(
-                        datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                    ),
-                }
-
-            return {
-                "title": Constants.TITLE.value,
-                "message": "The user could not be registered.",
-                "status": Constants.UNKNOWN_ERROR.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+        return Responses.USER_REGISTERED
 
-        return {
-            "title": Constants.TITLE.value,
-            "message": "Mistake to the get the temporary account.",
-            "status": Constants.UNKNOWN_ERROR.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
-
-    async def delete_user(self, email: str = "", password: str = "") -> Dict[str, Any]:
+    async def delete_user(self, email: str = "", password: str = "") -> Envelope:
         """Deleting user at the primary database."""
 
-        fetch: bool = await fetch_user(email, password)
+        fetch: str | bool = await fetch_user(email, password)
 
         if not fetch:
 
-            return {
-                "title": Constants.TITLE.value,
-                "message": "El usuario no se pudo obtener.",
-                "status": Constants.USER_NOT_FOUND.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+            return Responses.USER_NOT_FETCHED
 
         result: bool = await delete_user(email, password)
 
         if result:
 
             await GatewayManager.remove(email, password)
+            await SESSIONS.revoke_user(fetch)
 
-            return {
-                "title": Constants.TITLE.value,
-                "message": "The user has been deleted.",
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+            return Responses.USER_DELETED
 
-        return {
-            "title": Constants.TITLE.value,
-            "message": "The user could not be deleted.",
-            "status": Constants.UNKNOWN_ERROR.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
+        return Responses.USER_NOT_DELETED
 
-    async def login(self, email: str = "", password: str = "") -> Dict[str, Any]:
+    async def login(
+        self, email: str = "", password: str = ""
+    ) -> Envelope | Dict[str, Any]:
         """Logging user at the primary database."""
 
         user: Dict[str, Any] | bool = await get_user_with_email_and_password(
@@ -413,21 +464,12 @@ class UserManager:
 
         if isinstance(user, dict):
 
-            return {
-                "profile": user["profile"],
-                "username": user["username"],
-                "contacts": user["contacts"],
-                "status": Constants.OK.value,
-                "date": datetime.datetime.strftime(
-                    datetime.datetime.now(), "%Y-%m-%d %H:%M"
-                ),
-            }
+            return envelope(
+                Constants.OK,
+                profile=user["profile"],
+                username=user["username"],
+                contacts=user["contacts"],
+                **SESSIONS.issue(user["username"]),
+            )
 
-        return {
-            "title": Constants.TITLE.value,
-            "message": "The user could not be found.",
-            "status": Constants.USER_NOT_FOUND.value,
-            "date": datetime.datetime.strftime(
-                datetime.datetime.now(), "%Y-%m-%d %H:%M"
-            ),
-        }
+        return Responses.USER_NOT_FOUND
@@ -0,0 +1,146 @@
+"""The secrets vault of BlackWell."""
+
+# Standard modules.
+
+import asyncio
+import json
+import os
+import time
+
+from typing import Any, Dict, Tuple
+
+# Own modules.
+
+from .db.primary import get_secret
+from .config import SECRETS_BACKEND, SECRETS_FILE, SECRETS_TTL
+
+
+class DatabaseSecretsBackend:
+    """Secrets kept in the 'systems' collection, one document per secret."""
+
+    async def load(self, id: str) -> Dict[str, Any] | None:
+
+        result: Dict[str, Any] | bool = await get_secret(id)
+
+        return result if isinstance(result, dict) else None
+
+
+class EnvSecretsBackend:
+    """Secrets as JSON objects in SECRET_<ID> variables, 'gmail code' -> SECRET_GMAIL_CODE."""
+
+    async def load(self, id: str) -> Dict[str, Any] | None:
+
+        value: str | None = os.environ.get(
+            "SECRET_" + id.upper().replace(" ", "_").replace("-", "_")
+        )
+
+        return json.loads(value) if value else None
+
+
+class FileSecretsBackend:
+    """Secrets in a JSON file mapping every id to its object, re-read when modified."""
+
+    def __init__(self, path: str) -> None:
+
+        self.path: str = path
+        self.modified: float = 0.0
+        self.secrets: Dict[str, Dict[str, Any]] = {}
+
+    async def load(self, id: str) -> Dict[str, Any] | None:
+
+        modified: float = os.stat(self.path).st_mtime
+
+        if modified != self.modified:
+
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.secrets = json.load(file)
+
+            self.modified = modified
+
+        return self.secrets.get(id)
+
+
+class SecretsProvider:
+    """Caching secrets in memory, refreshed in the background once their TTL ends."""
+
+    def __init__(
+        self,
+        backend: DatabaseSecretsBackend | EnvSecretsBackend | FileSecretsBackend,
+        ttl: int = SECRETS_TTL,
+    ) -> None:
+
+        self.backend: (
+            DatabaseSecretsBackend | EnvSecretsBackend | FileSecretsBackend
+        ) = backend
+        self.ttl: int = ttl
+        self.cache: Dict[str, Tuple[float, Dict[str, Any] | None]] = {}
+        self.refreshing: Dict[str, asyncio.Task] = {}
+
+    async def refresh(self, id: str) -> Dict[str, Any] | None:
+
+        try:
+
+            value: Dict[str, Any] | None = await self.backend.load(id)
+
+        except Exception:
+
+            # A failing backend keeps serving the last known value.
+            if id in self.cache:
+                return self.cache[id][1]
+
+            raise
+
+        finally:
+
+            self.refreshing.pop(id, None)
+
+        self.cache[id] = (time.monotonic() + self.ttl, value)
+
+        return value
+
+    async def get(self, id: str) -> Dict[str, Any] | bool:
+
+        entry: Tuple[float, Dict[str, Any] | None] | None = self.cache.get(id)
+
+        if entry is not None and entry[0] <= time.monotonic():
+
+            if id not in self.refreshing:
+                self.refreshing[id] = asyncio.create_task(self.refresh(id))
+
+        elif entry is None:
+
+            if id not in self.refreshing:
+                self.refreshing[id] = asyncio.create_task(self.refresh(id))
+
+            await asyncio.shield(self.refreshing[id])
+            entry = self.cache.get(id)
+
+        value: Dict[str, Any] | None = entry[1] if entry is not None else None
+
+        return value if isinstance(value, dict) else False
+
+    def invalidate(self, id: str | None = None) -> None:
+
+        if id is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(id, None)
+
+
+def create_secrets_backend(
+    kind: str = SECRETS_BACKEND,
+) -> DatabaseSecretsBackend | EnvSecretsBackend | FileSecretsBackend:
+
+    if kind == "database":
+        return DatabaseSecretsBackend()
+
+    elif kind == "env":
+        return EnvSecretsBackend()
+
+    elif kind == "file":
+        return FileSecretsBackend(SECRETS_FILE)
+
+    raise ValueError(f"Unknown secrets backend: {kind}")
+
+
+SECRETS: SecretsProvider = SecretsProvider(create_secrets_backend())